@@ -0,0 +1,233 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+import numpy as np
+from mindbloom import engine
+from mindbloom.controllers import CONTROLLER_NAMES, build_all
+from synthetic import synthetic_session
+
+# Benchmarks for every scorer and for the full /emotion_state path.
+#
+# Sessions are synthetic and seeded (synthetic.py), so runs are reproducible offline.
+# Each target runs for every engine and every session size (frames x motion samples):
+#   reaction_time    get_reaction_time_ms over the motion rows
+#   pause_frequency  get_pause_frequency on one row of normalized means
+#   motor            get_mortor_engagement
+#   stability        emotion_stablity over the frames
+#   focus            get_focus
+#   session          context.score_session, the in-process /emotion_state path
+#   app              POST /emotion_state through the ASGI app (needs httpx)
+# Latency percentiles and throughput come from timed repeats; peak memory from one
+# extra run under tracemalloc (Python and numpy allocations).
+#
+#   python benchmarks/benchmark.py --output baseline.json
+#   python benchmarks/benchmark.py --baseline baseline.json --threshold 0.25
+# exits with status 1 when a case is slower, has lower throughput or peaks higher
+# than the baseline by more than the threshold. The same gate runs under pytest
+# (benchmarks/test_regression.py):
+#   python -m pytest benchmarks --benchmark-baseline baseline.json
+# This directory is not part of the installed package; run it from a checkout with
+# mindbloom installed (poetry install).
+
+TARGETS = ('reaction_time', 'pause_frequency', 'motor', 'stability', 'focus', 'session', 'app')
+DEFAULT_SIZES = ((30, 10), (300, 100), (3000, 1000))
+DEFAULT_ENGINES = ('vector', 'analytic')
+DEFAULT_REPEATS = 20
+DEFAULT_THRESHOLD = 0.25
+
+
+def _percentiles(durations):
+    durations = np.asarray(durations) * 1000.0
+    return {
+        'p50_ms': float(np.percentile(durations, 50)),
+        'p90_ms': float(np.percentile(durations, 90)),
+        'p99_ms': float(np.percentile(durations, 99)),
+        'mean_ms': float(durations.mean()),
+        'throughput_per_s': float(1000.0 / durations.mean()),
+    }
+
+
+def measure(fn, repeats=DEFAULT_REPEATS, warmup=2):
+    for _ in range(warmup):
+        fn()
+    durations = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+    report = _percentiles(durations)
+
+    tracemalloc.start()
+    try:
+        fn()
+        report['peak_memory_kb'] = tracemalloc.get_traced_memory()[1] / 1024.0
+    finally:
+        tracemalloc.stop()
+    report['repeats'] = repeats
+    return report
+
+
+def _scorer_calls(session):
+    from mindbloom.context import score_session
+    from mindbloom.focus import get_focus
+    from mindbloom.motor_engagement import get_mortor_engagement
+    from mindbloom.pause_frequency import get_pause_frequency
+    from mindbloom.reaction_time_ms import get_reaction_time_ms
+    from mindbloom.stablity import emotion_stablity
+
+    emotion, speed, ranges, symmetry = session
+    rows = np.column_stack([speed, ranges, symmetry])
+    return {
+        'reaction_time': lambda: get_reaction_time_ms(rows),
+        'pause_frequency': lambda: get_pause_frequency(0.4, 0.5, 0.5, 0.5),
+        'motor': lambda: get_mortor_engagement(speed, ranges, symmetry),
+        'stability': lambda: emotion_stablity(emotion),
+        'focus': lambda: get_focus(emotion, speed, ranges, symmetry),
+        'session': lambda: score_session(emotion, speed, ranges, symmetry),
+    }
+
+
+def _case_key(mode, target, frames, samples):
+    return f"{mode}/{target}/frames={frames},samples={samples}"
+
+
+def _set_engine(mode):
+    for name in CONTROLLER_NAMES:
+        engine.set_engine(name, mode)
+
+
+def _app_env(mode, lut_dir):
+    # Worker processes configure themselves from the environment, so the engine is
+    # passed the same way the service would get it
+    env = {engine.ENGINES_ENV: ','.join(f"{name}={mode}" for name in CONTROLLER_NAMES)}
+    if mode == 'lut':
+        from mindbloom.lut import LUT_DIR_ENV
+        env[LUT_DIR_ENV] = lut_dir
+    return env
+
+
+def run_app_cases(mode, sizes, repeats, lut_dir=None, seed=0):
+    from fastapi.testclient import TestClient
+    from mindbloom.main import app
+
+    previous = {key: os.environ.get(key) for key in _app_env(mode, lut_dir)}
+    os.environ.update(_app_env(mode, lut_dir))
+    results = {}
+    try:
+        with TestClient(app) as client:
+            while client.get('/ready').status_code != 200:
+                if app.state.warm_up_error is not None:
+                    raise RuntimeError(f"App warm-up failed: {app.state.warm_up_error}")
+                time.sleep(0.05)
+            for frames, samples in sizes:
+                emotion, speed, ranges, symmetry = synthetic_session(frames, samples, seed)
+                body = {'emotion': emotion, 'speed': speed, 'ranges': ranges, 'symmetry': symmetry}
+
+                def post():
+                    response = client.post('/emotion_state', json=body)
+                    if response.status_code != 200:
+                        raise RuntimeError(f"/emotion_state returned {response.status_code}: {response.text}")
+
+                results[_case_key(mode, 'app', frames, samples)] = measure(post, repeats)
+    finally:
+        for key, value in previous.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+    return results
+
+
+def run_benchmarks(engines=DEFAULT_ENGINES, sizes=DEFAULT_SIZES, targets=TARGETS, repeats=DEFAULT_REPEATS,
+                   lut_dir=None, seed=0):
+    build_all()
+    if 'lut' in engines:
+        from mindbloom.lut import load_tables
+        load_tables(lut_dir)
+
+    results = {}
+    for mode in engines:
+        _set_engine(mode)
+        for frames, samples in sizes:
+            calls = _scorer_calls(synthetic_session(frames, samples, seed))
+            for target in targets:
+                if target in calls:
+                    results[_case_key(mode, target, frames, samples)] = measure(calls[target], repeats)
+        if 'app' in targets:
+            results.update(run_app_cases(mode, sizes, repeats, lut_dir, seed))
+    _set_engine('vector')
+
+    return {
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+            'cpus': os.cpu_count(),
+        },
+        'results': results,
+    }
+
+
+def compare(report, baseline, threshold=DEFAULT_THRESHOLD, memory_threshold=None):
+    # Regressions of cases present in both runs, as readable strings
+    memory_threshold = threshold if memory_threshold is None else memory_threshold
+    regressions = []
+    for key, current in report['results'].items():
+        previous = baseline['results'].get(key)
+        if previous is None:
+            continue
+        if current['p50_ms'] > previous['p50_ms'] * (1 + threshold):
+            regressions.append(f"{key}: p50 {previous['p50_ms']:.3f}ms -> {current['p50_ms']:.3f}ms")
+        if current['throughput_per_s'] < previous['throughput_per_s'] * (1 - threshold):
+            regressions.append(f"{key}: throughput {previous['throughput_per_s']:.1f}/s -> {current['throughput_per_s']:.1f}/s")
+        if current['peak_memory_kb'] > previous['peak_memory_kb'] * (1 + memory_threshold):
+            regressions.append(f"{key}: peak memory {previous['peak_memory_kb']:.0f}KB -> {current['peak_memory_kb']:.0f}KB")
+    return regressions
+
+
+def _size(value):
+    frames, _, samples = value.partition('x')
+    return int(frames), int(samples or frames)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python benchmarks/benchmark.py', description='Benchmark the scorers and the /emotion_state path.')
+    parser.add_argument('--engines', nargs='+', default=list(DEFAULT_ENGINES), choices=['vector', 'analytic', 'skfuzzy', 'lut'])
+    parser.add_argument('--sizes', nargs='+', type=_size, default=list(DEFAULT_SIZES),
+                        help='session sizes as FRAMESxSAMPLES, e.g. 300x100')
+    parser.add_argument('--targets', nargs='+', default=list(TARGETS), choices=TARGETS)
+    parser.add_argument('--repeats', type=int, default=DEFAULT_REPEATS)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--lut-dir', help='directory of lookup tables, required for the lut engine')
+    parser.add_argument('--output', help='write the report to this JSON file')
+    parser.add_argument('--baseline', help='JSON report to compare against')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='allowed relative slowdown')
+    parser.add_argument('--memory-threshold', type=float, help='allowed relative peak memory growth (default: --threshold)')
+    args = parser.parse_args(argv)
+    if 'lut' in args.engines and not args.lut_dir:
+        parser.error('the lut engine needs --lut-dir')
+
+    report = run_benchmarks(args.engines, args.sizes, args.targets, args.repeats, args.lut_dir, args.seed)
+    for key, result in report['results'].items():
+        print(f"{key:<55} p50 {result['p50_ms']:9.3f}ms  p99 {result['p99_ms']:9.3f}ms  "
+              f"{result['throughput_per_s']:9.1f}/s  {result['peak_memory_kb']:9.0f}KB")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.threshold, args.memory_threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+import argparse
+import os
+import tempfile
+import numpy as np
+from mindbloom import engine
+from mindbloom.cache import SharedStore, use_cache
+from mindbloom.controllers import CONTROLLER_INPUTS, build_all
+from benchmark import measure
+
+# Single-row lookups through mindbloom.cache against direct inference.
+#
+# focus and pause_frequency run once per session on one row of aggregates, so their
+# cache only pays off if a lookup is cheaper than the inference it replaces. Each
+# case looks up LOOKUPS distinct rows one at a time:
+#   direct       engine.infer, no cache
+#   lru_hit      every row already in the process LRU
+#   shared_hit   LRU cleared before each lookup, every row in the SharedStore file
+#   shared_miss  neither has the row: inference plus the SharedStore write
+#
+#   python benchmarks/cache_lookups.py
+
+NAMES = ('focus', 'pause_frequency')
+LOOKUPS = 200
+
+
+def run_cache_benchmarks(names=NAMES, repeats=20, seed=0):
+    build_all()
+    rng = np.random.default_rng(seed)
+    results = {}
+    for name in names:
+        rows = rng.random((LOOKUPS, 1, len(CONTROLLER_INPUTS[name])))
+        # measure() makes repeats + 3 calls; rows no cache has seen for each of them
+        fresh = iter(rng.random((LOOKUPS * (repeats + 3), 1, len(CONTROLLER_INPUTS[name]))))
+
+        def lookups(before=None):
+            def run():
+                for row in rows:
+                    if before is not None:
+                        before()
+                    engine.infer(name, row)
+            return run
+
+        def misses():
+            for _ in range(LOOKUPS):
+                cache.clear()
+                engine.infer(name, next(fresh))
+
+        with tempfile.TemporaryDirectory() as directory:
+            engine.set_cache(name, None)
+            cases = {'direct': measure(lookups(), repeats)}
+            cache = use_cache(name)
+            cases['lru_hit'] = measure(lookups(), repeats)
+            cache = use_cache(name, shared=SharedStore(os.path.join(directory, 'cache.db')))
+            lookups()()
+            cases['shared_hit'] = measure(lookups(before=cache.clear), repeats)
+            cases['shared_miss'] = measure(misses, repeats)
+            engine.set_cache(name, None)
+        for case, report in cases.items():
+            results[f'{name}/{case}'] = {'us_per_lookup': report['p50_ms'] * 1000 / LOOKUPS, **report}
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python benchmarks/cache_lookups.py', description='Benchmark cached single-row lookups.')
+    parser.add_argument('--names', nargs='+', default=list(NAMES), choices=list(CONTROLLER_INPUTS))
+    parser.add_argument('--repeats', type=int, default=20)
+    args = parser.parse_args(argv)
+    for key, result in run_cache_benchmarks(args.names, args.repeats).items():
+        print(f"{key:<30} {result['us_per_lookup']:9.1f}us per lookup")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,14 @@
+import pytest
+from benchmark import DEFAULT_REPEATS, DEFAULT_THRESHOLD
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('mindbloom benchmarks')
+    group.addoption('--benchmark-baseline', help='JSON report (benchmark.py --output) to gate against')
+    group.addoption('--benchmark-threshold', type=float, default=DEFAULT_THRESHOLD, help='allowed relative slowdown')
+    group.addoption('--benchmark-repeats', type=int, default=DEFAULT_REPEATS)
+
+
+@pytest.fixture
+def benchmark_options(request):
+    return {name: request.config.getoption(f'--benchmark-{name}') for name in ('baseline', 'threshold', 'repeats')}
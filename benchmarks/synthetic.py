@@ -0,0 +1,46 @@
+import argparse
+import json
+import numpy as np
+
+# Seeded synthetic sessions for the benchmarks and tests: emotion frames drift between
+# dominant emotions with noise, and motion samples are smooth random walks around the
+# middle of the [0, 1] range.
+#
+# Run directly, it prints mindbloom.reduction.error_report over synthetic sessions:
+#   python benchmarks/synthetic.py --max-samples 256 1024
+# (`mindbloom reduce report --input DIR` does the same for recorded sessions).
+
+
+def synthetic_session(frames, samples, seed=0):
+    rng = np.random.default_rng(seed)
+    # A dominant emotion that changes every ~20 frames, plus noise
+    dominant = np.repeat(rng.integers(0, 7, size=frames // 20 + 1), 20)[:frames]
+    emotion = rng.dirichlet(np.full(7, 0.5), size=frames) * 0.5
+    emotion[np.arange(frames), dominant] += 0.5
+
+    def walk():
+        return np.clip(0.5 + np.cumsum(rng.normal(0, 0.03, size=samples)), 0.05, 0.95)
+
+    return emotion.tolist(), walk().tolist(), walk().tolist(), walk().tolist()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python benchmarks/synthetic.py',
+                                     description='Measure the error of reduced motion scoring on synthetic sessions.')
+    parser.add_argument('--max-samples', type=int, nargs='+', default=[256, 1024])
+    parser.add_argument('--sessions', type=int, default=50)
+    parser.add_argument('--frames', type=int, default=600, help='frames per session')
+    parser.add_argument('--samples', type=int, default=8000, help='motion samples per session')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    from mindbloom.reduction import error_report
+    from mindbloom.workers import warm_up_worker
+    warm_up_worker()
+    sessions = [synthetic_session(args.frames, args.samples, args.seed + i) for i in range(args.sessions)]
+    for max_samples in args.max_samples:
+        print(json.dumps(error_report(sessions, max_samples)))
+
+
+if __name__ == '__main__':
+    main()
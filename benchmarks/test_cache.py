@@ -0,0 +1,15 @@
+import pytest
+from cache_lookups import NAMES, run_cache_benchmarks
+
+
+@pytest.fixture(scope='module')
+def results():
+    return run_cache_benchmarks(repeats=5)
+
+
+@pytest.mark.parametrize('name', NAMES)
+def test_cached_lookups_beat_direct_inference(results, name):
+    direct = results[f'{name}/direct']['us_per_lookup']
+    assert results[f'{name}/lru_hit']['us_per_lookup'] < direct
+    # The shared store only helps if reading it is cheaper than the inference
+    assert results[f'{name}/shared_hit']['us_per_lookup'] < direct
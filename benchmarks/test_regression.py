@@ -0,0 +1,36 @@
+import json
+import re
+import pytest
+from benchmark import compare, run_benchmarks
+
+CASE = re.compile(r'(?P<mode>[^/]+)/(?P<target>[^/]+)/frames=(?P<frames>\d+),samples=(?P<samples>\d+)$')
+
+
+def _result(p50_ms, peak_memory_kb=100.0):
+    return {'p50_ms': p50_ms, 'throughput_per_s': 1000.0 / p50_ms, 'peak_memory_kb': peak_memory_kb}
+
+
+def test_compare_reports_only_changes_over_the_threshold():
+    baseline = {'results': {'a': _result(1.0), 'b': _result(1.0), 'c': _result(1.0)}}
+    report = {'results': {'a': _result(1.2), 'b': _result(1.5), 'c': _result(1.0, peak_memory_kb=200.0),
+                          'new': _result(9.0)}}
+    regressions = compare(report, baseline, threshold=0.25)
+    assert [line.split(':')[0] for line in regressions] == ['b', 'b', 'c']
+
+
+def test_no_regression_against_baseline(benchmark_options):
+    if not benchmark_options['baseline']:
+        pytest.skip('no --benchmark-baseline given')
+    with open(benchmark_options['baseline']) as f:
+        baseline = json.load(f)
+    # Rerun exactly the baseline's cases
+    cases = [CASE.match(key).groupdict() for key in baseline['results']]
+    engines = list(dict.fromkeys(case['mode'] for case in cases))
+    targets = list(dict.fromkeys(case['target'] for case in cases))
+    sizes = list(dict.fromkeys((int(case['frames']), int(case['samples'])) for case in cases))
+    if 'lut' in engines:
+        pytest.skip('lut baselines need a table directory; use benchmark.py --lut-dir')
+
+    report = run_benchmarks(engines, sizes, targets, benchmark_options['repeats'])
+    regressions = compare(report, baseline, benchmark_options['threshold'])
+    assert not regressions, '\n'.join(regressions)
@@ -0,0 +1,129 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+from mindbloom import engine, lut
+from mindbloom.controllers import CONTROLLER_NAMES
+
+# Read-only controller artifacts shared by every worker process on a node.
+#
+# `build` compiles each controller once (skfuzzy system -> the universes, membership
+# arrays and rules of engine.CompiledController) and writes every array as a .npy file,
+# with term order and rules in manifest.json. Lookup tables (from --lut-dir or
+# MINDBLOOM_LUT_DIR) are written alongside and served as the 'lut' engine, as with
+# MINDBLOOM_LUT_DIR.
+#
+# Workers open the arrays with np.load(mmap_mode='r'): each file is held once in the
+# OS page cache however many processes map it, nothing is parsed or copied, and
+# skfuzzy is not imported. Put the directory on /dev/shm to keep it in memory.
+#
+# Build:   mindbloom artifacts build /dev/shm/mindbloom --lut-dir tables/
+# Serve:   MINDBLOOM_ARTIFACTS_DIR=/dev/shm/mindbloom (loaded by workers.warm_up_worker)
+#
+# If MINDBLOOM_ARTIFACTS_DIR has no manifest yet, the first worker to warm up builds it
+# in a temporary directory and renames it into place; the others map the result.
+# The manifest holds a hash of the modules the arrays are built from (the controller
+# definitions and the engine that compiles them), so artifacts built from other rule
+# bases or another array layout are refused.
+
+ARTIFACTS_DIR_ENV = 'MINDBLOOM_ARTIFACTS_DIR'
+MANIFEST = 'manifest.json'
+VERSION = 1
+
+SOURCE_MODULES = ('controllers', 'engine', 'focus', 'motor_engagement', 'pause_frequency', 'reaction_time_ms', 'stablity')
+
+
+def source_hash():
+    digest = hashlib.sha256()
+    for module in SOURCE_MODULES:
+        with open(os.path.join(os.path.dirname(__file__), f'{module}.py'), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def _save(directory, filename, array):
+    np.save(os.path.join(directory, filename), np.ascontiguousarray(array, dtype=float))
+    return filename
+
+
+def _publish(temporary, directory, replace):
+    if replace and os.path.exists(directory):
+        # Processes mapping the old files keep them until they exit
+        old = f'{directory}.old-{os.getpid()}'
+        os.rename(directory, old)
+        os.rename(temporary, directory)
+        shutil.rmtree(old, ignore_errors=True)
+        return
+    try:
+        os.rename(temporary, directory)
+    except OSError:
+        # Another process published first
+        shutil.rmtree(temporary, ignore_errors=True)
+
+
+def build_artifacts(directory, lut_dir=None, replace=False):
+    directory = os.path.abspath(directory)
+    if lut_dir:
+        lut.load_tables(lut_dir)
+    temporary = f'{directory}.tmp-{os.getpid()}'
+    shutil.rmtree(temporary, ignore_errors=True)
+    os.makedirs(temporary)
+
+    manifest = {'version': VERSION, 'source': source_hash(), 'controllers': {}, 'tables': {}}
+    for name in CONTROLLER_NAMES:
+        compiled = engine.get_compiled(name)
+        files = {key: _save(temporary, f'{name}.{key}.npy', array) for key, array in compiled.arrays().items()}
+        manifest['controllers'][name] = {'arrays': files, 'layout': compiled.layout()}
+        table = lut.get_table(name)
+        if table is not None:
+            manifest['tables'][name] = {
+                'grid': _save(temporary, f'lut.{name}.grid.npy', table.grid),
+                'values': _save(temporary, f'lut.{name}.values.npy', table.values),
+            }
+    with open(os.path.join(temporary, MANIFEST), 'w') as f:
+        json.dump(manifest, f)
+    _publish(temporary, directory, replace)
+    return manifest
+
+
+def load_artifacts(directory):
+    with open(os.path.join(directory, MANIFEST)) as f:
+        manifest = json.load(f)
+    if manifest.get('version') != VERSION or manifest.get('source') != source_hash():
+        raise ValueError(f"Artifacts in {directory} were built from other controller definitions; rebuild them.")
+
+    def mapped(filename):
+        return np.load(os.path.join(directory, filename), mmap_mode='r')
+
+    for name, entry in manifest['controllers'].items():
+        engine.use_arrays(name, {key: mapped(filename) for key, filename in entry['arrays'].items()}, entry['layout'])
+    for name, files in manifest['tables'].items():
+        lut.use_table(lut.LookupTable(name, mapped(files['grid']), mapped(files['values'])))
+    return list(manifest['controllers'])
+
+
+def load_from_env():
+    directory = os.environ.get(ARTIFACTS_DIR_ENV)
+    if not directory:
+        return []
+    if not os.path.exists(os.path.join(directory, MANIFEST)):
+        build_artifacts(directory, os.environ.get(lut.LUT_DIR_ENV))
+    return load_artifacts(directory)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='mindbloom artifacts', description='Build shared controller artifacts for worker processes.')
+    parser.add_argument('command', choices=['build'])
+    parser.add_argument('directory')
+    parser.add_argument('--lut-dir', help='lookup tables to include (default: MINDBLOOM_LUT_DIR)')
+    args = parser.parse_args(argv)
+
+    manifest = build_artifacts(args.directory, args.lut_dir or os.environ.get(lut.LUT_DIR_ENV), replace=True)
+    print(json.dumps({'directory': os.path.abspath(args.directory), 'controllers': list(manifest['controllers']),
+                      'tables': list(manifest['tables'])}))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,232 @@
+import argparse
+import functools
+import glob
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import numpy as np
+from mindbloom.context import score_sessions
+from mindbloom.controllers import CONTROLLER_NAMES
+from mindbloom.engine import ENGINES_ENV
+from mindbloom.workers import warm_up_worker
+
+# Offline rescoring of recorded sessions (`mindbloom backfill INPUT OUTPUT`).
+#
+# INPUT is either
+#   - a directory of session files: .npz with emotion, speed, ranges and symmetry
+#     arrays (as sent to /emotion_state), or .npy of shape (n, 10) holding the 7
+#     emotion columns followed by speed, ranges and symmetry
+#   - an archive directory written by write_archive: emotion.npy (total_frames, 7),
+#     motion.npy (total_samples, 3) and offsets.npy, the (n_sessions + 1, 2) frame and
+#     sample offsets of each session
+# Files and archives are opened memory-mapped where numpy allows it, and each task
+# only touches the sessions of its chunk, so the archive is never loaded whole.
+#
+# Chunks of --chunk-size sessions are scored by a process pool whose workers build
+# every controller at start (workers.warm_up_worker), one context.score_sessions batch
+# per chunk. Each finished chunk is written to OUTPUT/parts/part-NNNNNN.npz (written to
+# a temporary name, then renamed), which is the checkpoint: rerunning the same command
+# skips chunks that already have a part. OUTPUT/manifest.json records the input,
+# chunking, --max-samples and engines (MINDBLOOM_ENGINES, or --engine for every
+# controller); a rerun with any of them changed is refused unless --restart. Once all chunks are done they are merged into
+# the columnar OUTPUT/scores.npz:
+#   session, focus_score, motor_engagement_score, emotion_stability_score, error
+# where session is the file name or archive index, and error is '' unless scoring failed.
+# --max-samples scores long motion series on reduced rows (mindbloom.reduction).
+
+ARCHIVE_FILES = ('emotion.npy', 'motion.npy', 'offsets.npy')
+SESSION_PATTERNS = ('*.npz', '*.npy')
+SCORE_COLUMNS = ('focus_score', 'motor_engagement_score', 'emotion_stability_score')
+DEFAULT_CHUNK_SIZE = 256
+
+
+def write_archive(directory, sessions, dtype=np.float64):
+    # Packs (emotion, speed, ranges, symmetry) sessions into the archive layout
+    os.makedirs(directory, exist_ok=True)
+    emotions, motions, offsets = [np.empty((0, 7), dtype)], [np.empty((0, 3), dtype)], [(0, 0)]
+    for emotion, speed, ranges, symmetry in sessions:
+        emotions.append(np.asarray(emotion, dtype=dtype).reshape(-1, 7))
+        motions.append(np.column_stack([speed, ranges, symmetry]).astype(dtype))
+        offsets.append((offsets[-1][0] + len(emotions[-1]), offsets[-1][1] + len(motions[-1])))
+    np.save(os.path.join(directory, 'emotion.npy'), np.concatenate(emotions))
+    np.save(os.path.join(directory, 'motion.npy'), np.concatenate(motions))
+    np.save(os.path.join(directory, 'offsets.npy'), np.asarray(offsets, dtype=np.int64))
+
+
+def is_archive(directory):
+    return all(os.path.exists(os.path.join(directory, name)) for name in ARCHIVE_FILES)
+
+
+class ArchiveSource:
+    def __init__(self, directory):
+        self.directory = directory
+        self.emotion = np.load(os.path.join(directory, 'emotion.npy'), mmap_mode='r')
+        self.motion = np.load(os.path.join(directory, 'motion.npy'), mmap_mode='r')
+        self.offsets = np.load(os.path.join(directory, 'offsets.npy'), mmap_mode='r')
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def names(self, start, stop):
+        return np.arange(start, stop).astype(str)
+
+    def sessions(self, start, stop):
+        for (f0, s0), (f1, s1) in zip(self.offsets[start:stop], self.offsets[start + 1:stop + 1]):
+            motion = self.motion[s0:s1]
+            yield self.emotion[f0:f1], motion[:, 0], motion[:, 1], motion[:, 2]
+
+
+class FileSource:
+    def __init__(self, directory):
+        self.directory = directory
+        self.paths = sorted(path for pattern in SESSION_PATTERNS for path in glob.glob(os.path.join(directory, pattern)))
+
+    def __len__(self):
+        return len(self.paths)
+
+    def names(self, start, stop):
+        return np.array([os.path.basename(path) for path in self.paths[start:stop]])
+
+    def sessions(self, start, stop):
+        for path in self.paths[start:stop]:
+            if path.endswith('.npz'):
+                with np.load(path, allow_pickle=False) as archive:
+                    yield archive['emotion'], archive['speed'], archive['ranges'], archive['symmetry']
+            else:
+                rows = np.load(path, mmap_mode='r')
+                yield rows[:, :7], rows[:, 7], rows[:, 8], rows[:, 9]
+
+
+@functools.lru_cache(maxsize=None)
+def open_source(directory):
+    # Once per process; workers reopen the memmaps themselves instead of receiving them
+    return ArchiveSource(directory) if is_archive(directory) else FileSource(directory)
+
+
+def score_chunk(directory, start, stop, max_samples=None):
+    source = open_source(directory)
+    results = score_sessions([(*session, max_samples) for session in source.sessions(start, stop)])
+    columns = {'session': source.names(start, stop)}
+    for column in SCORE_COLUMNS:
+        columns[column] = np.array([np.nan if isinstance(r, Exception) else float(r[column]) for r in results])
+    columns['error'] = np.array([(str(r) or type(r).__name__) if isinstance(r, Exception) else '' for r in results])
+    return columns
+
+
+def _part_path(output, chunk):
+    return os.path.join(output, 'parts', f'part-{chunk:06d}.npz')
+
+
+def _write_part(output, chunk, columns):
+    path = _part_path(output, chunk)
+    temporary = path + '.tmp.npz'
+    np.savez(temporary, **columns)
+    os.replace(temporary, path)
+
+
+def _check_manifest(output, manifest, restart):
+    path = os.path.join(output, 'manifest.json')
+    if restart and os.path.exists(output):
+        shutil.rmtree(os.path.join(output, 'parts'), ignore_errors=True)
+    elif os.path.exists(path):
+        with open(path) as f:
+            previous = json.load(f)
+        if previous != manifest:
+            raise SystemExit(f"{output} holds a backfill of different input or settings {previous}; use --restart.")
+    os.makedirs(os.path.join(output, 'parts'), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(manifest, f)
+
+
+def merge_parts(output, chunks):
+    parts = [{'session': np.empty(0, str), 'error': np.empty(0, str), **{c: np.empty(0) for c in SCORE_COLUMNS}}]
+    for chunk in range(chunks):
+        with np.load(_part_path(output, chunk), allow_pickle=False) as part:
+            parts.append({key: part[key] for key in part.files})
+    columns = {key: np.concatenate([part[key] for part in parts]) for key in ('session', *SCORE_COLUMNS, 'error')}
+    np.savez(os.path.join(output, 'scores.npz'), **columns)
+    return columns
+
+
+def run_backfill(input_dir, output, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, restart=False,
+                 progress_every=10.0, log=sys.stderr, max_samples=None, engine=None):
+    if engine:
+        # Workers configure themselves from the environment they inherit
+        os.environ[ENGINES_ENV] = ','.join(f"{name}={engine}" for name in CONTROLLER_NAMES)
+    input_dir = os.path.abspath(input_dir)
+    total = len(open_source(input_dir))
+    chunks = -(-total // chunk_size)
+    _check_manifest(output, {'input': input_dir, 'sessions': total, 'chunk_size': chunk_size,
+                             'max_samples': max_samples, 'engines': os.environ.get(ENGINES_ENV) or None}, restart)
+    todo = [chunk for chunk in range(chunks) if not os.path.exists(_part_path(output, chunk))]
+    done_sessions = 0
+    started = last_report = time.perf_counter()
+
+    def finished(chunk, columns):
+        nonlocal done_sessions, last_report
+        _write_part(output, chunk, columns)
+        done_sessions += len(columns['session'])
+        now = time.perf_counter()
+        if now - last_report >= progress_every:
+            last_report = now
+            print(f"{done_sessions} sessions scored, {done_sessions / (now - started):.1f}/s", file=log)
+
+    if workers == 0:
+        # In-process, for debugging
+        warm_up_worker()
+        for chunk in todo:
+            finished(chunk, score_chunk(input_dir, chunk * chunk_size, min(total, (chunk + 1) * chunk_size), max_samples))
+    elif todo:
+        workers = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(workers, initializer=warm_up_worker) as executor:
+            max_inflight = 2 * workers
+            pending = {}
+            queue = iter(todo)
+            while True:
+                for chunk in queue:
+                    future = executor.submit(score_chunk, input_dir, chunk * chunk_size, min(total, (chunk + 1) * chunk_size),
+                                             max_samples)
+                    pending[future] = chunk
+                    if len(pending) >= max_inflight:
+                        break
+                if not pending:
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    finished(pending.pop(future), future.result())
+
+    elapsed = time.perf_counter() - started
+    columns = merge_parts(output, chunks)
+    return {
+        'sessions': total,
+        'scored': done_sessions,
+        'resumed_chunks': chunks - len(todo),
+        'errors': int(np.count_nonzero(columns['error'])),
+        'seconds': elapsed,
+        'sessions_per_s': done_sessions / elapsed if elapsed else 0.0,
+        'output': os.path.join(output, 'scores.npz'),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='mindbloom backfill', description='Rescore recorded sessions offline.')
+    parser.add_argument('input', help='directory of .npz/.npy sessions or an archive written by write_archive')
+    parser.add_argument('output', help='directory for checkpoints and scores.npz')
+    parser.add_argument('--workers', type=int, help='worker processes (default: CPU count, 0: in-process)')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--engine', help='fuzzy engine for every controller, e.g. analytic (default: MINDBLOOM_ENGINES)')
+    parser.add_argument('--restart', action='store_true', help='discard checkpoints from an earlier run')
+    parser.add_argument('--max-samples', type=int, help='reduce longer motion series to this many rows before inference')
+    parser.add_argument('--progress-every', type=float, default=10.0, help='seconds between progress lines')
+    args = parser.parse_args(argv)
+
+    report = run_backfill(args.input, args.output, args.workers, args.chunk_size, args.restart, args.progress_every,
+                          max_samples=args.max_samples, engine=args.engine)
+    print(json.dumps(report))
+
+
+if __name__ == '__main__':
+    main()
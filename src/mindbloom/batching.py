@@ -0,0 +1,101 @@
+import asyncio
+import os
+import time
+from mindbloom.context import score_sessions
+from mindbloom.metrics import detach_request
+
+# Micro-batching coalescer for /emotion_state (opt-in).
+#
+# Concurrent requests are buffered for up to MINDBLOOM_BATCH_WINDOW_MS milliseconds
+# or until MINDBLOOM_BATCH_MAX sessions are waiting, then scored together by
+# context.score_sessions in one job on the scoring pool (one inference pass per
+# controller for the whole batch), and each result is handed back to its request.
+# A window of 0 (the default) disables batching.
+
+BATCH_WINDOW_ENV = 'MINDBLOOM_BATCH_WINDOW_MS'
+BATCH_MAX_ENV = 'MINDBLOOM_BATCH_MAX'
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+
+class RequestBatcher:
+    def __init__(self, pool, window_ms=5.0, max_batch=32, with_intermediates=False):
+        self.pool = pool
+        # Results are (scores, intermediates) pairs, as from score_session(..., True)
+        self.with_intermediates = with_intermediates
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self._pending = []
+        self._timer = None
+
+        self.batches = 0
+        self.sessions = 0
+        self.max_batch_size = 0
+        self.batch_sizes = {bucket: 0 for bucket in BATCH_SIZE_BUCKETS}
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    @classmethod
+    def from_env(cls, pool, with_intermediates=False):
+        window_ms = float(os.environ.get(BATCH_WINDOW_ENV, 0))
+        if window_ms <= 0:
+            return None
+        return cls(pool, window_ms, int(os.environ.get(BATCH_MAX_ENV, 32)), with_intermediates)
+
+    async def submit(self, session):
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((session, future, time.perf_counter()))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.ensure_future(self._run(batch))
+
+    def _record(self, batch):
+        now = time.perf_counter()
+        waits = [now - queued for _, _, queued in batch]
+        self.batches += 1
+        self.sessions += len(batch)
+        self.max_batch_size = max(self.max_batch_size, len(batch))
+        bucket = next((b for b in BATCH_SIZE_BUCKETS if len(batch) <= b), BATCH_SIZE_BUCKETS[-1])
+        self.batch_sizes[bucket] += 1
+        self.total_wait += sum(waits)
+        self.max_wait = max(self.max_wait, max(waits))
+
+    async def _run(self, batch):
+        # The batch belongs to no single request's timing breakdown
+        detach_request()
+        self._record(batch)
+        try:
+            results = await self.pool.run(score_sessions, [session for session, _, _ in batch], self.with_intermediates)
+        except Exception as error:
+            results = [error] * len(batch)
+        for (_, future, _), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def stats(self):
+        return {
+            'window_ms': self.window * 1000.0,
+            'max_batch': self.max_batch,
+            'batches': self.batches,
+            'sessions': self.sessions,
+            'mean_batch_size': self.sessions / self.batches if self.batches else 0.0,
+            'max_batch_size': self.max_batch_size,
+            # Batches per size bucket, keyed by the bucket's upper bound
+            'batch_size_histogram': self.batch_sizes,
+            'mean_wait_ms': self.total_wait / self.sessions * 1000.0 if self.sessions else 0.0,
+            'max_wait_ms': self.max_wait * 1000.0,
+        }
@@ -0,0 +1,163 @@
+import asyncio
+import json
+import os
+from collections import deque
+from pydantic import ValidationError
+from mindbloom.context import score_sessions
+from mindbloom.engine import finite_or_none
+from mindbloom.payload import iter_binary_sessions, validate_session
+from mindbloom.schemas import EmotionInput
+
+# Bulk scoring for /emotion_state/batch.
+#
+# Sessions arrive as a JSON array of EmotionInput objects, as NDJSON (one object
+# per line, read incrementally from the request stream) or as back-to-back binary
+# sessions (see mindbloom.payload). They are grouped into chunks
+# of MINDBLOOM_BULK_CHUNK sessions, each chunk is one context.score_sessions job on
+# the scoring pool, and results are streamed back as NDJSON lines in input order:
+#   {"index": 0, "focus_score": ..., "motor_engagement_score": ..., "emotion_stability_score": ...}
+#   {"index": 1, "error": "..."}
+# Invalid or failing sessions only produce an error line; the rest of the batch is scored.
+
+BULK_CHUNK_ENV = 'MINDBLOOM_BULK_CHUNK'
+NDJSON_TYPES = ('application/x-ndjson', 'application/jsonl', 'application/ndjson')
+
+
+def chunk_size_from_env():
+    return int(os.environ.get(BULK_CHUNK_ENV, 64))
+
+
+def is_ndjson(content_type):
+    return (content_type or '').split(';')[0].strip() in NDJSON_TYPES
+
+
+def _validated(session):
+    try:
+        return validate_session(*session)
+    except ValueError as error:
+        return error
+
+
+def _parse(item):
+    try:
+        if isinstance(item, (str, bytes)):
+            return _validated(EmotionInput.model_validate_json(item).session())
+        return _validated(EmotionInput.model_validate(item).session())
+    except ValidationError as error:
+        return ValueError(f"Invalid session: {error.errors(include_url=False, include_input=False)}")
+
+
+async def iter_ndjson(stream):
+    buffer = b''
+    async for data in stream:
+        buffer += data
+        *lines, buffer = buffer.split(b'\n')
+        for line in lines:
+            if line.strip():
+                yield _parse(line)
+    if buffer.strip():
+        yield _parse(buffer)
+
+
+async def iter_json_array(body):
+    try:
+        items = json.loads(body)
+    except ValueError as error:
+        yield ValueError(f"Invalid JSON body: {error}")
+        return
+    if not isinstance(items, list):
+        yield ValueError("Expected a JSON array of sessions.")
+        return
+    for item in items:
+        yield _parse(item)
+
+
+async def iter_binary(body):
+    try:
+        for session in iter_binary_sessions(body):
+            yield _validated(session)
+    except ValueError as error:
+        # Sessions after a malformed one cannot be located
+        yield error
+
+
+def _result_line(index, result):
+    if isinstance(result, Exception):
+        line = {"index": index, "error": str(result) or type(result).__name__}
+    else:
+        # NaN means no rule fired for that controller
+        line = {"index": index, **{k: finite_or_none(v) for k, v in result.items()}}
+    return json.dumps(line) + "\n"
+
+
+async def _score_chunk(pool, chunk):
+    sessions = [s for s in chunk if not isinstance(s, Exception)]
+    try:
+        scored = iter(await pool.run(score_sessions, sessions) if sessions else [])
+    except Exception as error:
+        scored = iter([error] * len(sessions))
+    return [s if isinstance(s, Exception) else next(scored) for s in chunk]
+
+
+class ChunkScorer:
+    # Groups sessions into chunks, keeps up to max_inflight chunks scoring at once
+    # and hands their NDJSON lines back in input order
+    def __init__(self, pool, chunk_size=64, max_inflight=None):
+        self.pool = pool
+        self.chunk_size = chunk_size
+        self.max_inflight = max_inflight or max(1, min(pool.workers, pool.max_queue))
+        self.inflight = deque()
+        self.chunk = []
+        self.index = 0
+
+    def _schedule(self):
+        if self.chunk:
+            self.inflight.append(asyncio.ensure_future(_score_chunk(self.pool, self.chunk)))
+            self.chunk = []
+
+    def add(self, session):
+        # Returns True when the caller should collect a chunk before adding more
+        self.chunk.append(session)
+        if len(self.chunk) >= self.chunk_size:
+            self._schedule()
+        return len(self.inflight) >= self.max_inflight
+
+    def close(self):
+        self._schedule()
+
+    async def next_lines(self):
+        results = await self.inflight.popleft()
+        lines = ''.join(_result_line(self.index + i, result) for i, result in enumerate(results))
+        self.index += len(results)
+        return lines
+
+    async def remaining(self, ready=()):
+        for lines in ready:
+            yield lines
+        while self.inflight:
+            yield await self.next_lines()
+
+
+async def stream_scores(pool, sessions, chunk_size=64):
+    # For input already in memory: lines are yielded while later chunks score
+    scorer = ChunkScorer(pool, chunk_size)
+    async for session in sessions:
+        if scorer.add(session):
+            yield await scorer.next_lines()
+    scorer.close()
+    async for lines in scorer.remaining():
+        yield lines
+
+
+async def score_while_reading(pool, sessions, chunk_size=64):
+    # For input read from the request stream. The body must be fully read before the
+    # response starts (StreamingResponse listens on the same receive channel for
+    # disconnects), so chunks score while the body arrives, finished lines are held
+    # back, and the returned generator streams them followed by the rest.
+    scorer = ChunkScorer(pool, chunk_size)
+    ready = []
+    async for session in sessions:
+        if scorer.add(session):
+            ready.append(await scorer.next_lines())
+    scorer.close()
+    return scorer.remaining(ready)
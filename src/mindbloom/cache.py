@@ -0,0 +1,187 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from mindbloom import engine
+from mindbloom.metrics import count
+
+# Result cache in front of a fuzzy controller.
+#
+# Inputs are quantized to `precision` decimals and the controller runs on the
+# quantized row, so the cached value for a key never depends on which input filled
+# it. Entries live in a per-process LRU of `max_size` keys, each expiring `ttl`
+# seconds after it was stored (no expiry when ttl is None). With a SharedStore,
+# misses are looked up in a SQLite file shared by every worker process before the
+# controller runs (put it on /dev/shm to keep it in memory).
+#
+# Configured from the environment by configure_from_env():
+#   MINDBLOOM_CACHE            controllers to cache, e.g. "focus,stability,pause_frequency"
+#   MINDBLOOM_CACHE_PRECISION  decimals kept from each input, defaults to 4
+#   MINDBLOOM_CACHE_SIZE       LRU entries per controller and process, defaults to 4096
+#   MINDBLOOM_CACHE_TTL        seconds an entry stays valid, 0 (default) for no expiry
+#   MINDBLOOM_CACHE_FILE       SQLite file for the shared store, unset for none
+#
+# Hits, shared hits, misses, evictions and expirations are counted in
+# mindbloom_cache_events_total on /metrics.
+
+CACHE_ENV = 'MINDBLOOM_CACHE'
+CACHE_PRECISION_ENV = 'MINDBLOOM_CACHE_PRECISION'
+CACHE_SIZE_ENV = 'MINDBLOOM_CACHE_SIZE'
+CACHE_TTL_ENV = 'MINDBLOOM_CACHE_TTL'
+CACHE_FILE_ENV = 'MINDBLOOM_CACHE_FILE'
+
+CACHE_EVENTS = 'mindbloom_cache_events_total'
+# Shared-store inserts between trims of expired and surplus rows
+TRIM_EVERY = 256
+
+
+class SharedStore:
+    def __init__(self, path, max_size=65536):
+        self.path = path
+        self.max_size = max_size
+        self._local = threading.local()
+        self._inserts = 0
+        with self._connection() as db:
+            db.execute('CREATE TABLE IF NOT EXISTS results ('
+                       'controller TEXT, key TEXT, value REAL, expires REAL, PRIMARY KEY (controller, key))')
+
+    def _connection(self):
+        # One connection per thread; WAL lets processes read while another writes
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = self._local.db = sqlite3.connect(self.path, timeout=5.0)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=OFF')
+        return db
+
+    def get_many(self, controller, keys):
+        found = {}
+        db = self._connection()
+        now = time.time()
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = db.execute(
+                f'SELECT key, value FROM results WHERE controller = ? AND key IN ({",".join("?" * len(chunk))}) '
+                'AND (expires IS NULL OR expires > ?)', [controller, *chunk, now])
+            found.update(rows)
+        return found
+
+    def put_many(self, controller, items, ttl=None):
+        expires = time.time() + ttl if ttl else None
+        with self._connection() as db:
+            db.executemany('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)',
+                           [(controller, key, value, expires) for key, value in items])
+            self._inserts += len(items)
+            if self._inserts >= TRIM_EVERY:
+                self._inserts = 0
+                self._trim(db, controller)
+
+    def _trim(self, db, controller):
+        # Oldest rows go first: INSERT OR REPLACE gives every write a new rowid
+        db.execute('DELETE FROM results WHERE expires IS NOT NULL AND expires <= ?', [time.time()])
+        db.execute('DELETE FROM results WHERE controller = ? AND rowid IN '
+                   '(SELECT rowid FROM results WHERE controller = ? ORDER BY rowid DESC LIMIT -1 OFFSET ?)',
+                   [controller, controller, self.max_size])
+
+
+class ResultCache:
+    def __init__(self, name, precision=4, max_size=4096, ttl=None, shared=None):
+        self.name = name
+        self.precision = precision
+        self.scale = 10.0 ** precision
+        self.max_size = max_size
+        self.ttl = ttl
+        self.shared = shared
+        self._entries = OrderedDict()  # key -> (value, expires)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _store(self, keys, values, now):
+        expires = now + self.ttl if self.ttl else None
+        evicted = 0
+        with self._lock:
+            for key, value in zip(keys, values):
+                self._entries[key] = (value, expires)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                evicted += 1
+        return evicted
+
+    def infer(self, X, compute):
+        X = np.asarray(X, dtype=float)
+        if X.size == 0 or not np.isfinite(X).all():
+            return compute(X)
+        quantized = np.round(np.atleast_2d(X) * self.scale)
+        keys = [','.join(map(str, row)) for row in quantized.astype(np.int64).tolist()]
+        results = np.empty(len(keys))
+        now = time.time()
+
+        missing = []
+        expired = 0
+        with self._lock:
+            for i, key in enumerate(keys):
+                entry = self._entries.get(key)
+                if entry is not None and (entry[1] is None or entry[1] > now):
+                    self._entries.move_to_end(key)
+                    results[i] = entry[0]
+                    continue
+                if entry is not None:
+                    del self._entries[key]
+                    expired += 1
+                missing.append(i)
+        hits = len(keys) - len(missing)
+
+        shared_hits = 0
+        if missing and self.shared is not None:
+            found = self.shared.get_many(self.name, sorted({keys[i] for i in missing}))
+            if found:
+                still_missing = []
+                for i in missing:
+                    if keys[i] in found:
+                        results[i] = found[keys[i]]
+                    else:
+                        still_missing.append(i)
+                shared_hits = len(missing) - len(still_missing)
+                self._store(list(found), list(found.values()), now)
+                missing = still_missing
+
+        evicted = 0
+        if missing:
+            values = compute(quantized[missing] / self.scale)
+            results[missing] = values
+            missing_keys = [keys[i] for i in missing]
+            evicted = self._store(missing_keys, values.tolist(), now)
+            if self.shared is not None:
+                self.shared.put_many(self.name, list(zip(missing_keys, values.tolist())), self.ttl)
+
+        for event, value in (('hit', hits), ('shared_hit', shared_hits), ('miss', len(missing)),
+                             ('eviction', evicted), ('expired', expired)):
+            count(CACHE_EVENTS, (self.name, event), value)
+        return results
+
+
+def use_cache(name, precision=4, max_size=4096, ttl=None, shared=None):
+    cache = ResultCache(name, precision, max_size, ttl, shared)
+    engine.set_cache(name, cache)
+    return cache
+
+
+def configure_from_env():
+    names = [name.strip() for name in os.environ.get(CACHE_ENV, '').split(',') if name.strip()]
+    if not names:
+        return []
+    max_size = int(os.environ.get(CACHE_SIZE_ENV, 4096))
+    ttl = float(os.environ.get(CACHE_TTL_ENV, 0)) or None
+    path = os.environ.get(CACHE_FILE_ENV)
+    shared = SharedStore(path, max_size * 16) if path else None
+    precision = int(os.environ.get(CACHE_PRECISION_ENV, 4))
+    return [use_cache(name, precision, max_size, ttl, shared) for name in names]
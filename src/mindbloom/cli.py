@@ -0,0 +1,24 @@
+import importlib
+import sys
+
+# `mindbloom` console entry point: `mindbloom COMMAND [ARGS]` runs COMMAND's own CLI.
+
+COMMANDS = {
+    'artifacts': 'mindbloom.artifacts',
+    'backfill': 'mindbloom.backfill',
+    'engine': 'mindbloom.engine',
+    'lut': 'mindbloom.lut',
+    'reduce': 'mindbloom.reduction',
+}
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] not in COMMANDS:
+        print(f"usage: mindbloom {{{','.join(COMMANDS)}}} ...", file=sys.stderr)
+        sys.exit(2)
+    importlib.import_module(COMMANDS[argv[0]]).main(argv[1:])
+
+
+if __name__ == '__main__':
+    main()
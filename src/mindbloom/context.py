@@ -0,0 +1,194 @@
+from functools import cached_property
+import numpy as np
+from mindbloom.engine import infer
+from mindbloom.features import extract_features
+from mindbloom.metrics import observe_size
+from mindbloom.focus import get_reaction_data, score_focus
+from mindbloom.pause_frequency import get_pause_frequency
+from mindbloom.reaction_time_ms import get_reaction_time_ms
+from mindbloom.reduction import normalized_mean, reduce_motion
+from mindbloom.stablity import score_stability
+
+# Request-scoped scoring context.
+#
+# The three scores share intermediates: reaction-time inference over the motion rows
+# feeds the pause-frequency controller, the focus controller and motor engagement, and
+# the speed/range/symmetry normalizations feed several of them. Each intermediate is
+# a cached property, so it is computed at most once per context however many scores
+# ask for it:
+#
+#   reaction_data -> reaction_times -> normalized_reaction_time -> pause_frequency -> focus_score
+#                                   \-> motor_engagement_score
+#   emotions -> features -> input_focus -> focus_score
+#                        \-> emotion_features -> emotion_stability_score
+#
+# With max_samples, the motion rows are first reduced to at most that many weighted
+# rows (mindbloom.reduction) and every motion aggregate is a weighted one.
+
+
+class ScoringContext:
+    def __init__(self, emotion, speed, ranges, symmetry, max_samples=None):
+        self.emotion = emotion
+        self.speed = speed
+        self.ranges = ranges
+        self.symmetry = symmetry
+        self.max_samples = max_samples
+        observe_size('frames', len(emotion))
+        observe_size('samples', len(speed))
+
+    @cached_property
+    def emotions(self):
+        return np.asarray(self.emotion, dtype=float)
+
+    @cached_property
+    def motion(self):
+        # (rows, weights); weights is None unless the rows were reduced
+        return reduce_motion(get_reaction_data(self.speed, self.ranges, self.symmetry), self.max_samples)
+
+    @cached_property
+    def reaction_data(self):
+        return self.motion[0]
+
+    @cached_property
+    def sample_weights(self):
+        return self.motion[1]
+
+    @cached_property
+    def reaction_times(self):
+        return get_reaction_time_ms(self.reaction_data)
+
+    @cached_property
+    def normalized_reaction_time(self):
+        return normalized_mean(self.reaction_times, self.sample_weights)
+
+    @cached_property
+    def normalized_speed(self):
+        return normalized_mean(self.reaction_data[:, 0], self.sample_weights)
+
+    @cached_property
+    def normalized_range(self):
+        return normalized_mean(self.reaction_data[:, 1], self.sample_weights)
+
+    @cached_property
+    def normalized_symmetry(self):
+        return normalized_mean(self.reaction_data[:, 2], self.sample_weights)
+
+    @cached_property
+    def pause_frequency(self):
+        return get_pause_frequency(self.normalized_reaction_time, self.normalized_speed,
+                                   self.normalized_range, self.normalized_symmetry)
+
+    @cached_property
+    def features(self):
+        return extract_features(self.emotions)
+
+    @cached_property
+    def input_focus(self):
+        return self.features.input_focus
+
+    @cached_property
+    def emotion_features(self):
+        # (volatility, microexpression_count, expression_change_count)
+        return self.features.volatility, self.features.microexpression_count, self.features.expression_change_count
+
+    @cached_property
+    def focus_score(self):
+        return score_focus(self.input_focus, self.pause_frequency, self.normalized_reaction_time)
+
+    @cached_property
+    def motor_engagement_score(self):
+        engagement = infer('motor_engagement', np.column_stack([self.reaction_times, self.reaction_data[:, :2]]))
+        return round(float(normalized_mean(engagement, self.sample_weights)), 3)
+
+    @cached_property
+    def emotion_stability_score(self):
+        return score_stability(*self.emotion_features)
+
+    def scores(self):
+        # Plain floats, like intermediates()
+        return {
+            "focus_score": float(self.focus_score),
+            "motor_engagement_score": float(self.motor_engagement_score),
+            "emotion_stability_score": float(self.emotion_stability_score),
+        }
+
+    def intermediates(self):
+        # Controller inputs behind the scores, as plain floats
+        volatility, microexpression_count, expression_change_count = self.emotion_features
+        return {
+            "frames": len(self.emotions),
+            "samples": min(len(self.speed), len(self.ranges), len(self.symmetry)),
+            "scored_samples": len(self.reaction_data),
+            "input_focus": float(self.input_focus),
+            "emotion_volatility": float(volatility),
+            "microexpression_count": float(microexpression_count),
+            "expression_change_count": float(expression_change_count),
+            "normalized_reaction_time": float(self.normalized_reaction_time),
+            "normalized_speed": float(self.normalized_speed),
+            "normalized_range": float(self.normalized_range),
+            "normalized_symmetry": float(self.normalized_symmetry),
+            "pause_frequency": float(self.pause_frequency),
+        }
+
+    def result(self, with_intermediates=False):
+        return (self.scores(), self.intermediates()) if with_intermediates else self.scores()
+
+
+def score_session(emotion, speed, ranges, symmetry, with_intermediates=False, max_samples=None):
+    # Module-level entry point so worker processes can run it
+    return ScoringContext(emotion, speed, ranges, symmetry, max_samples).result(with_intermediates)
+
+
+def _infer_blocks(name, blocks):
+    # One inference over the stacked row blocks, split back per block
+    sizes = [len(block) for block in blocks]
+    results = infer(name, np.concatenate(blocks)) if sum(sizes) else np.empty(0)
+    return np.split(results, np.cumsum(sizes)[:-1])
+
+
+def _prepare(session):
+    # Everything a session computes on its own before the batched inference, so
+    # invalid input fails here, per session
+    context = ScoringContext(*session)
+    for name in ('normalized_speed', 'normalized_range', 'normalized_symmetry', 'input_focus', 'emotion_features'):
+        getattr(context, name)
+    return context
+
+
+def _score_batched(contexts, with_intermediates=False):
+    for context, reaction_times in zip(contexts, _infer_blocks('reaction_time', [c.reaction_data for c in contexts])):
+        context.reaction_times = reaction_times
+
+    pause_rows = [[(c.normalized_reaction_time, c.normalized_speed, c.normalized_range, c.normalized_symmetry)] for c in contexts]
+    for context, pause_frequency in zip(contexts, _infer_blocks('pause_frequency', pause_rows)):
+        context.pause_frequency = round(float(pause_frequency[0]), 3)
+
+    focus_rows = [[(c.input_focus, c.pause_frequency, c.normalized_reaction_time)] for c in contexts]
+    for context, focus_score in zip(contexts, _infer_blocks('focus', focus_rows)):
+        context.focus_score = round(float(focus_score[0]), 3)
+
+    motor_rows = [np.column_stack([c.reaction_times, c.reaction_data[:, 0], c.reaction_data[:, 1]]) for c in contexts]
+    for context, engagement_score in zip(contexts, _infer_blocks('motor_engagement', motor_rows)):
+        context.motor_engagement_score = round(float(normalized_mean(engagement_score, context.sample_weights)), 3)
+
+    stability_rows = [[c.emotion_features] for c in contexts]
+    for context, stability_score in zip(contexts, _infer_blocks('stability', stability_rows)):
+        context.emotion_stability_score = round(float(stability_score[0]), 3)
+
+    return [c.result(with_intermediates) for c in contexts]
+
+
+def score_sessions(sessions, with_intermediates=False):
+    # Scores many (emotion, speed, ranges, symmetry[, max_samples]) sessions with one inference
+    # pass per controller across all of them. Sessions are validated one by one first, so
+    # a bad session only fails itself and the others are still scored in one batch: its
+    # entry in the returned list is the exception instead of a scores dict (or (scores,
+    # intermediates) pair with with_intermediates).
+    contexts = []
+    for session in sessions:
+        try:
+            contexts.append(_prepare(session))
+        except Exception as error:
+            contexts.append(error)
+    scored = iter(_score_batched([c for c in contexts if not isinstance(c, Exception)], with_intermediates))
+    return [c if isinstance(c, Exception) else next(scored) for c in contexts]
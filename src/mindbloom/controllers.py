@@ -0,0 +1,138 @@
+import threading
+from contextlib import contextmanager
+from mindbloom.metrics import timed
+
+# Registry of the fuzzy control systems used by the scorers.
+# Each ControlSystem is built once per process and then only read. skfuzzy keeps
+# simulation inputs on the shared Antecedent objects, so a simulation must never be
+# used by two threads at once: `simulation(name)` hands out pooled simulations that
+# each own a private copy of the graph, built on first use and reused afterwards.
+# skfuzzy itself is only imported when a graph is built, so importing the scorers
+# stays cheap and the cost moves to the warm-up stage (workers.warm_up_worker).
+
+CONTROLLER_NAMES = ('reaction_time', 'pause_frequency', 'motor_engagement', 'focus', 'stability')
+
+# Antecedent labels in input-column order, and the consequent label, per controller
+CONTROLLER_INPUTS = {
+    'reaction_time': ('speed', 'range', 'symmetry'),
+    'pause_frequency': ('reaction_time', 'speed', 'range', 'symmetry'),
+    'motor_engagement': ('reaction_time', 'speed', 'range'),
+    'focus': ('focus', 'pause_frequency', 'reaction_time_ms'),
+    'stability': ('emotion_volatility', 'microexpression_count', 'expression_change_count'),
+}
+CONTROLLER_OUTPUTS = {
+    'reaction_time': 'normalized_reaction_time',
+    'pause_frequency': 'pause_frequency',
+    'motor_engagement': 'motor_engagement',
+    'focus': 'focus_attention_score',
+    'stability': 'emotional_stability',
+}
+
+# Triangle parameters [a, b, c] per term, shared by the controllers' variables. Each
+# scorer module maps its variables to these sets in MEMBERSHIP_FUNCTIONS, which its
+# skfuzzy builder (through `add_triangles`) and the analytic engine both read.
+LEVEL_TRIANGLES = {
+    'low': [0.0, 0.0, 0.5],
+    'medium': [0.25, 0.5, 0.75],
+    'high': [0.5, 1.0, 1.0],
+}
+# Focus and stability variables
+FIVE_LEVEL_TRIANGLES = {
+    'very_low': [0.0, 0.0, 0.2],
+    'low': [0.1, 0.25, 0.4],
+    'medium': [0.35, 0.5, 0.65],
+    'high': [0.6, 0.75, 0.9],
+    'very_high': [0.8, 1.0, 1.0],
+}
+# Reaction time and motor engagement: a wider medium
+WIDE_FIVE_LEVEL_TRIANGLES = {**FIVE_LEVEL_TRIANGLES, 'medium': [0.3, 0.5, 0.7]}
+
+_lock = threading.Lock()
+_systems = {}
+_pools = {name: [] for name in CONTROLLER_NAMES}
+
+
+def _builders():
+    from mindbloom.focus import build_focus_ctrl
+    from mindbloom.motor_engagement import build_motor_ctrl
+    from mindbloom.pause_frequency import build_pause_ctrl
+    from mindbloom.reaction_time_ms import build_reaction_ctrl
+    from mindbloom.stablity import build_stability_ctrl
+
+    return {
+        'reaction_time': build_reaction_ctrl,
+        'pause_frequency': build_pause_ctrl,
+        'motor_engagement': build_motor_ctrl,
+        'focus': build_focus_ctrl,
+        'stability': build_stability_ctrl,
+    }
+
+
+def add_triangles(var, triangles):
+    import skfuzzy as fuzz
+
+    for label, abc in triangles.items():
+        var[label] = fuzz.trimf(var.universe, abc)
+
+
+def get_membership_functions(name):
+    # Triangle parameters [a, b, c] per variable label and term, as used by the builders
+    from mindbloom import focus, motor_engagement, pause_frequency, reaction_time_ms, stablity
+
+    modules = {
+        'reaction_time': reaction_time_ms,
+        'pause_frequency': pause_frequency,
+        'motor_engagement': motor_engagement,
+        'focus': focus,
+        'stability': stablity,
+    }
+    return modules[name].MEMBERSHIP_FUNCTIONS
+
+
+def build_control_system(name):
+    if name not in CONTROLLER_NAMES:
+        raise ValueError(f"Unknown controller '{name}'. Expected one of {CONTROLLER_NAMES}.")
+    return _builders()[name]()
+
+
+def get_control_system(name):
+    system = _systems.get(name)
+    if system is None:
+        with _lock:
+            system = _systems.get(name)
+            if system is None:
+                with timed(f'build.{name}'):
+                    system = build_control_system(name)
+                _systems[name] = system
+                # The shared graph backs the first pooled simulation
+                _pools[name].append(_simulation_for(system))
+    return system
+
+
+def _simulation_for(system):
+    from skfuzzy import control as ctrl
+
+    return ctrl.ControlSystemSimulation(system)
+
+
+def new_simulation(name):
+    # Fresh simulation over its own graph, never shared with the pool
+    return _simulation_for(build_control_system(name))
+
+
+@contextmanager
+def simulation(name):
+    get_control_system(name)
+    try:
+        sim = _pools[name].pop()
+    except IndexError:
+        sim = new_simulation(name)
+    try:
+        yield sim
+    finally:
+        _pools[name].append(sim)
+
+
+def build_all():
+    for name in CONTROLLER_NAMES:
+        get_control_system(name)
@@ -0,0 +1,449 @@
+import argparse
+import itertools
+import json
+import math
+import os
+import threading
+import time
+import numpy as np
+from mindbloom.controllers import (
+    CONTROLLER_INPUTS, CONTROLLER_NAMES, CONTROLLER_OUTPUTS, build_control_system, get_control_system,
+    get_membership_functions, simulation,
+)
+from mindbloom.metrics import timed
+
+# Vectorized Mamdani inference over the rule bases in mindbloom.controllers.
+#
+# Takes an (N, k) matrix of crisp inputs (columns ordered as CONTROLLER_INPUTS[name])
+# and returns N crisp outputs. It reproduces ControlSystemSimulation step by step:
+# inputs clipped to the universe and fuzzified by linear interpolation, AND = fmin,
+# OR = fmax, NOT = 1 - x, max accumulation per consequent term, then a centroid over
+# the clipped output terms with the same cut crossing points skfuzzy inserts into the
+# universe. Results agree with skfuzzy to floating point round-off (TOLERANCE).
+# Rows where no rule fires come back as NaN, where skfuzzy leaves the output unset.
+# A row whose strongest activation is below ACTIVATION_EPSILON also comes back as NaN:
+# the centroid of terms clipped at ~1e-16 is round-off, and skfuzzy's can be anywhere
+# in the output range. The 'skfuzzy' engine is left as skfuzzy computes it;
+# `max_abs_error` skips those rows by skfuzzy's own activations (`skfuzzy_reference`).
+#
+# The 'analytic' engine evaluates the same rules on the exact triangles instead of
+# their sampled arrays, and computes the output centroid in closed form. It is not
+# bit-identical to 'vector': over `compare_engines`' 2000 uniform rows the largest
+# difference is 0.189 on reaction_time and 0.027 on motor_engagement (their
+# np.linspace(0, 1, 100) universes miss the triangle corners), under 0.0005 on the
+# other controllers, and the 99th percentile stays under 0.006 everywhere.
+#
+# `infer` dispatches to the engine selected for each controller with `set_engine` or
+# MINDBLOOM_ENGINES (e.g. "stability=analytic,focus=analytic"): 'vector' (default),
+# 'analytic', 'skfuzzy', or any mode added with `register_engine`. A result cache set
+# with `set_cache` (see mindbloom.cache) sits in front of the engine.
+#
+# A compiled controller is plain arrays plus its rule structure (`arrays()` and
+# `layout()`). Arrays registered with `use_arrays` (see mindbloom.artifacts) are used
+# instead of building the skfuzzy system, so such a process never imports skfuzzy
+# unless the 'skfuzzy' engine is selected.
+
+TOLERANCE = 1e-9
+ACTIVATION_EPSILON = 1e-10
+CHUNK_SIZE = 1024
+DEFAULT_ENGINE = 'vector'
+ENGINES_ENV = 'MINDBLOOM_ENGINES'
+
+
+
+def finite_or_none(value):
+    # Scores are NaN where no rule fired (see ACTIVATION_EPSILON); JSON and the database get null
+    return float(value) if value is not None and math.isfinite(value) else None
+
+
+_lock = threading.Lock()
+_compiled = {}
+_engines = {}
+_modes = {}
+_caches = {}
+_arrays = {}
+
+
+def _compile_antecedent(node, inputs):
+    from skfuzzy.control.term import Term
+
+    if isinstance(node, Term):
+        i = inputs.index(node.parent.label)
+        return ('term', i, node.label)
+    if node.kind == 'not':
+        return ('not', _compile_antecedent(node.term1, inputs))
+    return (node.kind, _compile_antecedent(node.term1, inputs), _compile_antecedent(node.term2, inputs))
+
+
+class CompiledController:
+    def __init__(self, name, system):
+        self.name = name
+        self.inputs = CONTROLLER_INPUTS[name]
+        self.output = CONTROLLER_OUTPUTS[name]
+
+        from skfuzzy.control import Antecedent, Consequent
+        variables = {n.label: n for n in system.graph.nodes() if isinstance(n, (Antecedent, Consequent))}
+        self.universes = [np.asarray(variables[label].universe, dtype=float) for label in self.inputs]
+        self.input_mfs = [{t: np.asarray(term.mf, dtype=float) for t, term in variables[label].terms.items()}
+                          for label in self.inputs]
+
+        consequent = variables[self.output]
+        self.output_universe = np.asarray(consequent.universe, dtype=float)
+        self.output_terms = list(consequent.terms)
+        self.output_mfs = np.array([consequent.terms[t].mf for t in self.output_terms], dtype=float)
+
+        self.rules = []
+        for rule in system.rules:
+            antecedent = _compile_antecedent(rule.antecedent, self.inputs)
+            for c in rule.consequent:
+                self.rules.append((antecedent, self.output_terms.index(c.term.label), c.weight))
+
+    def arrays(self):
+        arrays = {'output_universe': self.output_universe, 'output_mfs': self.output_mfs}
+        for i, universe in enumerate(self.universes):
+            arrays[f'universe.{i}'] = universe
+            for j, mf in enumerate(self.input_mfs[i].values()):
+                arrays[f'mf.{i}.{j}'] = mf
+        return arrays
+
+    def layout(self):
+        # JSON-ready term order and rules; antecedents become nested lists
+        return {
+            'input_terms': [list(mfs) for mfs in self.input_mfs],
+            'output_terms': self.output_terms,
+            'rules': [[antecedent, t, weight] for antecedent, t, weight in self.rules],
+        }
+
+    @classmethod
+    def from_arrays(cls, name, arrays, layout):
+        # Same controller from arrays() and layout(), without the skfuzzy system;
+        # the arrays are used as given (e.g. read-only memory maps), not copied
+        self = cls.__new__(cls)
+        self.name = name
+        self.inputs = CONTROLLER_INPUTS[name]
+        self.output = CONTROLLER_OUTPUTS[name]
+        self.universes = [arrays[f'universe.{i}'] for i in range(len(self.inputs))]
+        self.input_mfs = [{t: arrays[f'mf.{i}.{j}'] for j, t in enumerate(terms)}
+                          for i, terms in enumerate(layout['input_terms'])]
+        self.output_universe = arrays['output_universe']
+        self.output_terms = list(layout['output_terms'])
+        self.output_mfs = arrays['output_mfs']
+        self.rules = [(antecedent, t, weight) for antecedent, t, weight in layout['rules']]
+        return self
+
+    def fuzzify(self, X):
+        memberships = []
+        for i, universe in enumerate(self.universes):
+            x = np.clip(X[:, i], universe.min(), universe.max())
+            memberships.append({t: np.interp(x, universe, mf, left=0.0, right=0.0)
+                                for t, mf in self.input_mfs[i].items()})
+        return memberships
+
+    def _evaluate(self, node, memberships):
+        kind = node[0]
+        if kind == 'term':
+            return memberships[node[1]][node[2]]
+        if kind == 'not':
+            return 1.0 - self._evaluate(node[1], memberships)
+        left = self._evaluate(node[1], memberships)
+        right = self._evaluate(node[2], memberships)
+        return np.fmin(left, right) if kind == 'and' else np.fmax(left, right)
+
+    def activations(self, X):
+        # (N, n_output_terms) accumulated firing strength per consequent term
+        memberships = self.fuzzify(X)
+        cuts = np.zeros((len(X), len(self.output_terms)))
+        for antecedent, t, weight in self.rules:
+            np.fmax(cuts[:, t], self._evaluate(antecedent, memberships) * weight, out=cuts[:, t])
+        return cuts
+
+    def defuzzify(self, cuts):
+        x = self.output_universe
+        x0, x1 = x[:-1], x[1:]
+        dx = x1 - x0
+        m0, m1 = self.output_mfs[:, :-1], self.output_mfs[:, 1:]
+        slope = (m1 - m0) / dx
+
+        c = cuts[:, :, None]
+        # Points where each clipped term meets its cut inside a segment; the
+        # segment start stands in for segments with no crossing
+        crosses = ((m0 >= c) != (m1 >= c)) & (c > 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            xc = np.where(crosses, x0 + (c - m0) / slope, x0)
+        n = len(cuts)
+        points = np.concatenate([np.broadcast_to(x0, (n, 1, len(x0))),
+                                 np.broadcast_to(x1, (n, 1, len(x1))), xc], axis=1)
+        points = np.sort(points, axis=1)
+
+        offset = points - x0
+        y = np.zeros_like(points)
+        for t in range(len(self.output_terms)):
+            mf = m0[t] + offset * slope[t]
+            np.fmax(y, np.fmin(mf, cuts[:, t, None, None]), out=y)
+
+        p1, p2 = points[:, :-1], points[:, 1:]
+        y1, y2 = y[:, :-1], y[:, 1:]
+        width = p2 - p1
+        area = (0.5 * width * (y1 + y2)).sum(axis=(1, 2))
+        moment = (width / 6.0 * (2 * p1 * y1 + p1 * y2 + p2 * y1 + 2 * p2 * y2)).sum(axis=(1, 2))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(area > 0, moment / area, np.nan)
+
+    def compute(self, X, chunk_size=CHUNK_SIZE):
+        X = np.asarray(X, dtype=float)
+        if X.size == 0:
+            return np.empty(0)
+        X = np.atleast_2d(X)
+        if X.shape[1] != len(self.inputs):
+            raise ValueError(f"Controller '{self.name}' expects {len(self.inputs)} input columns, got {X.shape[1]}.")
+        results = np.empty(len(X))
+        for start in range(0, len(X), chunk_size):
+            stop = start + chunk_size
+            with timed(f'fuzzify.{self.name}'):
+                cuts = self.activations(X[start:stop])
+            with timed(f'defuzzify.{self.name}'):
+                results[start:stop] = np.where(cuts.max(axis=1) < ACTIVATION_EPSILON, np.nan, self.defuzzify(cuts))
+        return results
+
+
+def _trimf(x, abc):
+    a, b, c = abc
+    with np.errstate(divide='ignore', invalid='ignore'):
+        up = np.where(b > a, (x - a) / (b - a), 1.0)
+        down = np.where(c > b, (c - x) / (c - b), 1.0)
+    return np.where((x >= a) & (x <= c), np.clip(np.minimum(up, down), 0.0, 1.0), 0.0)
+
+
+class AnalyticController(CompiledController):
+    def __init__(self, name, system, membership_functions):
+        super().__init__(name, system)
+        self._set_triangles(membership_functions)
+
+    @classmethod
+    def from_arrays(cls, name, arrays, layout, membership_functions):
+        self = super().from_arrays(name, arrays, layout)
+        self._set_triangles(membership_functions)
+        return self
+
+    def _set_triangles(self, membership_functions):
+        name = self.name
+        try:
+            self.input_triangles = [{t: np.asarray(membership_functions[label][t], dtype=float) for t in self.input_mfs[i]}
+                                    for i, label in enumerate(self.inputs)]
+            self.output_triangles = np.array([membership_functions[self.output][t] for t in self.output_terms], dtype=float)
+        except KeyError as error:
+            raise ValueError(f"Controller '{name}' has a term without triangle parameters: {error}") from error
+        self.bounds = (self.output_universe.min(), self.output_universe.max())
+
+        # Every rising and falling edge as (slope, intercept); where two edges cross
+        # is a breakpoint of the aggregated output whatever the cut levels are
+        a, b, c = self.output_triangles.T
+        lines = [(1 / (b[t] - a[t]), -a[t] / (b[t] - a[t])) for t in range(len(a)) if b[t] > a[t]]
+        lines += [(-1 / (c[t] - b[t]), c[t] / (c[t] - b[t])) for t in range(len(a)) if c[t] > b[t]]
+        crossings = [(q2 - q1) / (m1 - m2) for (m1, q1), (m2, q2) in itertools.combinations(lines, 2) if m1 != m2]
+        fixed = np.concatenate([a, b, c, crossings, self.bounds])
+        self.fixed_points = np.unique(np.clip(fixed, *self.bounds))
+
+    def fuzzify(self, X):
+        memberships = []
+        for i, universe in enumerate(self.universes):
+            x = np.clip(X[:, i], universe.min(), universe.max())
+            memberships.append({t: _trimf(x, abc) for t, abc in self.input_triangles[i].items()})
+        return memberships
+
+    def defuzzify(self, cuts):
+        # The aggregated output is piecewise linear; with all its breakpoints
+        # (vertices, edge/edge crossings and edge/cut-level crossings) the
+        # trapezoid moments below integrate it exactly
+        n = len(cuts)
+        a, b, c = self.output_triangles.T
+        levels = cuts[:, None, :]
+        rise = a[:, None] + levels * (b - a)[:, None]
+        fall = c[:, None] - levels * (c - b)[:, None]
+        points = np.concatenate([np.broadcast_to(self.fixed_points, (n, len(self.fixed_points))),
+                                 rise.reshape(n, -1), fall.reshape(n, -1)], axis=1)
+        points = np.sort(np.clip(points, *self.bounds), axis=1)
+        y = np.fmin(_trimf(points[:, :, None], (a, b, c)), cuts[:, None, :]).max(axis=2)
+
+        p1, p2 = points[:, :-1], points[:, 1:]
+        y1, y2 = y[:, :-1], y[:, 1:]
+        width = p2 - p1
+        area = (0.5 * width * (y1 + y2)).sum(axis=1)
+        moment = (width / 6.0 * (2 * p1 * y1 + p1 * y2 + p2 * y1 + 2 * p2 * y2)).sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(area > 0, moment / area, np.nan)
+
+
+def get_compiled(name, analytic=False):
+    key = (name, analytic)
+    compiled = _compiled.get(key)
+    if compiled is None:
+        with _lock:
+            compiled = _compiled.get(key)
+            if compiled is None:
+                shared = _arrays.get(name)
+                if shared is not None:
+                    if analytic:
+                        compiled = AnalyticController.from_arrays(name, *shared, get_membership_functions(name))
+                    else:
+                        compiled = CompiledController.from_arrays(name, *shared)
+                else:
+                    system = get_control_system(name)
+                    with timed(f'compile.{name}'):
+                        if analytic:
+                            compiled = AnalyticController(name, system, get_membership_functions(name))
+                        else:
+                            compiled = CompiledController(name, system)
+                _compiled[key] = compiled
+    return compiled
+
+
+def use_arrays(name, arrays, layout):
+    # Compiled controllers for `name` are built from these from now on
+    if name not in CONTROLLER_NAMES:
+        raise ValueError(f"Unknown controller '{name}'. Expected one of {CONTROLLER_NAMES}.")
+    with _lock:
+        _arrays[name] = (arrays, layout)
+        _compiled.pop((name, False), None)
+        _compiled.pop((name, True), None)
+
+
+def infer_vector(name, X):
+    return get_compiled(name).compute(X)
+
+
+def infer_analytic(name, X):
+    return get_compiled(name, analytic=True).compute(X)
+
+
+def infer_skfuzzy(name, X):
+    # Reference path: one ControlSystemSimulation.compute() per row
+    inputs = CONTROLLER_INPUTS[name]
+    output = CONTROLLER_OUTPUTS[name]
+    results = []
+    with simulation(name) as sim:
+        for row in np.atleast_2d(np.asarray(X, dtype=float)):
+            for label, value in zip(inputs, row):
+                sim.input[label] = value
+            sim.compute()
+            results.append(sim.output.get(output, np.nan))
+    return np.array(results)
+
+
+def skfuzzy_reference(name, X):
+    # (outputs, strongest accumulated consequent activation) per row, both read from
+    # ControlSystemSimulation. Its own simulation never flushes during the run, so
+    # the term activations of each row are still there after compute()
+    from skfuzzy import control as ctrl
+
+    X = np.atleast_2d(np.asarray(X, dtype=float))
+    sim = ctrl.ControlSystemSimulation(build_control_system(name), flush_after_run=len(X) + 1)
+    consequent = next(c for c in sim.ctrl.consequents if c.label == CONTROLLER_OUTPUTS[name])
+    results, strongest = [], []
+    for row in X:
+        for label, value in zip(CONTROLLER_INPUTS[name], row):
+            sim.input[label] = value
+        sim.compute()
+        results.append(sim.output.get(consequent.label, np.nan))
+        strongest.append(max(term.membership_value[sim] or 0.0 for term in consequent.terms.values()))
+    return np.array(results), np.array(strongest)
+
+
+def max_abs_error(name, X):
+    # Over the rows where skfuzzy fires a rule at ACTIVATION_EPSILON or more
+    reference, strongest = skfuzzy_reference(name, X)
+    fired = strongest >= ACTIVATION_EPSILON
+    return float(np.nanmax(np.abs(infer_vector(name, X)[fired] - reference[fired]), initial=0.0))
+
+
+def register_engine(mode, fn):
+    # fn(name, X) -> (N,) crisp outputs
+    _engines[mode] = fn
+
+
+def set_engine(name, mode):
+    if name not in CONTROLLER_NAMES:
+        raise ValueError(f"Unknown controller '{name}'. Expected one of {CONTROLLER_NAMES}.")
+    if mode not in _engines:
+        raise ValueError(f"Unknown engine '{mode}'. Expected one of {tuple(_engines)}.")
+    _modes[name] = mode
+
+
+def get_engine(name):
+    return _modes.get(name, DEFAULT_ENGINE)
+
+
+def set_cache(name, cache):
+    # cache.infer(X, compute) -> (N,) outputs, calling compute on the rows it misses; None removes it
+    if name not in CONTROLLER_NAMES:
+        raise ValueError(f"Unknown controller '{name}'. Expected one of {CONTROLLER_NAMES}.")
+    if cache is None:
+        _caches.pop(name, None)
+    else:
+        _caches[name] = cache
+
+
+def get_cache(name):
+    return _caches.get(name)
+
+
+def infer(name, X):
+    with timed(f'infer.{name}'):
+        cache = _caches.get(name)
+        if cache is not None:
+            return cache.infer(X, lambda rows: _engines[get_engine(name)](name, rows))
+        return _engines[get_engine(name)](name, X)
+
+
+def infer_one(name, *values):
+    return float(infer(name, [values])[0])
+
+
+def configure_from_env():
+    # MINDBLOOM_ENGINES="stability=analytic,focus=analytic"
+    for item in filter(None, os.environ.get(ENGINES_ENV, '').split(',')):
+        name, _, mode = item.partition('=')
+        set_engine(name.strip(), mode.strip())
+
+
+def compare_engines(name, samples=2000, modes=('vector', 'analytic'), seed=0):
+    # Per-row speed of each engine and its deviation from the discretized 'vector' path:
+    # the largest, the 99th percentile and the mean absolute difference
+    rng = np.random.default_rng(seed)
+    X = rng.random((samples, len(CONTROLLER_INPUTS[name])))
+    reference = infer_vector(name, X)
+    report = {'controller': name, 'samples': samples}
+    for mode in modes:
+        _engines[mode](name, X[:1])  # compile outside the timed run
+        start = time.perf_counter()
+        result = _engines[mode](name, X)
+        elapsed = time.perf_counter() - start
+        error = np.abs(result - reference)
+        report[mode] = {
+            'us_per_row': elapsed / samples * 1e6,
+            'max_abs_diff': float(np.nanmax(error)),
+            'p99_abs_diff': float(np.nanpercentile(error, 99)),
+            'mean_abs_diff': float(np.nanmean(error)),
+        }
+    return report
+
+
+register_engine('vector', infer_vector)
+register_engine('analytic', infer_analytic)
+register_engine('skfuzzy', infer_skfuzzy)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m mindbloom.engine', description='Compare fuzzy inference engines.')
+    parser.add_argument('--controllers', nargs='+', default=list(CONTROLLER_NAMES), choices=CONTROLLER_NAMES)
+    parser.add_argument('--modes', nargs='+', default=['vector', 'analytic'])
+    parser.add_argument('--samples', type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    for name in args.controllers:
+        print(json.dumps(compare_engines(name, args.samples, args.modes)))
+
+
+if __name__ == '__main__':
+    main()
+
@@ -0,0 +1,67 @@
+from typing import NamedTuple
+import numpy as np
+from mindbloom.metrics import timed
+
+# Vectorized emotion-series features.
+#
+# Takes one session as an (n_frames, 7) array of emotion confidences, or a batch of
+# equal-length sessions as (n_sessions, n_frames, 7), and computes every feature the
+# stability and focus scores need from a single argmax over the emotion axis:
+#   volatility               std of the dominant emotion index / 6
+#   microexpression_count    upward jumps > MICRO_THRESHOLD in non-dominant emotions,
+#                            per transition and emotion
+#   expression_change_count  share of transitions where the dominant emotion changes
+#   consistency              share of transitions where it does not
+#   dominant_strength        mean confidence of the dominant emotion
+#   input_focus              0.5 * consistency + 0.5 * dominant_strength
+# For a batch each field is an array with one value per session.
+#
+# stack_columns builds the (N, k) motion-row matrices the controllers take straight
+# from lists or arrays.
+
+MICRO_THRESHOLD = 0.3
+
+
+def stack_columns(*columns):
+    # Like np.array(list(zip(...))), stops at the shortest column
+    arrays = [np.asarray(column, dtype=float) for column in columns]
+    n = min(len(a) for a in arrays)
+    return np.column_stack([a[:n] for a in arrays]) if n else np.empty((0, len(arrays)))
+
+
+class EmotionFeatures(NamedTuple):
+    volatility: np.ndarray
+    microexpression_count: np.ndarray
+    expression_change_count: np.ndarray
+    consistency: np.ndarray
+    dominant_strength: np.ndarray
+    input_focus: np.ndarray
+
+
+@timed('features')
+def extract_features(emotion_confidences):
+    emotions = np.asarray(emotion_confidences, dtype=float)
+    if emotions.ndim not in (2, 3) or emotions.shape[-1] != 7:
+        raise ValueError(f"Expected (n_frames, 7) or (n_sessions, n_frames, 7) emotions, got shape {emotions.shape}.")
+    transitions = emotions.shape[-2] - 1
+    if transitions < 1:
+        raise ValueError("At least two emotion frames are needed.")
+
+    dominant = np.argmax(emotions, axis=-1)
+    volatility = np.std(dominant, axis=-1) / 6  # max spread is 0–6
+
+    changes = np.sum(dominant[..., 1:] != dominant[..., :-1], axis=-1)
+    expression_change_count = changes / transitions
+    consistency = (transitions - changes) / transitions
+
+    # Spikes in the frame's own dominant emotion do not count
+    spikes = np.diff(emotions, axis=-2) > MICRO_THRESHOLD
+    dominant_spikes = np.take_along_axis(spikes, dominant[..., 1:, None], axis=-1)
+    micro_count = np.sum(spikes, axis=(-2, -1)) - np.sum(dominant_spikes, axis=(-2, -1))
+    microexpression_count = micro_count / (transitions * 6)  # Normalize to 0–1
+
+    dominant_strength = np.mean(np.take_along_axis(emotions, dominant[..., None], axis=-1)[..., 0], axis=-1)
+    input_focus = 0.5 * consistency + 0.5 * dominant_strength
+
+    return EmotionFeatures(volatility, microexpression_count, expression_change_count,
+                           consistency, dominant_strength, input_focus)
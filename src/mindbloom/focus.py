@@ -1,26 +1,19 @@
 import numpy as np
-import skfuzzy as fuzz
-from skfuzzy import control as ctrl
+from mindbloom.controllers import FIVE_LEVEL_TRIANGLES, add_triangles
+from mindbloom.engine import infer_one
+from mindbloom.features import extract_features, stack_columns
 from mindbloom.pause_frequency import get_pause_frequency
 from mindbloom.reaction_time_ms import get_reaction_time_ms
 
-def define_five_mfs(var):
-    var['very_low'] = fuzz.trimf(var.universe, [0.0, 0.0, 0.2])
-    var['low'] = fuzz.trimf(var.universe, [0.1, 0.25, 0.4])
-    var['medium'] = fuzz.trimf(var.universe, [0.35, 0.5, 0.65])
-    var['high'] = fuzz.trimf(var.universe, [0.6, 0.75, 0.9])
-    var['very_high'] = fuzz.trimf(var.universe, [0.8, 1.0, 1.0])
+MEMBERSHIP_FUNCTIONS = {
+    'focus': FIVE_LEVEL_TRIANGLES,
+    'pause_frequency': FIVE_LEVEL_TRIANGLES,
+    'reaction_time_ms': FIVE_LEVEL_TRIANGLES,
+    'focus_attention_score': FIVE_LEVEL_TRIANGLES,
+}
 
 def get_input_focus(emotion_series):
-    num_frames = len(emotion_series)
-    dominant_indices = [np.argmax(frame) for frame in emotion_series]
-    dominant_values = [max(frame) for frame in emotion_series]
-
-    focus_consistency = sum(dominant_indices[i] == dominant_indices[i+1] for i in range(num_frames - 1)) / (num_frames - 1)
-    avg_dominant_strength = np.mean(dominant_values)
-    focus = 0.5 * focus_consistency + 0.5 * avg_dominant_strength
-
-    return focus
+    return extract_features(emotion_series).input_focus
 def min_max_normalize(arr, method='mean'):
     min_val = np.min(arr)
     max_val = np.max(arr)
@@ -46,9 +39,11 @@ def get_input_symmetry(symmetry):
     return min_max_normalize(symmetry)
 
 def get_reaction_data(speed, range_, symmetry):
-    return np.array(list(zip(speed, range_, symmetry)))
+    return stack_columns(speed, range_, symmetry)
+
+def build_focus_ctrl():
+    from skfuzzy import control as ctrl
 
-def get_focus(input_emotions, input_speed, input_range, input_symmetry):
     focus = ctrl.Antecedent(np.arange(0, 1.01, 0.01), 'focus')
     pause_frequency = ctrl.Antecedent(np.arange(0, 1.01, 0.01), 'pause_frequency')
     reaction_time = ctrl.Antecedent(np.arange(0, 1.01, 0.01), 'reaction_time_ms')
@@ -56,7 +51,7 @@ def get_focus(input_emotions, input_speed, input_range, input_symmetry):
     focus_score = ctrl.Consequent(np.arange(0, 1.01, 0.01), 'focus_attention_score')
 
     for var in [focus, pause_frequency, reaction_time, focus_score]:
-        define_five_mfs(var)
+        add_triangles(var, MEMBERSHIP_FUNCTIONS[var.label])
 
     rules_fa = [
     # Excellent focus behavior
@@ -107,14 +102,19 @@ def get_focus(input_emotions, input_speed, input_range, input_symmetry):
     ctrl.Rule(focus['medium'] & pause_frequency['medium'] & reaction_time['medium'], focus_score['medium']),
     ctrl.Rule(pause_frequency['very_high'] & reaction_time['very_low'], focus_score['low']),
     ]
-    fa_stability_ctrl = ctrl.ControlSystem(rules_fa)
-    fa_stability_simulator = ctrl.ControlSystemSimulation(fa_stability_ctrl)
-    fa_stability_simulator.input['focus'] = get_input_focus(input_emotions)
-    fa_stability_simulator.input['pause_frequency'] = get_pause_frequency(min_max_normalize(get_reaction_time_ms(get_reaction_data(input_speed, input_range, input_symmetry))),get_input_speed(input_speed), get_input_range(input_range), get_input_symmetry(input_symmetry))
-    fa_stability_simulator.input['reaction_time_ms'] = min_max_normalize(get_reaction_time_ms(get_reaction_data(input_speed, input_range, input_symmetry)))
-
-    
-    fa_stability_simulator.compute()
-    focus_score_value = round(fa_stability_simulator.output['focus_attention_score'], 3)
+    return ctrl.ControlSystem(rules_fa)
+
+
+def score_focus(input_focus, input_pause_frequency, input_reaction_time):
+    return round(infer_one('focus', input_focus, input_pause_frequency, input_reaction_time), 3)
+
+
+def get_focus(input_emotions, input_speed, input_range, input_symmetry):
+    input_focus = get_input_focus(input_emotions)
+    # Reaction time feeds both the pause-frequency and the focus controller
+    input_reaction_time = min_max_normalize(get_reaction_time_ms(get_reaction_data(input_speed, input_range, input_symmetry)))
+    input_pause_frequency = get_pause_frequency(input_reaction_time, get_input_speed(input_speed), get_input_range(input_range), get_input_symmetry(input_symmetry))
+
+    focus_score_value = score_focus(input_focus, input_pause_frequency, input_reaction_time)
     return focus_score_value
 
@@ -0,0 +1,167 @@
+import argparse
+import itertools
+import json
+import os
+import numpy as np
+from mindbloom.controllers import CONTROLLER_INPUTS, CONTROLLER_NAMES
+from mindbloom import engine
+
+# Lookup-table ("LUT") mode for the fuzzy controllers.
+#
+# Every controller input is bounded to [0, 1] and the rule bases are fixed, so each
+# controller is a pure function over the unit cube. A table samples the exact engine
+# on a regular grid and answers queries by multilinear interpolation. Tables are
+# stored as one <controller>.npz file per controller and registered as the 'lut'
+# engine, selectable per controller with engine.set_engine(name, 'lut').
+#
+# Grid points where no rule fires are stored as NaN and skipped when interpolating.
+# A table must never return NaN where the exact engine has a value: `build` only saves
+# tables without such points in its error report, and both commands exit with an error
+# when a controller has any.
+#
+# Build:   python -m mindbloom.lut build tables/ --grid-size 41
+# Report:  python -m mindbloom.lut report tables/
+# Serve:   MINDBLOOM_LUT_DIR=tables/ (loaded by the app at startup)
+
+DEFAULT_GRID_SIZE = 41
+LUT_DIR_ENV = 'MINDBLOOM_LUT_DIR'
+
+_tables = {}
+
+
+class LookupTable:
+    def __init__(self, name, grid, values):
+        self.name = name
+        self.grid = np.asarray(grid, dtype=float)
+        self.values = np.asarray(values, dtype=float)
+        if self.values.shape != (len(self.grid),) * len(CONTROLLER_INPUTS[name]):
+            raise ValueError(f"Table for '{name}' has shape {self.values.shape}, which does not match its grid.")
+
+    def __call__(self, X):
+        X = np.asarray(X, dtype=float)
+        if X.size == 0:
+            return np.empty(0)
+        X = np.atleast_2d(X)
+        steps = len(self.grid) - 1
+        scaled = (np.clip(X, self.grid[0], self.grid[-1]) - self.grid[0]) / (self.grid[-1] - self.grid[0]) * steps
+        lower = np.minimum(np.floor(scaled).astype(int), steps - 1)
+        frac = scaled - lower
+
+        # Weighted sum over the 2**k corners of the enclosing grid cell. Corners where no
+        # rule fires (NaN) are left out and the other weights rescaled, so a rule gap
+        # only reaches the points it covers instead of every cell touching it
+        result = np.zeros(len(X))
+        total = np.zeros(len(X))
+        for corner in itertools.product((0, 1), repeat=X.shape[1]):
+            corner = np.array(corner)
+            weight = np.prod(np.where(corner, frac, 1.0 - frac), axis=1)
+            values = self.values[tuple((lower + corner).T)]
+            finite = np.isfinite(values)
+            result += np.where(finite, weight * np.where(finite, values, 0.0), 0.0)
+            total += np.where(finite, weight, 0.0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(total > 0, result / total, np.nan)
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        np.savez(os.path.join(directory, f"{self.name}.npz"), grid=self.grid, values=self.values)
+
+
+def build_table(name, grid_size=DEFAULT_GRID_SIZE):
+    grid = np.linspace(0, 1, grid_size)
+    k = len(CONTROLLER_INPUTS[name])
+    points = np.stack(np.meshgrid(*[grid] * k, indexing='ij'), axis=-1).reshape(-1, k)
+    values = engine.infer_vector(name, points).reshape((grid_size,) * k)
+    return LookupTable(name, grid, values)
+
+
+def load_table(directory, name):
+    with np.load(os.path.join(directory, f"{name}.npz")) as data:
+        return LookupTable(name, data['grid'], data['values'])
+
+
+def build_tables(directory, grid_size=DEFAULT_GRID_SIZE, names=CONTROLLER_NAMES):
+    for name in names:
+        build_table(name, grid_size).save(directory)
+
+
+def load_tables(directory, names=CONTROLLER_NAMES):
+    loaded = []
+    for name in names:
+        if os.path.exists(os.path.join(directory, f"{name}.npz")):
+            use_table(load_table(directory, name))
+            loaded.append(name)
+    return loaded
+
+
+def use_table(table):
+    _tables[table.name] = table
+    engine.set_engine(table.name, 'lut')
+
+
+def get_table(name):
+    return _tables.get(name)
+
+
+def lookup(name, X):
+    table = _tables.get(name)
+    if table is None:
+        raise ValueError(f"No lookup table loaded for controller '{name}'.")
+    return table(X)
+
+
+def error_report(table, samples=20000, seed=0):
+    # Interpolation error of a table against the exact engine at random points
+    rng = np.random.default_rng(seed)
+    X = rng.random((samples, len(CONTROLLER_INPUTS[table.name])))
+    approx = table(X)
+    exact = engine.infer_vector(table.name, X)
+    error = np.abs(approx - exact)
+    return {
+        'controller': table.name,
+        'grid_size': len(table.grid),
+        'samples': samples,
+        'max_abs_error': float(np.nanmax(error)),
+        'mean_abs_error': float(np.nanmean(error)),
+        'p99_abs_error': float(np.nanpercentile(error, 99)),
+        # Points where the table has no value (NaN) but the exact engine does
+        'nan_mismatches': int(np.sum(np.isnan(approx) & ~np.isnan(exact))),
+        # Points in a rule gap of the exact engine that the table fills from its neighbours
+        'filled_gaps': int(np.sum(~np.isnan(approx) & np.isnan(exact))),
+    }
+
+
+def load_from_env():
+    directory = os.environ.get(LUT_DIR_ENV)
+    if not directory:
+        return []
+    return load_tables(directory)
+
+
+engine.register_engine('lut', lookup)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m mindbloom.lut', description='Build and check fuzzy controller lookup tables.')
+    parser.add_argument('command', choices=['build', 'report'])
+    parser.add_argument('directory')
+    parser.add_argument('--grid-size', type=int, default=DEFAULT_GRID_SIZE)
+    parser.add_argument('--controllers', nargs='+', default=list(CONTROLLER_NAMES), choices=CONTROLLER_NAMES)
+    parser.add_argument('--samples', type=int, default=20000)
+    args = parser.parse_args(argv)
+
+    failed = []
+    for name in args.controllers:
+        table = build_table(name, args.grid_size) if args.command == 'build' else load_table(args.directory, name)
+        report = error_report(table, args.samples)
+        print(json.dumps(report))
+        if report['nan_mismatches']:
+            failed.append(name)
+        elif args.command == 'build':
+            table.save(args.directory)
+    if failed:
+        raise SystemExit(f"Lookup tables return NaN where the exact engine does not: {', '.join(failed)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,83 +1,246 @@
-import os 
-from fastapi import FastAPI
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Dict, Optional
-import numpy as np
-from mindbloom.stablity import emotion_stablity
-from mindbloom.focus import get_focus
-from mindbloom.motor_engagement import get_mortor_engagement
-
-
-sample_data = [
-    [0.70, 0.05, 0.05, 0.05, 0.05, 0.05, 0.05],
-    [0.60, 0.10, 0.05, 0.10, 0.05, 0.05, 0.05],
-    [0.40, 0.15, 0.05, 0.15, 0.05, 0.05, 0.05],
-    [0.40, 0.20, 0.05, 0.20, 0.05, 0.05, 0.05],
-    [0.45, 0.25, 0.05, 0.15, 0.05, 0.05, 0.00],
-    [0.30, 0.10, 0.05, 0.10, 0.10, 0.05, 0.05],
-    [0.65, 0.05, 0.05, 0.05, 0.10, 0.05, 0.05],
-    [0.60, 0.05, 0.10, 0.05, 0.05, 0.10, 0.05],
-    [0.40, 0.10, 0.20, 0.05, 0.10, 0.10, 0.05],
-    [0.20, 0.0, 0.25, 0.05, 0.00, 0.10, 0.05],
-]
-
-print(emotion_stablity(sample_data))
-def min_max_normalize(arr):
-    min_val = np.min(arr)
-    max_val = np.max(arr)
-    normalized = (arr - min_val) / (max_val - min_val + 1e-8)
-    return normalized
-
-
-# normalized
-speed = [0.5, 0.6, 0.7, 0.8, 0.9]
-range_ = [0.5, 0.6, 0.7, 0.8, 0.9]
-symmetrry = [0.5, 0.6, 0.7, 0.8, 0.9]
-# Get reaction time data
-print("Normalize")
-print(min_max_normalize(speed))
-
-print(get_focus(sample_data, speed, range_, symmetrry))
-print(get_mortor_engagement(speed, range_, symmetrry))
+from pydantic import ValidationError
+from typing import Optional
+from mindbloom.batching import RequestBatcher
+from mindbloom.bulk import chunk_size_from_env, is_ndjson, iter_binary, iter_json_array, iter_ndjson, score_while_reading, stream_scores
+from mindbloom.context import score_session
+from mindbloom.engine import finite_or_none
+from mindbloom.metrics import MetricsMiddleware, mark_parsed, registry, render_batching
+from mindbloom.payload import BINARY_TYPE, REQUEST_BODY, InvalidInput, content_kind, parse_session
+from mindbloom.persistence import WriteBehindQueue, make_record
+from mindbloom.reduction import MAX_SAMPLES_HEADER, max_samples_for, max_samples_from_env
+from mindbloom.shedding import DEADLINE_HEADER, MODE_HEADER, LoadShedder, Overloaded
+from mindbloom.streaming import SessionState
+from mindbloom.windows import score_timeline
+from mindbloom.workers import QueueFullError, ScoringPool, warm_up_worker
+
+
 # FastAPI setup
-app = FastAPI()
+async def warm_up(app):
+    # Build every fuzzy control system (or map MINDBLOOM_ARTIFACTS_DIR), load lookup
+    # tables (MINDBLOOM_LUT_DIR) and engine overrides (MINDBLOOM_ENGINES) and run each
+    # controller once, here and in every process worker
+    try:
+        await asyncio.to_thread(warm_up_worker)
+        await app.state.scoring_pool.wait_ready()
+    except Exception as error:
+        app.state.warm_up_error = f"{type(error).__name__}: {error}"
+        return
+    app.state.ready = True
+
+@asynccontextmanager
+async def lifespan(app):
+    # Scoring runs on a worker pool so it never blocks the event loop
+    app.state.scoring_pool = ScoringPool.from_env().start()
+    # Optional write-behind persistence of scored sessions (MINDBLOOM_PERSIST)
+    app.state.persist = WriteBehindQueue.from_env()
+    if app.state.persist is not None:
+        app.state.persist.start()
+    # Optional micro-batching of concurrent requests (MINDBLOOM_BATCH_WINDOW_MS)
+    app.state.batcher = RequestBatcher.from_env(app.state.scoring_pool, app.state.persist is not None)
+    # Deadlines and degraded scoring under load (MINDBLOOM_DEADLINE_MS, MINDBLOOM_MAX_INFLIGHT)
+    app.state.shedder = LoadShedder.from_env(app.state.scoring_pool.workers)
+    # Default motion-sample limit before inference (MINDBLOOM_MAX_SAMPLES)
+    app.state.max_samples = max_samples_from_env()
+    # Warm-up runs in the background: the server answers /health at once and
+    # /ready only once warm-up has finished
+    app.state.ready = False
+    app.state.warm_up_error = None
+    app.state.warm_up = asyncio.create_task(warm_up(app))
+    yield
+    app.state.warm_up.cancel()
+    app.state.scoring_pool.shutdown()
+    if app.state.persist is not None:
+        await app.state.persist.close()
+
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Mindbloom-Mode", "X-Mindbloom-Max-Samples"],
 )
+# Request timings for /metrics; X-Mindbloom-Timing: 1 adds a Server-Timing breakdown
+app.add_middleware(MetricsMiddleware)
 
 # Health Check Endpoint
 @app.get("/health")
 async def health_check():
     return {"status": "ok"}
 
-# Define payload structure
-class EmotionInput(BaseModel):
-    emotion: List[List[float]]
-    speed: List[float]
-    ranges: List[float]
-    symmetry: List[float]
-
-# Emotion State Endpoint
-@app.post("/emotion_state")
-async def emotion_state(payload: EmotionInput):
-    # Extract data from payload
-    emotion_data = payload.emotion
-    speed_data = payload.speed
-    range_data = payload.ranges
-    symmetry_data = payload.symmetry
-
-    # Process data using the imported functions
-    focus_score = get_focus(emotion_data, speed_data, range_data, symmetry_data)
-    motor_engagement_score = get_mortor_engagement(speed_data, range_data, symmetry_data)
-    emotion_stability_score = emotion_stablity(emotion_data)
-
-    return {
-        "focus_score": focus_score,
-        "motor_engagement_score": motor_engagement_score,
-        "emotion_stability_score": emotion_stability_score,
-    }
+# Readiness: 503 until warm-up has finished
+@app.get("/ready")
+async def readiness_check():
+    if app.state.ready:
+        return {"status": "ready"}
+    if app.state.warm_up_error is not None:
+        return JSONResponse({"status": "failed", "error": app.state.warm_up_error}, status_code=503)
+    return JSONResponse({"status": "warming_up"}, status_code=503)
+
+# Micro-batching metrics
+@app.get("/stats/batching")
+async def batching_stats():
+    batcher = app.state.batcher
+    return batcher.stats() if batcher is not None else {"enabled": False}
+
+# Prometheus metrics: per-stage and per-endpoint histograms, input sizes, batching
+@app.get("/metrics")
+async def metrics():
+    text = registry.render()
+    if app.state.batcher is not None:
+        text += render_batching(app.state.batcher.stats())
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4")
+
+# Session body in any of the mindbloom.payload formats, validated up front
+# (payload.validate_session); JSON errors keep FastAPI's 422 shape
+async def read_session(request: Request):
+    try:
+        session = parse_session(request.headers.get("content-type"), await request.body())
+    except ValidationError as error:
+        raise RequestValidationError([{**e, "loc": ("body", *e["loc"])} for e in error.errors(include_url=False)])
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+    mark_parsed()
+    return session
+
+# NaN (no rule fired) is sent as null, as the other endpoints do
+def finite_scores(scores):
+    return {key: finite_or_none(value) for key, value in scores.items()}
+
+# Emotion State Endpoint: EmotionInput JSON, or a binary / npz session (mindbloom.payload).
+# X-Mindbloom-Max-Samples caps the motion samples scored (mindbloom.reduction). Within a
+# deadline (X-Mindbloom-Deadline-Ms) it may reduce them further; X-Mindbloom-Mode in the
+# response says whether it did (mindbloom.shedding)
+@app.post("/emotion_state", openapi_extra=REQUEST_BODY)
+async def emotion_state(request: Request, response: Response):
+    session = await read_session(request)
+    pool = app.state.scoring_pool
+    batcher = app.state.batcher
+    persist = app.state.persist
+    shedder = app.state.shedder
+
+    try:
+        max_samples = max_samples_for(request.headers.get(MAX_SAMPLES_HEADER), app.state.max_samples)
+        deadline = shedder.deadline_for(request.headers.get(DEADLINE_HEADER))
+        frames, samples = len(session[0]), min(len(session[1]), max_samples or len(session[1]))
+        mode = shedder.admit(frames, samples, deadline, request.headers.get(MODE_HEADER))
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+    except Overloaded as error:
+        raise HTTPException(status_code=503, detail=str(error), headers={"Retry-After": str(error.retry_after)})
+    if mode == 'degraded':
+        max_samples = min(max_samples or shedder.degraded_rows, shedder.degraded_rows)
+    response.headers[MODE_HEADER] = mode
+    if max_samples and len(session[1]) > max_samples:
+        response.headers[MAX_SAMPLES_HEADER] = str(max_samples)
+    timeout = min(deadline, pool.timeout) if deadline else pool.timeout
+
+    # Score with shared intermediates: reaction-time inference runs once per request
+    try:
+        with shedder.track(frames + min(samples, max_samples or samples)):
+            if batcher is not None:
+                result = await asyncio.wait_for(batcher.submit((*session, max_samples)), timeout)
+            else:
+                result = await pool.run(score_session, *session, persist is not None, max_samples, timeout=timeout)
+    except InvalidInput as error:
+        raise HTTPException(status_code=400, detail=str(error))
+    except QueueFullError as error:
+        raise HTTPException(status_code=503, detail=str(error), headers={"Retry-After": "1"})
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail=f"Scoring did not finish within {timeout}s.")
+
+    if persist is None:
+        return finite_scores(result)
+    # Queued for the write-behind task; the response never waits on the database
+    scores, intermediates = result
+    persist.put(make_record(scores, intermediates))
+    return finite_scores(scores)
+
+# Score timeline: the three scores over sliding windows of `window` seconds every `step`
+# seconds, with frames and samples per second given by frame_rate and sample_rate
+@app.post("/emotion_state/windows", openapi_extra=REQUEST_BODY)
+async def emotion_state_windows(request: Request, window: float, step: float, frame_rate: float = 1.0,
+                                sample_rate: Optional[float] = None):
+    session = await read_session(request)
+    pool = app.state.scoring_pool
+    try:
+        timeline = await pool.run(score_timeline, *session, window, step, frame_rate, sample_rate)
+    except InvalidInput as error:
+        raise HTTPException(status_code=400, detail=str(error))
+    except QueueFullError as error:
+        raise HTTPException(status_code=503, detail=str(error), headers={"Retry-After": "1"})
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail=f"Scoring did not finish within {pool.timeout}s.")
+    return {"window": window, "step": step, "timeline": timeline}
+
+# Bulk scoring endpoint: JSON array, NDJSON or binary sessions in, NDJSON results out as chunks finish
+@app.post("/emotion_state/batch")
+async def emotion_state_batch(request: Request):
+    pool = app.state.scoring_pool
+    if is_ndjson(request.headers.get("content-type")):
+        results = await score_while_reading(pool, iter_ndjson(request.stream()), chunk_size_from_env())
+    elif content_kind(request.headers.get("content-type")) == BINARY_TYPE:
+        results = stream_scores(pool, iter_binary(await request.body()), chunk_size_from_env())
+    else:
+        results = stream_scores(pool, iter_json_array(await request.body()), chunk_size_from_env())
+    return StreamingResponse(results, media_type="application/x-ndjson")
+
+# Incremental scoring over WebSocket. Each message may carry new emotion frames
+# {"emotion": [[...7 confidences]]} and/or motion samples {"speed": [...], "ranges": [...],
+# "symmetry": [...]}; updated scores are sent at most every interval_ms milliseconds,
+# or right away for messages with "flush": true. Updates held back by the interval
+# are sent when it ends. Inference runs in a thread, one message at a time, while a
+# reader task keeps receiving the next one.
+@app.websocket("/emotion_state/stream")
+async def emotion_state_stream(websocket: WebSocket, interval_ms: float = 0):
+    await websocket.accept()
+    state = SessionState()
+    messages = asyncio.Queue(maxsize=1)
+
+    async def read():
+        try:
+            while True:
+                await messages.put(await websocket.receive_json())
+        except Exception as error:
+            # Disconnects and bad JSON end the handler, as when it received directly
+            await messages.put(error)
+
+    async def send_scores():
+        await websocket.send_json(await asyncio.to_thread(state.scores))
+        return time.monotonic()
+
+    reader = asyncio.create_task(read())
+    last_sent = 0.0
+    unsent = False
+    try:
+        while True:
+            timeout = max(0.0, last_sent + interval_ms / 1000 - time.monotonic()) if unsent else None
+            try:
+                message = await asyncio.wait_for(messages.get(), timeout)
+            except asyncio.TimeoutError:
+                last_sent, unsent = await send_scores(), False
+                continue
+            if isinstance(message, Exception):
+                raise message
+            try:
+                await asyncio.to_thread(state.add_message, message)
+            except (ValueError, TypeError, AttributeError) as error:
+                await websocket.send_json({"error": str(error)})
+                continue
+
+            if message.get("flush") or (time.monotonic() - last_sent) * 1000 >= interval_ms:
+                last_sent, unsent = await send_scores(), False
+            else:
+                unsent = True
+    except WebSocketDisconnect:
+        pass
+    finally:
+        reader.cancel()
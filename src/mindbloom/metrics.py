@@ -0,0 +1,240 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Lightweight timers, counters and histograms for the scoring pipeline, rendered in
+# the Prometheus text format on /metrics.
+#
+# Pipeline code wraps each stage in `with timed('stage'):`. Stage names:
+#   parse                  request body read and pydantic validation
+#   queue                  waiting for a scoring worker
+#   build.<controller>     building a skfuzzy control system
+#   compile.<controller>   compiling it for the vector / analytic engine
+#   features               emotion-series feature extraction
+#   infer.<controller>     one inference call, whatever the engine
+#   fuzzify.<controller>   fuzzification and rule activation (vector / analytic)
+#   defuzzify.<controller> centroid defuzzification (vector / analytic)
+#
+# Observations made inside a scoring-pool job are collected by `collected()` and
+# recorded by the pool on the event loop, so thread and process workers report the
+# same way. Requests sent with an X-Mindbloom-Timing header get their per-stage totals
+# back in a Server-Timing response header.
+
+TIMING_HEADER = 'x-mindbloom-timing'
+
+SECONDS_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1, 10, 30, 100, 300, 1000, 3000, 10000, 30000, 100000)
+
+# Observations of the pool job running in this context, or None outside a job
+_job = ContextVar('mindbloom_job', default=None)
+# Timings of the HTTP request being served, or None
+_request = ContextVar('mindbloom_request', default=None)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels}le="{bound}"}} {cumulative}'
+        yield f'{name}_bucket{{{labels}le="+Inf"}} {self.count}'
+        yield f'{name}_sum{{{labels.rstrip(",")}}} {self.sum}'
+        yield f'{name}_count{{{labels.rstrip(",")}}} {self.count}'
+
+
+class Registry:
+    # metric name -> (help, buckets, {label tuple: Histogram})
+    METRICS = {
+        'mindbloom_stage_seconds': ('Time spent per pipeline stage.', SECONDS_BUCKETS, ('stage',)),
+        'mindbloom_request_seconds': ('Time spent per HTTP request.', SECONDS_BUCKETS, ('endpoint', 'method')),
+        'mindbloom_input_size': ('Frames and motion samples per scored session.', SIZE_BUCKETS, ('kind',)),
+    }
+    # metric name -> (help, label names)
+    COUNTERS = {
+        'mindbloom_requests_total': ('HTTP requests by endpoint and status.', ('endpoint', 'method', 'status')),
+        'mindbloom_cache_events_total': ('Controller result cache hits, misses and evictions.', ('controller', 'event')),
+        'mindbloom_persist_events_total': ('Session records queued, written, retried, dropped or failed.', ('event',)),
+        'mindbloom_shed_events_total': ('Requests scored in full, degraded or rejected by load shedding.', ('mode',)),
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {name: {} for name in self.METRICS}
+        self.counters = {name: {} for name in self.COUNTERS}
+
+    def observe(self, name, labels, value):
+        with self._lock:
+            histogram = self.histograms[name].get(labels)
+            if histogram is None:
+                histogram = self.histograms[name][labels] = Histogram(self.METRICS[name][1])
+            histogram.observe(value)
+
+    def count(self, name, labels, value=1):
+        with self._lock:
+            self.counters[name][labels] = self.counters[name].get(labels, 0) + value
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for name, (help_text, _, label_names) in self.METRICS.items():
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+                for labels, histogram in sorted(self.histograms[name].items()):
+                    lines += histogram.lines(name, _labels(label_names, labels))
+            for name, (help_text, label_names) in self.COUNTERS.items():
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+                for labels, count in sorted(self.counters[name].items()):
+                    lines.append(f'{name}{{{_labels(label_names, labels).rstrip(",")}}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(names, values):
+    return ''.join(f'{name}="{value}",' for name, value in zip(names, values))
+
+
+registry = Registry()
+
+
+def observe(name, label, value):
+    # label is a single label value, or a tuple of them for counters
+    job = _job.get()
+    if job is not None:
+        job.append((name, label, value))
+        return
+    if name in registry.COUNTERS:
+        registry.count(name, label, value)
+        return
+    registry.observe(name, (label,), value)
+    request = _request.get()
+    if request is not None and name == 'mindbloom_stage_seconds':
+        request.stages[label] = request.stages.get(label, 0.0) + value
+
+
+def record(observations):
+    for name, label, value in observations:
+        observe(name, label, value)
+
+
+@contextmanager
+def timed(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe('mindbloom_stage_seconds', stage, time.perf_counter() - start)
+
+
+def observe_size(kind, size):
+    observe('mindbloom_input_size', kind, size)
+
+
+def count(name, labels, value=1):
+    if value:
+        observe(name, labels, value)
+
+
+def collected(fn, *args, submitted=None):
+    # Runs a pool job and returns (result, observations) for the caller to record
+    observations = []
+    token = _job.set(observations)
+    try:
+        if submitted is not None:
+            observations.append(('mindbloom_stage_seconds', 'queue', time.perf_counter() - submitted))
+        result = fn(*args)
+    finally:
+        _job.reset(token)
+    return result, observations
+
+
+def mark_parsed():
+    # Called first thing in an endpoint: everything since the request arrived was parsing
+    request = _request.get()
+    if request is not None:
+        observe('mindbloom_stage_seconds', 'parse', time.perf_counter() - request.started)
+
+
+def detach_request():
+    # For work shared by several requests, like a micro-batch: stop attributing it to one
+    _request.set(None)
+
+
+class RequestTimings:
+    def __init__(self, breakdown):
+        self.started = time.perf_counter()
+        self.breakdown = breakdown
+        self.stages = {}
+
+    def server_timing(self):
+        stages = [f'{stage};dur={seconds * 1000:.3f}' for stage, seconds in self.stages.items()]
+        stages.append(f'total;dur={(time.perf_counter() - self.started) * 1000:.3f}')
+        return ', '.join(stages)
+
+
+class MetricsMiddleware:
+    # Times every HTTP request and adds Server-Timing when asked for
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope.get('headers') or [])
+        breakdown = headers.get(TIMING_HEADER.encode(), b'0') not in (b'', b'0')
+        timings = RequestTimings(breakdown)
+        token = _request.set(timings)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                if timings.breakdown:
+                    message['headers'] = list(message.get('headers', [])) + [
+                        (b'server-timing', timings.server_timing().encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request.reset(token)
+            route = scope.get('route')
+            endpoint = getattr(route, 'path', 'unmatched')
+            registry.observe('mindbloom_request_seconds', (endpoint, scope['method']), time.perf_counter() - timings.started)
+            registry.count('mindbloom_requests_total', (endpoint, scope['method'], str(status)))
+
+
+def render_batching(stats):
+    # RequestBatcher.stats() as Prometheus metrics
+    lines = ['# HELP mindbloom_batch_size Sessions per micro-batch.', '# TYPE mindbloom_batch_size histogram']
+    cumulative = 0
+    buckets = list(stats['batch_size_histogram'].items())
+    # The last bucket also holds larger batches, so it is only reported as +Inf
+    for bound, count in buckets[:-1]:
+        cumulative += count
+        lines.append(f'mindbloom_batch_size_bucket{{le="{bound}"}} {cumulative}')
+    lines += [
+        f'mindbloom_batch_size_bucket{{le="+Inf"}} {stats["batches"]}',
+        f'mindbloom_batch_size_sum {stats["sessions"]}',
+        f'mindbloom_batch_size_count {stats["batches"]}',
+        '# HELP mindbloom_batch_wait_seconds Time sessions waited for their batch to be sent.',
+        '# TYPE mindbloom_batch_wait_seconds summary',
+        f'mindbloom_batch_wait_seconds_sum {stats["mean_wait_ms"] * stats["sessions"] / 1000.0}',
+        f'mindbloom_batch_wait_seconds_count {stats["sessions"]}',
+        '# HELP mindbloom_batch_wait_seconds_max Longest wait for a batch.',
+        '# TYPE mindbloom_batch_wait_seconds_max gauge',
+        f'mindbloom_batch_wait_seconds_max {stats["max_wait_ms"] / 1000.0}',
+    ]
+    return '\n'.join(lines) + '\n'
@@ -1,6 +1,7 @@
 import numpy as np
-import skfuzzy as fuzz
-from skfuzzy import control as ctrl
+from mindbloom.controllers import LEVEL_TRIANGLES, WIDE_FIVE_LEVEL_TRIANGLES, add_triangles
+from mindbloom.engine import infer
+from mindbloom.features import stack_columns
 from mindbloom.reaction_time_ms import get_reaction_time_ms
 
 def min_max_normalize(arr, method='mean'):
@@ -19,8 +20,18 @@ def min_max_normalize(arr, method='mean'):
         raise ValueError("Method must be 'mean', 'sum', or 'weighted'.")
 
 
-def get_mortor_engagement(input_speed, input_range, input_symmetry):
-    input_reaction_time = get_reaction_time_ms(np.array(list(zip(input_speed, input_range, input_symmetry))))
+# reaction_time uses the five-level terms (its three-level low/medium/high are overridden)
+MEMBERSHIP_FUNCTIONS = {
+    'reaction_time': {**LEVEL_TRIANGLES, **WIDE_FIVE_LEVEL_TRIANGLES},
+    'speed': LEVEL_TRIANGLES,
+    'range': LEVEL_TRIANGLES,
+    'motor_engagement': WIDE_FIVE_LEVEL_TRIANGLES,
+}
+
+
+def build_motor_ctrl():
+    from skfuzzy import control as ctrl
+
     reaction_time = ctrl.Antecedent(np.linspace(0, 1, 100), 'reaction_time')
     speed = ctrl.Antecedent(np.linspace(0, 1, 100), 'speed')
     range_ = ctrl.Antecedent(np.linspace(0, 1, 100), 'range')
@@ -28,25 +39,9 @@ def get_mortor_engagement(input_speed, input_range, input_symmetry):
 # Define output
     motor_engagement = ctrl.Consequent(np.linspace(0, 1, 100), 'motor_engagement')
 
-# Membership functions for inputs (Low, Medium, High)
-    for var in [reaction_time, speed, range_]:
-        var['low'] = fuzz.trimf(var.universe, [0, 0, 0.5])
-        var['medium'] = fuzz.trimf(var.universe, [0.25, 0.5, 0.75])
-        var['high'] = fuzz.trimf(var.universe, [0.5, 1.0, 1.0])
-
-# Membership functions for reaction_time (Very Low to Very High)
-    reaction_time['very_low'] = fuzz.trimf(reaction_time.universe, [0, 0, 0.2])
-    reaction_time['low'] = fuzz.trimf(reaction_time.universe, [0.1, 0.25, 0.4])
-    reaction_time['medium'] = fuzz.trimf(reaction_time.universe, [0.3, 0.5, 0.7])
-    reaction_time['high'] = fuzz.trimf(reaction_time.universe, [0.6, 0.75, 0.9])
-    reaction_time['very_high'] = fuzz.trimf(reaction_time.universe, [0.8, 1.0, 1.0])
-
-# Membership functions for output
-    motor_engagement['very_low'] = fuzz.trimf(motor_engagement.universe, [0, 0, 0.2])
-    motor_engagement['low'] = fuzz.trimf(motor_engagement.universe, [0.1, 0.25, 0.4])
-    motor_engagement['medium'] = fuzz.trimf(motor_engagement.universe, [0.3, 0.5, 0.7])
-    motor_engagement['high'] = fuzz.trimf(motor_engagement.universe, [0.6, 0.75, 0.9])
-    motor_engagement['very_high'] = fuzz.trimf(motor_engagement.universe, [0.8, 1.0, 1.0])
+# Membership functions for inputs (Low, Medium, High), reaction_time (Very Low to Very High) and output
+    for var in [reaction_time, speed, range_, motor_engagement]:
+        add_triangles(var, MEMBERSHIP_FUNCTIONS[var.label])
 
 # Define 25 fuzzy rules
     rules = [
@@ -77,21 +72,15 @@ def get_mortor_engagement(input_speed, input_range, input_symmetry):
         ctrl.Rule(reaction_time['very_high'] & speed['high'] & range_['high'], motor_engagement['medium'])
     ]
 
-# Build and simulate control system
-    motor_ctrl = ctrl.ControlSystem(rules)
-    motor_simulator = ctrl.ControlSystemSimulation(motor_ctrl)
+# Build control system
+    return ctrl.ControlSystem(rules)
 
-# Function to compute motor engagement values
-    def compute_motor_engagement(data_matrix):
-        results = []
-        for row in data_matrix:
-            rt, s, r = row
-            motor_simulator.input['reaction_time'] = rt
-            motor_simulator.input['speed'] = s
-            motor_simulator.input['range'] = r
-            motor_simulator.compute()
-            results.append(motor_simulator.output['motor_engagement'])
-        return np.array(results)
-
-    engagement_score = compute_motor_engagement(data_matrix = np.array(list(zip(input_reaction_time, input_speed, input_range))))
+def score_motor_engagement(input_reaction_time, input_speed, input_range):
+    engagement_score = infer('motor_engagement', stack_columns(input_reaction_time, input_speed, input_range))
     return round(min_max_normalize(engagement_score), 3)
+
+
+def get_mortor_engagement(input_speed, input_range, input_symmetry):
+    input_reaction_time = get_reaction_time_ms(stack_columns(input_speed, input_range, input_symmetry))
+    return score_motor_engagement(input_reaction_time, input_speed, input_range)
+
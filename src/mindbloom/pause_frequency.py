@@ -1,9 +1,26 @@
 import numpy as np
-import skfuzzy as fuzz
-from skfuzzy import control as ctrl
+from mindbloom.controllers import LEVEL_TRIANGLES, add_triangles
+from mindbloom.engine import infer_one
 
+PAUSE_FREQUENCY_MFS = {
+    'very_low': [0, 0, 0.2],
+    'low': [0.1, 0.3, 0.5],
+    'medium': [0.4, 0.5, 0.6],
+    'high': [0.5, 0.7, 0.9],
+    'very_high': [0.8, 1, 1],
+}
+
+MEMBERSHIP_FUNCTIONS = {
+    'reaction_time': LEVEL_TRIANGLES,
+    'speed': LEVEL_TRIANGLES,
+    'range': LEVEL_TRIANGLES,
+    'symmetry': LEVEL_TRIANGLES,
+    'pause_frequency': PAUSE_FREQUENCY_MFS,
+}
+
+def build_pause_ctrl():
+    from skfuzzy import control as ctrl
 
-def get_pause_frequency(input_reaction_time, input_speed, input_range, input_symmetry):
     reaction_time = ctrl.Antecedent(np.arange(0, 1.01, 0.01), 'reaction_time')
     speed = ctrl.Antecedent(np.arange(0, 1.01, 0.01), 'speed')
     range_ = ctrl.Antecedent(np.arange(0, 1.01, 0.01), 'range')
@@ -12,18 +29,9 @@ def get_pause_frequency(input_reaction_time, input_speed, input_range, input_sym
 # Define fuzzy output variable
     pause_frequency = ctrl.Consequent(np.arange(0, 1.01, 0.01), 'pause_frequency')
 
-# Membership functions for inputs
-    for var in [reaction_time, speed, range_, symmetry]:
-        var['low'] = fuzz.trimf(var.universe, [0, 0, 0.5])
-        var['medium'] = fuzz.trimf(var.universe, [0.25, 0.5, 0.75])
-        var['high'] = fuzz.trimf(var.universe, [0.5, 1, 1])
-
-# Membership functions for output
-    pause_frequency['very_low'] = fuzz.trimf(pause_frequency.universe, [0, 0, 0.2])
-    pause_frequency['low'] = fuzz.trimf(pause_frequency.universe, [0.1, 0.3, 0.5])
-    pause_frequency['medium'] = fuzz.trimf(pause_frequency.universe, [0.4, 0.5, 0.6])
-    pause_frequency['high'] = fuzz.trimf(pause_frequency.universe, [0.5, 0.7, 0.9])
-    pause_frequency['very_high'] = fuzz.trimf(pause_frequency.universe, [0.8, 1, 1])
+# Membership functions for inputs and output
+    for var in [reaction_time, speed, range_, symmetry, pause_frequency]:
+        add_triangles(var, MEMBERSHIP_FUNCTIONS[var.label])
 
 # Define fuzzy rules (25 rules)
     rules = [
@@ -58,16 +66,10 @@ def get_pause_frequency(input_reaction_time, input_speed, input_range, input_sym
     ctrl.Rule(reaction_time['high'] & speed['low'] & symmetry['medium'], pause_frequency['high']),
     ]
 
-# Create control system and simulation
-    pause_ctrl = ctrl.ControlSystem(rules)
-    pause_simulation = ctrl.ControlSystemSimulation(pause_ctrl)
+# Create control system
+    return ctrl.ControlSystem(rules)
 
-# Example input for prediction
-    pause_simulation.input['reaction_time'] = input_reaction_time
-    pause_simulation.input['speed'] = input_speed
-    pause_simulation.input['range'] = input_range
-    pause_simulation.input['symmetry'] = input_symmetry
 
-    pause_simulation.compute()
-    pas_freq = round(pause_simulation.output['pause_frequency'],3)
-    return pas_freq
\ No newline at end of file
+def get_pause_frequency(input_reaction_time, input_speed, input_range, input_symmetry):
+    pas_freq = round(infer_one('pause_frequency', input_reaction_time, input_speed, input_range, input_symmetry),3)
+    return pas_freq
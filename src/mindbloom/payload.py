@@ -0,0 +1,133 @@
+import io
+import struct
+import numpy as np
+from mindbloom.schemas import EmotionInput
+
+# Request body formats for /emotion_state and /emotion_state/batch.
+#
+#   application/json        EmotionInput, as before
+#   application/x-mindbloom binary session: a 16-byte header
+#                             magic b'MBEI', uint16 version (1), uint16 flags (0),
+#                             uint32 n_frames, uint32 n_samples   (little-endian)
+#                           followed by little-endian float32 emotion (n_frames x 7),
+#                           speed, ranges and symmetry (n_samples each). /batch takes
+#                           any number of sessions back to back.
+#   application/x-npz       numpy .npz archive with emotion, speed, ranges, symmetry
+#
+# Binary sessions are decoded with np.frombuffer, so the arrays are views on the body
+# and go to the scorers without building Python lists. Values are float32 on the wire.
+#
+# Whatever the format, validate_session checks a session before it is scored: at least
+# two emotion frames of 7 confidences, and speed, ranges and symmetry of one non-zero
+# length. Errors raised on purpose for bad input are InvalidInput, answered with 400.
+
+BINARY_TYPE = 'application/x-mindbloom'
+NPZ_TYPE = 'application/x-npz'
+
+MAGIC = b'MBEI'
+VERSION = 1
+HEADER = struct.Struct('<4sHHII')
+FLOAT = np.dtype('<f4')
+
+
+class InvalidInput(ValueError):
+    pass
+
+
+def content_kind(content_type):
+    kind = (content_type or '').split(';')[0].strip()
+    return kind if kind in (BINARY_TYPE, NPZ_TYPE) else 'json'
+
+
+def encode_session(emotion, speed, ranges, symmetry):
+    emotion = np.asarray(emotion, dtype=FLOAT).reshape(-1, 7)
+    motion = [np.asarray(column, dtype=FLOAT) for column in (speed, ranges, symmetry)]
+    if len({len(column) for column in motion}) != 1:
+        raise ValueError("speed, ranges and symmetry must have the same length.")
+    header = HEADER.pack(MAGIC, VERSION, 0, len(emotion), len(motion[0]))
+    return header + b''.join(array.tobytes() for array in (emotion, *motion))
+
+
+def decode_session(buffer, offset=0):
+    # Returns ((emotion, speed, ranges, symmetry), offset past the session)
+    if len(buffer) - offset < HEADER.size:
+        raise ValueError("Binary session is shorter than its header.")
+    magic, version, _, frames, samples = HEADER.unpack_from(buffer, offset)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"Not a version {VERSION} mindbloom binary session.")
+    offset += HEADER.size
+    end = offset + (frames * 7 + samples * 3) * FLOAT.itemsize
+    if len(buffer) < end:
+        raise ValueError(f"Binary session needs {end - offset} bytes of data, got {len(buffer) - offset}.")
+
+    emotion = np.frombuffer(buffer, FLOAT, frames * 7, offset).reshape(frames, 7)
+    offset += emotion.nbytes
+    motion = []
+    for _ in range(3):
+        motion.append(np.frombuffer(buffer, FLOAT, samples, offset))
+        offset += samples * FLOAT.itemsize
+    return (emotion, *motion), offset
+
+
+def iter_binary_sessions(buffer):
+    offset = 0
+    while offset < len(buffer):
+        session, offset = decode_session(buffer, offset)
+        yield session
+
+
+def decode_npz(body):
+    try:
+        with np.load(io.BytesIO(body), allow_pickle=False) as archive:
+            emotion = archive['emotion'].astype(float)
+            speed, ranges, symmetry = (archive[key].astype(float).ravel() for key in ('speed', 'ranges', 'symmetry'))
+    except (OSError, KeyError, ValueError) as error:
+        raise ValueError(f"Invalid npz session: {error}")
+    if emotion.ndim != 2 or emotion.shape[1] != 7:
+        raise ValueError(f"Expected emotion of shape (n_frames, 7), got {emotion.shape}.")
+    return emotion, speed, ranges, symmetry
+
+
+def validate_session(emotion, speed, ranges, symmetry):
+    if len(emotion) < 2:
+        raise InvalidInput(f"At least two emotion frames are needed, got {len(emotion)}.")
+    if isinstance(emotion, np.ndarray):
+        frames_ok = emotion.shape[1:] == (7,)
+    else:
+        frames_ok = all(len(frame) == 7 for frame in emotion)
+    if not frames_ok:
+        raise InvalidInput("Every emotion frame must hold 7 confidences.")
+    lengths = (len(speed), len(ranges), len(symmetry))
+    if len(set(lengths)) != 1:
+        raise InvalidInput(f"speed, ranges and symmetry must have the same length, got {lengths}.")
+    if not lengths[0]:
+        raise InvalidInput("At least one motion sample is needed.")
+    return emotion, speed, ranges, symmetry
+
+
+def parse_session(content_type, body):
+    # Raises pydantic.ValidationError for invalid JSON and ValueError for an invalid
+    # binary body or session
+    kind = content_kind(content_type)
+    if kind == BINARY_TYPE:
+        session, end = decode_session(body)
+        if end != len(body):
+            raise ValueError(f"Unexpected {len(body) - end} bytes after the binary session.")
+    elif kind == NPZ_TYPE:
+        session = decode_npz(body)
+    else:
+        session = EmotionInput.model_validate_json(body).session()
+    return validate_session(*session)
+
+
+# OpenAPI request body for endpoints that read the body themselves
+REQUEST_BODY = {
+    'requestBody': {
+        'required': True,
+        'content': {
+            'application/json': {'schema': EmotionInput.model_json_schema()},
+            BINARY_TYPE: {'schema': {'type': 'string', 'format': 'binary'}},
+            NPZ_TYPE: {'schema': {'type': 'string', 'format': 'binary'}},
+        },
+    },
+}
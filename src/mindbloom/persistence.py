@@ -0,0 +1,199 @@
+import asyncio
+import datetime
+import json
+import os
+import sqlite3
+import threading
+from mindbloom.engine import finite_or_none
+from mindbloom.metrics import count
+
+# Optional persistence of scored sessions, off the response path.
+#
+# /emotion_state puts one record per scored session (scores plus the intermediate
+# controller inputs) on a bounded in-process WriteBehindQueue and returns right away.
+# A background task drains the queue in batches of up to `batch_size` records, or
+# whatever arrived within `flush_interval` seconds, and hands each batch to the backend
+# on a thread. Failed batches are retried with exponential backoff and dropped after
+# `max_retries`; when the queue is full new records are dropped instead of waiting.
+# Queued, written, retried, dropped and failed records are counted in
+# mindbloom_persist_events_total on /metrics.
+#
+# Backends implement insert_many(records) and close():
+#   SupabaseBackend  one supabase client (and its pooled HTTP connections) per process;
+#                    the table is created by supabase/migrations/*_create_emotion_scores.sql
+#                    (created_at, the three scores, features as jsonb)
+#   SQLiteBackend    local stand-in with the same records, one connection per thread;
+#                    creates its table itself
+#
+# Configured from the environment (and a .env file when python-dotenv is installed):
+#   MINDBLOOM_PERSIST        'supabase', or 'sqlite:PATH'; unset disables persistence
+#   SUPABASE_URL, SUPABASE_KEY
+#   MINDBLOOM_PERSIST_TABLE  table name, defaults to 'emotion_scores' (same columns)
+#   MINDBLOOM_PERSIST_QUEUE  queued records before dropping, defaults to 10000
+#   MINDBLOOM_PERSIST_BATCH  records per insert, defaults to 100
+
+PERSIST_ENV = 'MINDBLOOM_PERSIST'
+PERSIST_TABLE_ENV = 'MINDBLOOM_PERSIST_TABLE'
+PERSIST_QUEUE_ENV = 'MINDBLOOM_PERSIST_QUEUE'
+PERSIST_BATCH_ENV = 'MINDBLOOM_PERSIST_BATCH'
+
+DEFAULT_TABLE = 'emotion_scores'
+PERSIST_EVENTS = 'mindbloom_persist_events_total'
+MAX_BACKOFF = 30.0
+
+
+def make_record(scores, intermediates):
+    return {
+        'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        **{key: finite_or_none(value) for key, value in scores.items()},
+        'features': {key: finite_or_none(value) for key, value in intermediates.items()},
+    }
+
+
+class SQLiteBackend:
+    def __init__(self, path, table=DEFAULT_TABLE):
+        self.path = path
+        self.table = table
+        self._local = threading.local()
+        with self._connection() as db:
+            db.execute(f'CREATE TABLE IF NOT EXISTS {table} (id INTEGER PRIMARY KEY, created_at TEXT, '
+                       'focus_score REAL, motor_engagement_score REAL, emotion_stability_score REAL, features TEXT)')
+
+    def _connection(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = self._local.db = sqlite3.connect(self.path, timeout=5.0)
+            db.execute('PRAGMA journal_mode=WAL')
+        return db
+
+    def insert_many(self, records):
+        with self._connection() as db:
+            db.executemany(
+                f'INSERT INTO {self.table} (created_at, focus_score, motor_engagement_score, emotion_stability_score, features) '
+                'VALUES (?, ?, ?, ?, ?)',
+                [(r['created_at'], r['focus_score'], r['motor_engagement_score'], r['emotion_stability_score'],
+                  json.dumps(r['features'])) for r in records])
+
+    def close(self):
+        db = getattr(self._local, 'db', None)
+        if db is not None:
+            db.close()
+            self._local.db = None
+
+
+class SupabaseBackend:
+    def __init__(self, url, key, table=DEFAULT_TABLE):
+        self.url = url
+        self.key = key
+        self.table = table
+        self._client = None
+        self._lock = threading.Lock()
+
+    def _get_client(self):
+        # Created once and reused, so inserts share its HTTP connection pool
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from supabase import create_client
+                    self._client = create_client(self.url, self.key)
+        return self._client
+
+    def insert_many(self, records):
+        self._get_client().table(self.table).insert(records).execute()
+
+    def close(self):
+        self._client = None
+
+
+def backend_from_env():
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+    kind = os.environ.get(PERSIST_ENV, '')
+    table = os.environ.get(PERSIST_TABLE_ENV, DEFAULT_TABLE)
+    if not kind:
+        return None
+    if kind == 'supabase':
+        url, key = os.environ.get('SUPABASE_URL'), os.environ.get('SUPABASE_KEY')
+        if not url or not key:
+            raise ValueError("MINDBLOOM_PERSIST=supabase needs SUPABASE_URL and SUPABASE_KEY.")
+        return SupabaseBackend(url, key, table)
+    if kind.startswith('sqlite:'):
+        return SQLiteBackend(kind[len('sqlite:'):], table)
+    raise ValueError(f"Unknown persistence backend '{kind}'. Expected 'supabase' or 'sqlite:PATH'.")
+
+
+class WriteBehindQueue:
+    def __init__(self, backend, max_size=10000, batch_size=100, flush_interval=1.0, max_retries=5, backoff=0.5):
+        self.backend = backend
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._queue = asyncio.Queue(max_size)
+        self._task = None
+
+    @classmethod
+    def from_env(cls):
+        backend = backend_from_env()
+        if backend is None:
+            return None
+        return cls(backend, int(os.environ.get(PERSIST_QUEUE_ENV, 10000)), int(os.environ.get(PERSIST_BATCH_ENV, 100)))
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._drain())
+        return self
+
+    def put(self, record):
+        # Never waits: a full queue drops the record
+        try:
+            self._queue.put_nowait(record)
+            count(PERSIST_EVENTS, ('queued',))
+        except asyncio.QueueFull:
+            count(PERSIST_EVENTS, ('dropped',))
+
+    async def _next_batch(self):
+        batch = [await self._queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _write(self, batch):
+        for attempt in range(self.max_retries + 1):
+            try:
+                await asyncio.to_thread(self.backend.insert_many, batch)
+                count(PERSIST_EVENTS, ('written',), len(batch))
+                return
+            except Exception:
+                if attempt == self.max_retries:
+                    count(PERSIST_EVENTS, ('failed',), len(batch))
+                    return
+                count(PERSIST_EVENTS, ('retried',), len(batch))
+                await asyncio.sleep(min(self.backoff * 2 ** attempt, MAX_BACKOFF))
+
+    async def _drain(self):
+        while True:
+            batch = await self._next_batch()
+            await self._write(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+    async def close(self, timeout=5.0):
+        # Gives queued records up to `timeout` seconds to be written
+        if self._task is not None:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._task.cancel()
+            self._task = None
+        await asyncio.to_thread(self.backend.close)
@@ -0,0 +1,131 @@
+import argparse
+import json
+import math
+import os
+import time
+import numpy as np
+from mindbloom.focus import min_max_normalize
+
+# Reduction of long motion series before inference.
+#
+# Reaction-time and motor-engagement inference runs once per motion sample, but the
+# scores only use aggregates of the samples: min-max normalized means of speed, range,
+# symmetry, reaction time and engagement. With max_samples set, a session with more
+# samples is scored on at most max_samples weighted rows:
+#   - block means of consecutive samples, weighted by block size, so weighted means
+#     of the columns equal their means over all samples
+#   - the samples holding each column's minimum and maximum, with weight 0, so the
+#     column ranges are kept too; for limits too small to hold them next to a block
+#     (at most 6 rows) they are left out and the ranges are those of the block means
+# normalized speed, range and symmetry are therefore exact (to round-off); reaction
+# time, engagement and the scores built on them are approximations, as the
+# controllers are not linear. `error_report` (mindbloom reduce report) measures how
+# far they move against the full computation.
+#
+# Emotion frames are not reduced: their features come from one vectorized pass
+# (mindbloom.features) that costs about as much as compressing the frames would.
+#
+# Configured per request with the X-Mindbloom-Max-Samples header, else from
+# MINDBLOOM_MAX_SAMPLES; unset or 0 scores every sample.
+#
+# `mindbloom reduce report --input DIR` runs error_report on recorded sessions;
+# benchmarks/synthetic.py runs it on synthetic ones.
+
+MAX_SAMPLES_ENV = 'MINDBLOOM_MAX_SAMPLES'
+MAX_SAMPLES_HEADER = 'x-mindbloom-max-samples'
+SCORES = ('focus_score', 'motor_engagement_score', 'emotion_stability_score')
+
+
+def reduce_motion(rows, max_samples):
+    # (rows, weights) with at most max_samples rows, or (rows, None) when already small enough
+    rows = np.asarray(rows, dtype=float)
+    if not max_samples or len(rows) <= max_samples:
+        return rows, None
+    extremes = np.unique(np.concatenate([rows.argmin(axis=0), rows.argmax(axis=0)]))
+    if max_samples <= len(extremes):
+        extremes = extremes[:0]
+    block = math.ceil(len(rows) / (max_samples - len(extremes)))
+    starts = np.arange(0, len(rows), block)
+    sizes = np.diff(np.append(starts, len(rows)))
+    means = np.add.reduceat(rows, starts, axis=0) / sizes[:, None]
+    return np.vstack([means, rows[extremes]]), np.concatenate([sizes, np.zeros(len(extremes))]).astype(float)
+
+
+def normalized_mean(values, weights=None):
+    # min_max_normalize(values, 'mean') over weighted rows
+    if weights is None:
+        return min_max_normalize(values)
+    low, high = np.min(values), np.max(values)
+    return np.average((values - low) / (high - low + 1e-8), weights=weights)
+
+
+def max_samples_for(header, default=None):
+    # Per-request limit from the header, else the default; None for no reduction
+    if not header:
+        return default
+    try:
+        max_samples = int(header)
+    except ValueError:
+        raise ValueError(f"Invalid sample limit '{header}'; expected an integer.")
+    if max_samples < 0:
+        raise ValueError("The sample limit cannot be negative.")
+    return max_samples or None
+
+
+def max_samples_from_env():
+    return max_samples_for(os.environ.get(MAX_SAMPLES_ENV))
+
+
+def error_report(sessions, max_samples):
+    # Score deviation of reduced scoring from full scoring over the given sessions
+    from mindbloom.context import score_session
+
+    errors = {name: [] for name in SCORES}
+    nan_mismatches = dict.fromkeys(SCORES, 0)
+    full_seconds = reduced_seconds = 0.0
+    for session in sessions:
+        start = time.perf_counter()
+        full = score_session(*session)
+        middle = time.perf_counter()
+        reduced = score_session(*session, max_samples=max_samples)
+        full_seconds += middle - start
+        reduced_seconds += time.perf_counter() - middle
+        for name in SCORES:
+            if math.isnan(full[name]) != math.isnan(reduced[name]):
+                nan_mismatches[name] += 1
+            elif not math.isnan(full[name]):
+                errors[name].append(abs(full[name] - reduced[name]))
+
+    report = {'max_samples': max_samples, 'sessions': len(sessions),
+              'speedup': full_seconds / reduced_seconds if reduced_seconds else 0.0}
+    for name in SCORES:
+        error = np.asarray(errors[name]) if errors[name] else np.zeros(1)
+        report[name] = {
+            'max_abs_error': float(error.max()),
+            'mean_abs_error': float(error.mean()),
+            'p99_abs_error': float(np.percentile(error, 99)),
+            # Sessions where only one side has no rule firing (NaN)
+            'nan_mismatches': nan_mismatches[name],
+        }
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='mindbloom reduce', description='Measure the error of reduced motion scoring.')
+    parser.add_argument('command', choices=['report'])
+    parser.add_argument('--max-samples', type=int, nargs='+', default=[256, 1024])
+    parser.add_argument('--input', required=True, help='directory of recorded sessions, as for mindbloom backfill')
+    parser.add_argument('--sessions', type=int, default=50, help='sessions to score')
+    args = parser.parse_args(argv)
+
+    from mindbloom.backfill import open_source
+    from mindbloom.workers import warm_up_worker
+    warm_up_worker()
+    source = open_source(os.path.abspath(args.input))
+    sessions = list(source.sessions(0, min(len(source), args.sessions)))
+    for max_samples in args.max_samples:
+        print(json.dumps(error_report(sessions, max_samples)))
+
+
+if __name__ == '__main__':
+    main()
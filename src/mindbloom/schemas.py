@@ -0,0 +1,12 @@
+from pydantic import BaseModel
+from typing import List
+
+# Define payload structure
+class EmotionInput(BaseModel):
+    emotion: List[List[float]]
+    speed: List[float]
+    ranges: List[float]
+    symmetry: List[float]
+
+    def session(self):
+        return (self.emotion, self.speed, self.ranges, self.symmetry)
@@ -0,0 +1,138 @@
+import asyncio
+import math
+import os
+import time
+from contextlib import contextmanager
+from mindbloom.metrics import count
+
+# Deadline-aware admission control for /emotion_state.
+#
+# A request's deadline is the X-Mindbloom-Deadline-Ms header, else MINDBLOOM_DEADLINE_MS
+# (no deadline when neither is set). Before scoring, the LoadShedder estimates the
+# request's latency from its input rows (frames + motion samples), the rows of the
+# requests already in flight and the observed cost per row, an average over recent
+# requests (timed-out ones included):
+#   full      the estimate fits the deadline
+#   degraded  it does not, but scoring the session with its motion samples reduced to
+#             MINDBLOOM_DEGRADED_ROWS weighted rows (see mindbloom.reduction) does
+#   rejected  neither fits, or MINDBLOOM_MAX_INFLIGHT requests are in flight:
+#             503 with Retry-After
+# Clients may ask for a mode with X-Mindbloom-Mode: 'degraded' always degrades, 'full'
+# is rejected rather than degraded, 'auto' (the default) lets the shedder choose. A
+# session with no more than MINDBLOOM_DEGRADED_ROWS samples has nothing to reduce and
+# is always scored (and reported) as 'full'. The
+# mode used comes back in the X-Mindbloom-Mode response header and is counted in
+# mindbloom_shed_events_total. The deadline also caps how long the request waits for
+# its result, so an overrun still ends with 504 at the deadline.
+
+DEADLINE_ENV = 'MINDBLOOM_DEADLINE_MS'
+MAX_INFLIGHT_ENV = 'MINDBLOOM_MAX_INFLIGHT'
+DEGRADED_ROWS_ENV = 'MINDBLOOM_DEGRADED_ROWS'
+
+DEADLINE_HEADER = 'x-mindbloom-deadline-ms'
+MODE_HEADER = 'x-mindbloom-mode'
+MODES = ('auto', 'full', 'degraded')
+
+SHED_EVENTS = 'mindbloom_shed_events_total'
+# Fixed cost of a request (parsing, controller calls), in rows
+OVERHEAD_ROWS = 32
+SMOOTHING = 0.2
+# Share of the deadline an estimate may use; the rest absorbs estimation error
+HEADROOM = 0.8
+
+
+class Overloaded(RuntimeError):
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class LoadShedder:
+    def __init__(self, workers=1, deadline_ms=None, max_inflight=None, degraded_rows=256):
+        self.workers = workers
+        self.deadline = deadline_ms / 1000.0 if deadline_ms else None
+        self.max_inflight = max_inflight
+        self.degraded_rows = degraded_rows
+        self.inflight = 0
+        self.inflight_rows = 0
+        # Seconds per input row; 0 until the first request finishes
+        self.row_seconds = 0.0
+
+    @classmethod
+    def from_env(cls, workers=1):
+        deadline_ms = os.environ.get(DEADLINE_ENV)
+        max_inflight = os.environ.get(MAX_INFLIGHT_ENV)
+        return cls(
+            workers=workers,
+            deadline_ms=float(deadline_ms) if deadline_ms else None,
+            max_inflight=int(max_inflight) if max_inflight else None,
+            degraded_rows=int(os.environ.get(DEGRADED_ROWS_ENV, 256)),
+        )
+
+    def deadline_for(self, header):
+        # Seconds, or None for no deadline
+        if not header:
+            return self.deadline
+        try:
+            deadline_ms = float(header)
+        except ValueError:
+            raise ValueError(f"Invalid deadline '{header}'; expected milliseconds.")
+        if deadline_ms <= 0:
+            raise ValueError("The deadline must be positive.")
+        return deadline_ms / 1000.0
+
+    def _cost(self, rows, ahead_rows):
+        # Rows of the requests in flight are shared out over the workers first
+        return ahead_rows / self.workers + rows + OVERHEAD_ROWS
+
+    def estimate(self, rows):
+        return self._cost(rows, self.inflight_rows + OVERHEAD_ROWS * self.inflight) * self.row_seconds
+
+    def _learn(self, seconds, cost):
+        sample = seconds / cost
+        self.row_seconds = sample if not self.row_seconds else self.row_seconds + SMOOTHING * (sample - self.row_seconds)
+
+    def _reject(self, message, seconds):
+        count(SHED_EVENTS, ('rejected',))
+        raise Overloaded(message, max(1, math.ceil(seconds)))
+
+    def admit(self, frames, samples, deadline=None, requested=None):
+        # 'full' or 'degraded'; raises Overloaded when the request should be refused
+        requested = requested or 'auto'
+        if requested not in MODES:
+            raise ValueError(f"Unknown mode '{requested}'. Expected one of {MODES}.")
+        if self.max_inflight and self.inflight >= self.max_inflight:
+            self._reject(f"{self.inflight} requests are already being scored.", self.estimate(0))
+
+        full = self.estimate(frames + samples)
+        reducible = samples > self.degraded_rows
+        if requested == 'degraded':
+            mode = 'degraded' if reducible else 'full'
+        elif deadline is None or full <= deadline * HEADROOM:
+            mode = 'full'
+        elif requested == 'auto' and reducible and self.estimate(frames + self.degraded_rows) <= deadline * HEADROOM:
+            mode = 'degraded'
+        else:
+            self._reject(f"Scoring would take about {full * 1000:.0f}ms, over the {deadline * 1000:.0f}ms deadline.",
+                         full - deadline * HEADROOM)
+        count(SHED_EVENTS, (mode,))
+        return mode
+
+    @contextmanager
+    def track(self, rows):
+        # Around the scoring of an admitted request; learns the cost per row from it
+        cost = self._cost(rows, self.inflight_rows + OVERHEAD_ROWS * self.inflight)
+        self.inflight += 1
+        self.inflight_rows += rows
+        started = time.perf_counter()
+        try:
+            yield
+        except asyncio.TimeoutError:
+            # Only a lower bound, but it still pushes the estimate up under overload
+            self._learn(time.perf_counter() - started, cost)
+            raise
+        else:
+            self._learn(time.perf_counter() - started, cost)
+        finally:
+            self.inflight -= 1
+            self.inflight_rows -= rows
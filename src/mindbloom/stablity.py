@@ -1,48 +1,25 @@
 import numpy as np
-import skfuzzy as fuzz
-from skfuzzy import control as ctrl
+from mindbloom.controllers import FIVE_LEVEL_TRIANGLES, add_triangles
+from mindbloom.engine import infer_one
+from mindbloom.features import extract_features
 
 
 def process_emotion_series(emotion_confidences):
-    emotion_array = np.array(emotion_confidences)  # shape: (n_frames, 7)
+    features = extract_features(emotion_confidences)
+    return features.volatility, features.microexpression_count, features.expression_change_count
 
-    # Dominant emotion per frame
-    dominant_indices = np.argmax(emotion_array, axis=1)
+MEMBERSHIP_FUNCTIONS = {
+    'emotion_volatility': FIVE_LEVEL_TRIANGLES,
+    'microexpression_count': FIVE_LEVEL_TRIANGLES,
+    'expression_change_count': FIVE_LEVEL_TRIANGLES,
+    'emotional_stability': FIVE_LEVEL_TRIANGLES,
+}
 
-    # 1. Emotional Volatility (normalized std of dominant indices)
-    volatility = np.std(dominant_indices) / 6  # max spread is 0–6
 
-    # 2. Expression Change Count (normalized)
-    expression_changes = np.sum(dominant_indices[:-1] != dominant_indices[1:])
-    expression_change_count = expression_changes / (len(dominant_indices) - 1)
 
-    # 3. Microexpression Count (spikes in non-dominant emotions)
-    micro_count = 0
-    threshold = 0.3
-    for i in range(1, len(emotion_array)):
-        prev = emotion_array[i - 1]
-        curr = emotion_array[i]
-        diffs = curr - prev
-        # Count only significant upward spikes in non-dominants
-        for j in range(7):
-            if j != np.argmax(curr) and diffs[j] > threshold:
-                micro_count += 1
+def build_stability_ctrl():
+    from skfuzzy import control as ctrl
 
-    microexpression_count = micro_count / ((len(emotion_array) - 1) * 6)  # Normalize to 0–1
-
-    return volatility, microexpression_count, expression_change_count
-
-def define_five_mfs(var):
-    var['very_low'] = fuzz.trimf(var.universe, [0.0, 0.0, 0.2])
-    var['low'] = fuzz.trimf(var.universe, [0.1, 0.25, 0.4])
-    var['medium'] = fuzz.trimf(var.universe, [0.35, 0.5, 0.65])
-    var['high'] = fuzz.trimf(var.universe, [0.6, 0.75, 0.9])
-    var['very_high'] = fuzz.trimf(var.universe, [0.8, 1.0, 1.0])
-
-
-
-def emotion_stablity(input_state):
-    
     emotion_volatility = ctrl.Antecedent(np.arange(0, 1.01, 0.01), 'emotion_volatility')
     microexpression_count = ctrl.Antecedent(np.arange(0, 1.01, 0.01), 'microexpression_count')
     expression_change_count = ctrl.Antecedent(np.arange(0, 1.01, 0.01), 'expression_change_count')
@@ -51,7 +28,7 @@ def emotion_stablity(input_state):
     emotional_stability = ctrl.Consequent(np.arange(0, 1.01, 0.01), 'emotional_stability')
     
     for var in [emotion_volatility, microexpression_count, expression_change_count, emotional_stability]:
-        define_five_mfs(var)
+        add_triangles(var, MEMBERSHIP_FUNCTIONS[var.label])
     
     rules_em = [
     # Very stable cases
@@ -74,17 +51,14 @@ def emotion_stablity(input_state):
     ctrl.Rule(emotion_volatility['high'] | microexpression_count['high'], emotional_stability['low']),
     ctrl.Rule(emotion_volatility['very_high'] & microexpression_count['very_high'], emotional_stability['very_low']),
     ]
+    return ctrl.ControlSystem(rules_em)
 
 
-    emotion_confidences=[]
-    em_vol,mic_exp,exp_cha_cou=process_emotion_series(input_state)
-    em_stability_ctrl = ctrl.ControlSystem(rules_em)
-    em_stability_simulator = ctrl.ControlSystemSimulation(em_stability_ctrl)
-    em_stability_simulator.input['emotion_volatility'] = em_vol
-    em_stability_simulator.input['microexpression_count'] = mic_exp
-    em_stability_simulator.input['expression_change_count'] = exp_cha_cou
+def score_stability(em_vol, mic_exp, exp_cha_cou):
+    return round(infer_one('stability', em_vol, mic_exp, exp_cha_cou),3)
 
-    
-    em_stability_simulator.compute()
-    stabilty_value = round(em_stability_simulator.output['emotional_stability'],3)
-    return stabilty_value
\ No newline at end of file
+
+def emotion_stablity(input_state):
+    em_vol,mic_exp,exp_cha_cou=process_emotion_series(input_state)
+    stabilty_value = score_stability(em_vol, mic_exp, exp_cha_cou)
+    return stabilty_value
@@ -0,0 +1,128 @@
+import math
+import numpy as np
+from mindbloom.engine import finite_or_none, infer
+from mindbloom.features import MICRO_THRESHOLD
+from mindbloom.focus import score_focus
+from mindbloom.pause_frequency import get_pause_frequency
+from mindbloom.reaction_time_ms import get_reaction_time_ms
+from mindbloom.stablity import score_stability
+
+# Incremental session scoring for /emotion_state/stream.
+#
+# Every score reduces its inputs to aggregates that can be updated one frame or one
+# motion sample at a time, so a session keeps O(1) state however long it runs:
+#   - dominant emotion index: count, running mean and sum of squared deviations (Welford)
+#     for the volatility, dominant changes for the change rate, the previous frame for
+#     micro-expression spikes, and the summed dominant strength for the focus input
+#   - per sample: reaction-time and motor-engagement inference on the new rows only,
+#     with running sum/min/max of reaction time, speed, range, symmetry and motor
+#     engagement, which is all min_max_normalize(..., 'mean') needs
+# scores() gives the same values as scoring the whole session at once.
+#
+# add_message and scores run inference, so the endpoint calls them off the event loop,
+# one at a time per connection; a SessionState is not meant to be shared.
+
+
+class RunningRange:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        if values.size == 0:
+            return
+        self.count += values.size
+        self.total += values.sum()
+        # np.minimum/np.maximum keep NaN, as np.min/np.max over the whole series would
+        self.min = float(np.minimum(self.min, values.min()))
+        self.max = float(np.maximum(self.max, values.max()))
+
+    def normalized_mean(self):
+        # Same as min_max_normalize(all_values) with method='mean'
+        return (self.total / self.count - self.min) / (self.max - self.min + 1e-8)
+
+
+class SessionState:
+    def __init__(self):
+        self.frames = 0
+        self.dominant_mean = 0.0
+        self.dominant_m2 = 0.0
+        self.changes = 0
+        self.micro_count = 0
+        self.strength_total = 0.0
+        self.previous_frame = None
+        self.previous_dominant = None
+
+        self.reaction_time = RunningRange()
+        self.speed = RunningRange()
+        self.range = RunningRange()
+        self.symmetry = RunningRange()
+        self.motor_engagement = RunningRange()
+
+    def add_frames(self, frames):
+        frames = np.asarray(frames, dtype=float)
+        if frames.ndim != 2 or frames.shape[1] != 7:
+            raise ValueError(f"Expected emotion frames of 7 confidences, got shape {frames.shape}.")
+        for frame in frames:
+            dominant = int(np.argmax(frame))
+            self.frames += 1
+            delta = dominant - self.dominant_mean
+            self.dominant_mean += delta / self.frames
+            self.dominant_m2 += delta * (dominant - self.dominant_mean)
+            self.strength_total += frame[dominant]
+
+            if self.previous_frame is not None:
+                self.changes += dominant != self.previous_dominant
+                spikes = (frame - self.previous_frame) > MICRO_THRESHOLD
+                spikes[dominant] = False
+                self.micro_count += int(spikes.sum())
+            self.previous_frame = frame
+            self.previous_dominant = dominant
+
+    def add_samples(self, speed, ranges, symmetry):
+        rows = np.column_stack([np.asarray(speed, dtype=float), np.asarray(ranges, dtype=float),
+                                np.asarray(symmetry, dtype=float)])
+        if len(rows) == 0:
+            return
+        reaction_times = get_reaction_time_ms(rows)
+        engagement = infer('motor_engagement', np.column_stack([reaction_times, rows[:, 0], rows[:, 1]]))
+        self.reaction_time.update(reaction_times)
+        self.speed.update(rows[:, 0])
+        self.range.update(rows[:, 1])
+        self.symmetry.update(rows[:, 2])
+        self.motor_engagement.update(engagement)
+
+    def add_message(self, message):
+        # {"emotion": [[...7 confidences]]} and/or {"speed": [...], "ranges": [...], "symmetry": [...]}
+        if message.get("emotion"):
+            self.add_frames(message["emotion"])
+        if message.get("speed"):
+            self.add_samples(message["speed"], message.get("ranges", []), message.get("symmetry", []))
+
+    def emotion_features(self):
+        # (volatility, microexpression_count, expression_change_count), as process_emotion_series
+        transitions = self.frames - 1
+        volatility = math.sqrt(self.dominant_m2 / self.frames) / 6
+        return volatility, self.micro_count / (transitions * 6), self.changes / transitions
+
+    def input_focus(self):
+        # As get_input_focus: consistency is the share of transitions without a change
+        transitions = self.frames - 1
+        return 0.5 * (transitions - self.changes) / transitions + 0.5 * self.strength_total / self.frames
+
+    def scores(self):
+        scores = {"frames": self.frames, "samples": self.speed.count,
+                  "focus_score": None, "motor_engagement_score": None, "emotion_stability_score": None}
+        if self.frames >= 2:
+            scores["emotion_stability_score"] = finite_or_none(score_stability(*self.emotion_features()))
+        if self.speed.count:
+            scores["motor_engagement_score"] = finite_or_none(round(self.motor_engagement.normalized_mean(), 3))
+            if self.frames >= 2:
+                reaction_time = self.reaction_time.normalized_mean()
+                pause_frequency = get_pause_frequency(reaction_time, self.speed.normalized_mean(),
+                                                      self.range.normalized_mean(), self.symmetry.normalized_mean())
+                scores["focus_score"] = finite_or_none(score_focus(self.input_focus(), pause_frequency, reaction_time))
+        return scores
@@ -0,0 +1,108 @@
+import math
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from mindbloom.engine import finite_or_none, infer
+from mindbloom.features import MICRO_THRESHOLD, stack_columns
+from mindbloom.payload import InvalidInput
+from mindbloom.reaction_time_ms import get_reaction_time_ms
+
+# Sliding-window scoring: the three session scores over time.
+#
+# Window k covers [k * step, k * step + window) seconds of the session; emotion frames
+# and motion samples are mapped to it through frame_rate and sample_rate (per second,
+# so with the default rate of 1 window and step count frames and samples). Only
+# windows covered by both streams are scored.
+#
+# Each window's scores equal scoring its slice on its own, but the work is shared:
+#   - per frame, once: dominant index and strength, dominant changes and
+#     micro-expression spikes; per window they are differences of prefix sums
+#   - per motion sample, once: reaction-time and motor-engagement inference;
+#     per window only means (prefix sums) and min/max over a sliding view remain
+#   - per window: one batched inference each for stability, pause frequency and focus
+
+
+def _prefix(values):
+    return np.concatenate([[0.0], np.cumsum(values, dtype=float)])
+
+
+def _window_sums(prefix, starts, size):
+    return prefix[starts + size] - prefix[starts]
+
+
+def _normalized_means(values, starts, size):
+    # min_max_normalize(window, 'mean') for every window
+    windows = sliding_window_view(values, size)[starts]
+    low, high = windows.min(axis=1), windows.max(axis=1)
+    mean = _window_sums(_prefix(values), starts, size) / size
+    return (mean - low) / (high - low + 1e-8)
+
+
+def window_scores(emotion, speed, ranges, symmetry, window, step, frame_rate=1.0, sample_rate=None):
+    sample_rate = frame_rate if sample_rate is None else sample_rate
+    if window <= 0 or step <= 0 or frame_rate <= 0 or sample_rate <= 0:
+        raise InvalidInput("window, step, frame_rate and sample_rate must be positive.")
+    emotions = np.asarray(emotion, dtype=float)
+    if emotions.ndim != 2 or emotions.shape[1] != 7:
+        raise InvalidInput(f"Expected emotion of shape (n_frames, 7), got {emotions.shape}.")
+    rows = stack_columns(speed, ranges, symmetry)
+
+    frame_size = int(round(window * frame_rate))
+    sample_size = int(round(window * sample_rate))
+    if frame_size < 2 or sample_size < 1:
+        raise InvalidInput("A window needs at least two emotion frames and one motion sample.")
+    count = min(
+        math.floor((len(emotions) / frame_rate - window) / step + 1e-9) + 1,
+        math.floor((len(rows) / sample_rate - window) / step + 1e-9) + 1,
+    )
+    starts = np.arange(max(count, 0)) * step
+    frame_starts = np.minimum(np.round(starts * frame_rate).astype(np.int64), len(emotions) - frame_size)
+    sample_starts = np.minimum(np.round(starts * sample_rate).astype(np.int64), len(rows) - sample_size)
+    scores = {
+        'start': starts,
+        'end': starts + window,
+        'focus_score': np.empty(len(starts)),
+        'motor_engagement_score': np.empty(len(starts)),
+        'emotion_stability_score': np.empty(len(starts)),
+    }
+    if not len(starts):
+        return scores
+
+    # Per frame
+    dominant = np.argmax(emotions, axis=1)
+    strength = emotions[np.arange(len(emotions)), dominant]
+    changes = dominant[1:] != dominant[:-1]
+    spikes = np.diff(emotions, axis=0) > MICRO_THRESHOLD
+    spikes[np.arange(len(spikes)), dominant[1:]] = False
+    # Transition i (frame i -> i + 1) belongs to a window that holds both frames
+    transitions = frame_size - 1
+    window_changes = _window_sums(_prefix(changes), frame_starts, transitions)
+    window_spikes = _window_sums(_prefix(spikes.sum(axis=1)), frame_starts, transitions)
+    mean_dominant = _window_sums(_prefix(dominant), frame_starts, frame_size) / frame_size
+    mean_square = _window_sums(_prefix(dominant.astype(float) ** 2), frame_starts, frame_size) / frame_size
+    volatility = np.sqrt(np.maximum(mean_square - mean_dominant ** 2, 0.0)) / 6
+    change_rate = window_changes / transitions
+    micro_rate = window_spikes / (transitions * 6)
+    consistency = (transitions - window_changes) / transitions
+    input_focus = 0.5 * consistency + 0.5 * _window_sums(_prefix(strength), frame_starts, frame_size) / frame_size
+
+    # Per motion sample
+    reaction_times = get_reaction_time_ms(rows)
+    engagement = infer('motor_engagement', np.column_stack([reaction_times, rows[:, 0], rows[:, 1]]))
+
+    # Per window
+    reaction_time = _normalized_means(reaction_times, sample_starts, sample_size)
+    pause_rows = np.column_stack([reaction_time] + [_normalized_means(rows[:, i], sample_starts, sample_size) for i in range(3)])
+    pause_frequency = np.round(infer('pause_frequency', pause_rows), 3)
+    scores['focus_score'] = np.round(infer('focus', np.column_stack([input_focus, pause_frequency, reaction_time])), 3)
+    scores['motor_engagement_score'] = np.round(_normalized_means(engagement, sample_starts, sample_size), 3)
+    scores['emotion_stability_score'] = np.round(infer('stability', np.column_stack([volatility, micro_rate, change_rate])), 3)
+    return scores
+
+
+def score_timeline(emotion, speed, ranges, symmetry, window, step, frame_rate=1.0, sample_rate=None):
+    # window_scores as a JSON-ready list, one dict per window; NaN (no rule fired) -> None
+    scores = window_scores(emotion, speed, ranges, symmetry, window, step, frame_rate, sample_rate)
+    return [
+        {key: finite_or_none(values[i]) for key, values in scores.items()}
+        for i in range(len(scores['start']))
+    ]
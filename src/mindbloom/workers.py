@@ -0,0 +1,136 @@
+import asyncio
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from mindbloom import metrics
+from mindbloom.controllers import CONTROLLER_INPUTS, CONTROLLER_NAMES, build_all
+
+# Executor that keeps the CPU-bound fuzzy scoring off the asyncio event loop.
+#
+# Configured from the environment:
+#   MINDBLOOM_EXECUTOR  'thread' (default), 'process' or 'inline' (run on the loop, as before)
+#   MINDBLOOM_WORKERS   worker count, defaults to the number of CPUs
+#   MINDBLOOM_MAX_QUEUE jobs allowed in flight (running + queued), defaults to 4 per worker
+#   MINDBLOOM_TIMEOUT   seconds a request waits for its result, defaults to 30
+#
+# warm_up_worker builds every controller, loads lookup tables / engine overrides and
+# result caches, and runs one inference per controller. The app runs it before reporting ready, and
+# process workers run it when they start, so the first request in each child does
+# not pay for it. ProcessPoolExecutor only starts children on demand, so `start`
+# submits one no-op per worker to spawn them all at once; each child reports when its
+# warm-up is done, and `wait_ready` (awaited before /ready) returns once all have. With MINDBLOOM_ARTIFACTS_DIR the controllers and lookup tables are
+# mapped from prebuilt files instead (see mindbloom.artifacts).
+
+EXECUTOR_ENV = 'MINDBLOOM_EXECUTOR'
+WORKERS_ENV = 'MINDBLOOM_WORKERS'
+MAX_QUEUE_ENV = 'MINDBLOOM_MAX_QUEUE'
+TIMEOUT_ENV = 'MINDBLOOM_TIMEOUT'
+
+EXECUTOR_KINDS = ('thread', 'process', 'inline')
+
+
+class QueueFullError(RuntimeError):
+    pass
+
+
+def warm_up_worker():
+    from mindbloom.artifacts import load_from_env as load_artifacts
+    from mindbloom.cache import configure_from_env as configure_caches
+    from mindbloom.engine import configure_from_env, infer
+    from mindbloom.lut import load_from_env
+
+    if not load_artifacts():
+        build_all()
+        load_from_env()
+    configure_from_env()
+    configure_caches()
+    # Compiles each controller's engine before the first request needs it
+    for name in CONTROLLER_NAMES:
+        infer(name, [[0.5] * len(CONTROLLER_INPUTS[name])])
+
+
+def _warm_up_child(started):
+    warm_up_worker()
+    started.put(os.getpid())
+
+
+class ScoringPool:
+    def __init__(self, kind='thread', workers=None, max_queue=None, timeout=30.0):
+        if kind not in EXECUTOR_KINDS:
+            raise ValueError(f"Unknown executor '{kind}'. Expected one of {EXECUTOR_KINDS}.")
+        self.kind = kind
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max_queue or self.workers * 4
+        self.timeout = timeout
+        self.pending = 0
+        self._lock = threading.Lock()
+        self._executor = None
+        self._spawned = []
+        self._started = None
+
+    @classmethod
+    def from_env(cls):
+        workers = os.environ.get(WORKERS_ENV)
+        max_queue = os.environ.get(MAX_QUEUE_ENV)
+        return cls(
+            kind=os.environ.get(EXECUTOR_ENV, 'thread'),
+            workers=int(workers) if workers else None,
+            max_queue=int(max_queue) if max_queue else None,
+            timeout=float(os.environ.get(TIMEOUT_ENV, 30.0)),
+        )
+
+    def start(self):
+        if self.kind == 'thread':
+            self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='mindbloom-scoring')
+        elif self.kind == 'process':
+            context = multiprocessing.get_context()
+            self._started = context.Queue()
+            self._executor = ProcessPoolExecutor(self.workers, mp_context=context, initializer=_warm_up_child,
+                                                 initargs=(self._started,))
+            # Each submit finds no idle child (they are all still warming up) and spawns one
+            self._spawned = [self._executor.submit(os.getpid) for _ in range(self.workers)]
+        return self
+
+    async def wait_ready(self):
+        # Raises if a worker failed to start or warm up (the pool is then broken)
+        ready = 0
+        while self._started is not None and ready < self.workers:
+            try:
+                await asyncio.to_thread(self._started.get, timeout=0.1)
+                ready += 1
+            except queue.Empty:
+                for future in self._spawned:
+                    if future.done() and future.exception() is not None:
+                        raise future.exception()
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _release(self, _future=None):
+        with self._lock:
+            self.pending -= 1
+
+    async def run(self, fn, *args, timeout=None):
+        if self._executor is None:
+            return fn(*args)
+
+        with self._lock:
+            if self.pending >= self.max_queue:
+                raise QueueFullError(f"Scoring queue is full ({self.max_queue} jobs in flight).")
+            self.pending += 1
+        try:
+            # Stage timings from the worker come back with the result
+            future = self._executor.submit(metrics.collected, fn, *args, submitted=time.perf_counter())
+        except BaseException:
+            self._release()
+            raise
+        # The slot is freed when the job really finishes, even if the caller timed out
+        future.add_done_callback(self._release)
+        result, observations = await asyncio.wait_for(asyncio.wrap_future(future), timeout or self.timeout)
+        metrics.record(observations)
+        return result
@@ -0,0 +1,13 @@
+-- Scored sessions written by mindbloom.persistence (MINDBLOOM_PERSIST=supabase).
+-- Columns match make_record(); scores are null where no rule fired, and features
+-- holds the controller inputs behind the scores.
+create table if not exists public.emotion_scores (
+    id bigint generated always as identity primary key,
+    created_at timestamptz not null default now(),
+    focus_score double precision,
+    motor_engagement_score double precision,
+    emotion_stability_score double precision,
+    features jsonb not null default '{}'::jsonb
+);
+
+create index if not exists emotion_scores_created_at_idx on public.emotion_scores (created_at);
@@ -0,0 +1,81 @@
+import json
+import os
+import numpy as np
+import pytest
+from mindbloom import artifacts, engine, lut
+from mindbloom.artifacts import MANIFEST, _publish, build_artifacts, load_artifacts
+from mindbloom.controllers import CONTROLLER_NAMES
+
+
+@pytest.fixture(autouse=True)
+def isolated_engine(monkeypatch):
+    # Artifacts replace the compiled controllers of the whole process; restore them after
+    for name in ('_arrays', '_compiled', '_modes'):
+        monkeypatch.setattr(engine, name, dict(getattr(engine, name)))
+    monkeypatch.setattr(lut, '_tables', {})
+
+
+def _inputs(name, rows=200):
+    compiled = engine.get_compiled(name)
+    rng = np.random.default_rng(0)
+    return np.column_stack([rng.uniform(u[0], u[-1], rows) for u in compiled.universes])
+
+
+def test_built_artifacts_are_memory_mapped_and_score_alike(tmp_path):
+    expected = {name: engine.infer(name, _inputs(name)) for name in CONTROLLER_NAMES}
+    directory = tmp_path / 'artifacts'
+    manifest = build_artifacts(str(directory))
+    assert sorted(manifest['controllers']) == sorted(CONTROLLER_NAMES)
+    assert not any('.tmp-' in path for path in os.listdir(tmp_path))
+
+    assert sorted(load_artifacts(str(directory))) == sorted(CONTROLLER_NAMES)
+    for name in CONTROLLER_NAMES:
+        compiled = engine.get_compiled(name)
+        assert all(isinstance(array, np.memmap) for array in compiled.arrays().values())
+        np.testing.assert_array_equal(engine.infer(name, _inputs(name)), expected[name])
+
+
+def test_artifacts_from_other_sources_are_refused(tmp_path, monkeypatch):
+    directory = str(tmp_path / 'artifacts')
+    build_artifacts(directory)
+    # The engine compiles the arrays, so it is part of the source
+    assert 'engine' in artifacts.SOURCE_MODULES
+    monkeypatch.setattr(artifacts, 'source_hash', lambda: 'edited')
+    with pytest.raises(ValueError, match='rebuild'):
+        load_artifacts(directory)
+    assert not engine._arrays
+
+
+def _directory(path, content):
+    os.makedirs(path)
+    with open(os.path.join(path, MANIFEST), 'w') as f:
+        json.dump(content, f)
+
+
+def _content(path):
+    with open(os.path.join(path, MANIFEST)) as f:
+        return json.load(f)
+
+
+def test_publish_replaces_the_directory_atomically(tmp_path):
+    directory, temporary = str(tmp_path / 'artifacts'), str(tmp_path / 'artifacts.tmp-1')
+    _directory(directory, 'old')
+    mapped = np.lib.format.open_memmap(os.path.join(directory, 'array.npy'), mode='w+', shape=(3,))
+    mapped[:] = 1.0
+    _directory(temporary, 'new')
+
+    _publish(temporary, directory, replace=True)
+    assert _content(directory) == 'new'
+    assert os.listdir(tmp_path) == ['artifacts']
+    # Readers of the old files keep them
+    np.testing.assert_array_equal(mapped, 1.0)
+
+
+def test_publish_keeps_the_first_directory_without_replace(tmp_path):
+    directory, temporary = str(tmp_path / 'artifacts'), str(tmp_path / 'artifacts.tmp-1')
+    _directory(directory, 'first')
+    _directory(temporary, 'second')
+
+    _publish(temporary, directory, replace=False)
+    assert _content(directory) == 'first'
+    assert os.listdir(tmp_path) == ['artifacts']
@@ -0,0 +1,86 @@
+import io
+import json
+import os
+import numpy as np
+import pytest
+from mindbloom import backfill
+from mindbloom.backfill import SCORE_COLUMNS, run_backfill, write_archive
+from mindbloom.context import score_session
+from mindbloom.engine import ENGINES_ENV
+from synthetic import synthetic_session
+
+SESSIONS = 7
+CHUNK_SIZE = 3
+
+
+@pytest.fixture
+def archive(tmp_path, monkeypatch):
+    monkeypatch.delenv(ENGINES_ENV, raising=False)
+    sessions = [synthetic_session(10 + i, 20 + 5 * i, seed=i) for i in range(SESSIONS)]
+    write_archive(str(tmp_path / 'archive'), sessions)
+    return str(tmp_path / 'archive'), sessions
+
+
+def _backfill(input_dir, output, **kwargs):
+    return run_backfill(input_dir, str(output), workers=0, chunk_size=CHUNK_SIZE, log=io.StringIO(), **kwargs)
+
+
+def test_sessions_are_scored_in_chunks(archive, tmp_path):
+    input_dir, sessions = archive
+    report = _backfill(input_dir, tmp_path / 'out')
+    assert (report['sessions'], report['scored'], report['resumed_chunks'], report['errors']) == (7, 7, 0, 0)
+
+    # One checkpoint per chunk, merged in session order
+    parts = sorted(os.listdir(tmp_path / 'out' / 'parts'))
+    assert parts == ['part-000000.npz', 'part-000001.npz', 'part-000002.npz']
+    with np.load(tmp_path / 'out' / 'parts' / parts[-1]) as part:
+        assert list(part['session']) == ['6']
+    with np.load(report['output']) as scores:
+        assert list(scores['session']) == [str(i) for i in range(SESSIONS)]
+        for i, session in enumerate(sessions):
+            expected = score_session(*session)
+            np.testing.assert_allclose([scores[column][i] for column in SCORE_COLUMNS],
+                                       [expected[column] for column in SCORE_COLUMNS])
+
+
+def test_interrupted_backfill_resumes_from_its_checkpoints(archive, tmp_path, monkeypatch):
+    input_dir, _ = archive
+    expected = _backfill(input_dir, tmp_path / 'fresh')
+    score_chunk = backfill.score_chunk
+    scored = []
+
+    def interrupted(directory, start, stop, max_samples=None):
+        if start == 2 * CHUNK_SIZE:
+            raise KeyboardInterrupt
+        scored.append(start)
+        return score_chunk(directory, start, stop, max_samples)
+
+    monkeypatch.setattr(backfill, 'score_chunk', interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        _backfill(input_dir, tmp_path / 'out')
+    assert not os.path.exists(tmp_path / 'out' / 'scores.npz')
+
+    monkeypatch.setattr(backfill, 'score_chunk', score_chunk)
+    report = _backfill(input_dir, tmp_path / 'out')
+    assert scored == [0, CHUNK_SIZE]
+    assert (report['scored'], report['resumed_chunks']) == (1, 2)
+    with np.load(report['output']) as scores, np.load(expected['output']) as fresh:
+        for column in ('session', *SCORE_COLUMNS):
+            np.testing.assert_array_equal(scores[column], fresh[column])
+
+
+def test_resume_with_different_settings_is_refused(archive, tmp_path, monkeypatch):
+    input_dir, _ = archive
+    output = tmp_path / 'out'
+    _backfill(input_dir, output)
+    with open(output / 'manifest.json') as f:
+        assert json.load(f)['engines'] is None
+
+    # Keeps the --engine setting from leaking out of the test
+    monkeypatch.setenv(ENGINES_ENV, '')
+    with pytest.raises(SystemExit, match='--restart'):
+        _backfill(input_dir, output, engine='analytic')
+    monkeypatch.setenv(ENGINES_ENV, '')
+    with pytest.raises(SystemExit):
+        _backfill(input_dir, output, max_samples=8)
+    assert _backfill(input_dir, output)['resumed_chunks'] == 3
@@ -0,0 +1,84 @@
+import asyncio
+import numpy as np
+from mindbloom import context
+from mindbloom.batching import RequestBatcher
+from mindbloom.context import score_session, score_sessions
+from synthetic import synthetic_session
+
+
+class RecordingPool:
+    # Runs jobs inline, like a ScoringPool that was never started, and keeps the batch sizes
+    def __init__(self):
+        self.batches = []
+
+    async def run(self, fn, sessions, *args, timeout=None):
+        self.batches.append(len(sessions))
+        return fn(sessions, *args)
+
+
+def _sessions(count):
+    return [synthetic_session(20, 40, seed=i) for i in range(count)]
+
+
+async def _submit_all(batcher, sessions):
+    return await asyncio.gather(*(batcher.submit(session) for session in sessions), return_exceptions=True)
+
+
+def test_concurrent_requests_are_coalesced_within_the_window():
+    pool = RecordingPool()
+    batcher = RequestBatcher(pool, window_ms=50, max_batch=32)
+    sessions = _sessions(3)
+    results = asyncio.run(_submit_all(batcher, sessions))
+    assert pool.batches == [3]
+    assert results == [score_session(*session) for session in sessions]
+    assert batcher.stats()['max_wait_ms'] >= 40
+
+
+def test_batches_never_exceed_max_batch():
+    pool = RecordingPool()
+    batcher = RequestBatcher(pool, window_ms=20, max_batch=2)
+    asyncio.run(_submit_all(batcher, _sessions(5)))
+    assert pool.batches == [2, 2, 1]
+    assert batcher.stats()['max_batch_size'] == 2
+
+
+def test_a_failing_session_only_fails_its_own_request():
+    emotion, speed, ranges, symmetry = synthetic_session(20, 40)
+    sessions = _sessions(2) + [(emotion[:1], speed, ranges, symmetry)]
+    results = asyncio.run(_submit_all(RequestBatcher(RecordingPool(), window_ms=20), sessions))
+    assert results[:2] == [score_session(*session) for session in sessions[:2]]
+    assert isinstance(results[2], ValueError) and 'two emotion frames' in str(results[2])
+
+
+def test_invalid_sessions_do_not_break_up_the_batch(monkeypatch):
+    calls = []
+    infer = context.infer
+
+    def counted(name, X):
+        calls.append(name)
+        return infer(name, X)
+
+    monkeypatch.setattr(context, 'infer', counted)
+    emotion, speed, ranges, symmetry = synthetic_session(20, 40)
+    sessions = _sessions(3) + [(emotion, speed[:0], ranges[:0], symmetry[:0]), (emotion[:1], speed, ranges, symmetry)]
+    results = score_sessions(sessions)
+    # One inference per controller for the three valid sessions, none rescored alone
+    assert sorted(calls) == ['focus', 'motor_engagement', 'pause_frequency', 'reaction_time', 'stability']
+    for result, session in zip(results[:3], sessions):
+        np.testing.assert_equal(result, score_session(*session))
+    assert all(isinstance(result, Exception) for result in results[3:])
+
+
+def test_pool_failures_reach_every_request_of_the_batch():
+    class BrokenPool:
+        async def run(self, fn, *args, timeout=None):
+            raise RuntimeError('pool is down')
+
+    results = asyncio.run(_submit_all(RequestBatcher(BrokenPool(), window_ms=20), _sessions(2)))
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_scores_are_plain_floats():
+    sessions = _sessions(2)
+    for scores in [score_session(*sessions[0]), *score_sessions(sessions)]:
+        assert all(type(value) is float for value in scores.values())
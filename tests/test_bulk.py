@@ -0,0 +1,81 @@
+import asyncio
+import json
+import math
+import pytest
+from fastapi.testclient import TestClient
+from mindbloom.bulk import BULK_CHUNK_ENV, iter_ndjson
+from mindbloom.context import score_session
+from mindbloom.main import app
+from synthetic import synthetic_session
+
+SESSIONS = 10
+
+
+def _body(seed, frames=20):
+    emotion, speed, ranges, symmetry = synthetic_session(frames, 40, seed=seed)
+    return {'emotion': emotion, 'speed': speed, 'ranges': ranges, 'symmetry': symmetry}
+
+
+def _expected(body):
+    scores = score_session(body['emotion'], body['speed'], body['ranges'], body['symmetry'])
+    return {key: value if math.isfinite(value) else None for key, value in scores.items()}
+
+
+def _lines(response):
+    assert response.status_code == 200
+    assert response.headers['content-type'] == 'application/x-ndjson'
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    # Small chunks so every batch spans several of them
+    monkeypatch.setenv(BULK_CHUNK_ENV, '3')
+    with TestClient(app) as client:
+        yield client
+
+
+def test_json_array_results_come_back_in_input_order(client):
+    bodies = [_body(seed) for seed in range(SESSIONS)]
+    lines = _lines(client.post('/emotion_state/batch', json=bodies))
+    assert [line.pop('index') for line in lines] == list(range(SESSIONS))
+    assert lines == [_expected(body) for body in bodies]
+
+
+def test_invalid_sessions_get_an_error_line(client):
+    bodies = [_body(0), {'emotion': 'not frames'}, _body(1, frames=1), _body(2)]
+    lines = _lines(client.post('/emotion_state/batch', json=bodies))
+    assert [line['index'] for line in lines] == [0, 1, 2, 3]
+    assert lines[1]['error'].startswith('Invalid session')
+    assert 'two emotion frames' in lines[2]['error']
+    assert {key: value for key, value in lines[3].items() if key != 'index'} == _expected(bodies[3])
+    assert 'error' not in lines[0] and 'error' not in lines[3]
+
+
+def test_ndjson_lines_split_across_stream_chunks(client):
+    bodies = [_body(seed) for seed in range(SESSIONS)]
+    data = ''.join(json.dumps(body) + '\n' for body in bodies).encode()
+
+    def pieces(size=1000):
+        # Request body chunks that cut through lines
+        for start in range(0, len(data), size):
+            yield data[start:start + size]
+
+    response = client.post('/emotion_state/batch', content=pieces(), headers={'Content-Type': 'application/x-ndjson'})
+    lines = _lines(response)
+    assert [line.pop('index') for line in lines] == list(range(SESSIONS))
+    assert lines == [_expected(body) for body in bodies]
+
+
+def test_ndjson_reader_joins_split_lines():
+    async def stream():
+        for piece in (b'{"emotion": [[0, 0, 0, 0, 0, 0, 1], [0, 0, 0, 0, 0, 1, 0]], "spe', b'ed": [1],',
+                      b' "ranges": [1], "symmetry": [1]}\n\n', b'{"emotion": []}'):
+            yield piece
+
+    async def read():
+        return [session async for session in iter_ndjson(stream())]
+
+    first, second = asyncio.run(read())
+    assert first == ([[0, 0, 0, 0, 0, 0, 1], [0, 0, 0, 0, 0, 1, 0]], [1], [1], [1])
+    assert isinstance(second, ValueError)
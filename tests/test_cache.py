@@ -0,0 +1,87 @@
+import multiprocessing
+import numpy as np
+import pytest
+from mindbloom import cache
+from mindbloom.cache import ResultCache, SharedStore
+
+
+class Compute:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, X):
+        self.calls.append(np.array(X))
+        return np.asarray(X).sum(axis=1)
+
+
+def test_inputs_are_quantized_before_inference():
+    compute = Compute()
+    results = ResultCache('focus', precision=2).infer([[0.123, 0.5], [0.1249, 0.5]], compute)
+    # Both rows round to the same key and the controller sees the rounded row
+    np.testing.assert_allclose(compute.calls[0], [[0.12, 0.5], [0.12, 0.5]])
+    np.testing.assert_allclose(results, [0.62, 0.62])
+
+
+def test_least_recently_used_entries_are_evicted():
+    compute = Compute()
+    results = ResultCache('focus', max_size=2)
+    results.infer([[1.0], [2.0]], compute)
+    results.infer([[1.0]], compute)  # 1.0 is now the most recently used
+    results.infer([[3.0]], compute)
+    assert len(results) == 2
+    results.infer([[1.0], [3.0]], compute)
+    assert len(compute.calls) == 2
+    results.infer([[2.0]], compute)
+    np.testing.assert_allclose(compute.calls[-1], [[2.0]])
+
+
+def test_entries_expire_after_their_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, 'time', lambda: now[0])
+    compute = Compute()
+    results = ResultCache('focus', ttl=10)
+    results.infer([[1.0]], compute)
+    now[0] += 9
+    results.infer([[1.0]], compute)
+    assert len(compute.calls) == 1
+    now[0] += 2
+    results.infer([[1.0]], compute)
+    assert len(compute.calls) == 2
+
+
+def test_rows_with_non_finite_inputs_are_not_cached():
+    compute = Compute()
+    results = ResultCache('focus')
+    X = [[np.nan, 0.5], [0.2, 0.5]]
+    results.infer(X, compute)
+    # The whole call goes to the controller unchanged, and nothing is stored
+    np.testing.assert_array_equal(compute.calls[0], np.array(X))
+    assert len(results) == 0
+
+
+def _fill_shared(path, rows):
+    ResultCache('focus', shared=SharedStore(path)).infer(rows, lambda X: np.asarray(X).sum(axis=1))
+
+
+def test_shared_store_serves_results_computed_in_another_process(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    rows = [[0.1, 0.2], [0.3, 0.4]]
+    child = multiprocessing.get_context().Process(target=_fill_shared, args=(path, rows))
+    child.start()
+    child.join(30)
+    assert child.exitcode == 0
+
+    compute = Compute()
+    results = ResultCache('focus', shared=SharedStore(path)).infer(rows, compute)
+    assert not compute.calls
+    np.testing.assert_allclose(results, [0.3, 0.7])
+
+
+def test_shared_store_skips_expired_rows(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, 'time', lambda: now[0])
+    store = SharedStore(str(tmp_path / 'cache.db'))
+    store.put_many('focus', [('1', 0.5)], ttl=10)
+    assert store.get_many('focus', ['1']) == {'1': 0.5}
+    now[0] += 11
+    assert store.get_many('focus', ['1']) == {}
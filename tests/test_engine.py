@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+from mindbloom import engine
+from mindbloom.controllers import CONTROLLER_INPUTS, CONTROLLER_NAMES
+
+
+def _inputs(name, rows, seed=0):
+    return np.random.default_rng(seed).random((rows, len(CONTROLLER_INPUTS[name])))
+
+
+@pytest.mark.parametrize('name', CONTROLLER_NAMES)
+def test_vector_engine_matches_skfuzzy(name):
+    X = _inputs(name, 500)
+    vector = engine.infer_vector(name, X)
+    reference, strongest = engine.skfuzzy_reference(name, X)
+    assert np.array_equal(reference, engine.infer_skfuzzy(name, X), equal_nan=True)
+    assert (np.isnan(vector) == (np.isnan(reference) | (strongest < engine.ACTIVATION_EPSILON))).all()
+    assert engine.max_abs_error(name, X) <= engine.TOLERANCE
+
+
+def test_round_off_activations_count_as_no_rule_fired():
+    X = _inputs('focus', 5000)
+    strongest = engine.get_compiled('focus').activations(X).max(axis=1)
+    faint = X[(strongest > 0) & (strongest < engine.ACTIVATION_EPSILON)]
+    assert len(faint)
+    # skfuzzy agrees these rows barely fire, but still returns a centroid for them
+    assert (engine.skfuzzy_reference('focus', faint)[1] < engine.ACTIVATION_EPSILON).all()
+    assert np.isnan(engine.infer_vector('focus', faint)).all()
+    assert np.isnan(engine.infer_analytic('focus', faint)).all()
+
+
+@pytest.mark.parametrize('name', CONTROLLER_NAMES)
+def test_analytic_centroid_is_exact(name):
+    controller = engine.get_compiled(name, analytic=True)
+    cuts = controller.activations(_inputs(name, 200))
+    # Reference centroid of the clipped triangles on a fine grid
+    x = np.linspace(*controller.bounds, 20001)
+    a, b, c = controller.output_triangles.T
+    y = np.fmin(engine._trimf(x[None, :, None], (a, b, c)), cuts[:, None, :]).max(axis=2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        reference = np.trapezoid(y * x, x, axis=1) / np.trapezoid(y, x, axis=1)
+    result = controller.defuzzify(cuts)
+    assert (np.isnan(result) == np.isnan(reference)).all()
+    assert np.nanmax(np.abs(result - reference)) < 1e-6
+
+
+@pytest.mark.parametrize('name', CONTROLLER_NAMES)
+def test_analytic_engine_stays_close_to_vector(name):
+    report = engine.compare_engines(name, samples=2000)
+    assert report['analytic']['mean_abs_diff'] < 1e-3
+    assert report['analytic']['p99_abs_diff'] < 0.01
+    assert report['analytic']['max_abs_diff'] < 0.2
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+from mindbloom.features import MICRO_THRESHOLD, extract_features
+
+
+def _loop_features(emotion_series):
+    # The per-frame loops extract_features replaced (process_emotion_series, get_input_focus)
+    emotions = np.array(emotion_series)
+    dominant_indices = np.argmax(emotions, axis=1)
+    volatility = np.std(dominant_indices) / 6
+    expression_change_count = np.sum(dominant_indices[:-1] != dominant_indices[1:]) / (len(dominant_indices) - 1)
+    micro_count = 0
+    for i in range(1, len(emotions)):
+        diffs = emotions[i] - emotions[i - 1]
+        for j in range(7):
+            if j != np.argmax(emotions[i]) and diffs[j] > MICRO_THRESHOLD:
+                micro_count += 1
+    microexpression_count = micro_count / ((len(emotions) - 1) * 6)
+
+    num_frames = len(emotion_series)
+    dominant = [np.argmax(frame) for frame in emotion_series]
+    consistency = sum(dominant[i] == dominant[i + 1] for i in range(num_frames - 1)) / (num_frames - 1)
+    input_focus = 0.5 * consistency + 0.5 * np.mean([max(frame) for frame in emotion_series])
+    return volatility, microexpression_count, expression_change_count, input_focus
+
+
+def _sessions(count, frames, seed=0):
+    rng = np.random.default_rng(seed)
+    # Spiky confidences so micro-expressions and dominant changes both occur
+    return rng.random((count, frames, 7)) ** 3
+
+
+@pytest.mark.parametrize('frames', [2, 3, 50, 601])
+def test_features_match_the_frame_loops(frames):
+    for emotions in _sessions(5, frames):
+        features = extract_features(emotions)
+        expected = _loop_features(emotions.tolist())
+        actual = (features.volatility, features.microexpression_count, features.expression_change_count,
+                  features.input_focus)
+        assert actual == pytest.approx(expected, abs=1e-12)
+
+
+def test_batch_matches_single_sessions():
+    sessions = _sessions(4, 120, seed=1)
+    batch = extract_features(sessions)
+    for i, emotions in enumerate(sessions):
+        single = extract_features(emotions)
+        for name in batch._fields:
+            assert getattr(batch, name)[i] == pytest.approx(getattr(single, name), abs=1e-12)
+
+
+def test_rejects_too_few_frames_and_wrong_width():
+    with pytest.raises(ValueError):
+        extract_features([[0.1] * 7])
+    with pytest.raises(ValueError):
+        extract_features([[0.1] * 6] * 3)
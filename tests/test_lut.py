@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+from mindbloom.controllers import CONTROLLER_NAMES
+from mindbloom.lut import LookupTable, build_table, error_report
+
+
+def test_nan_corner_only_affects_its_own_weight():
+    values = np.arange(27, dtype=float).reshape(3, 3, 3)
+    values[0, 0, 0] = np.nan
+    table = LookupTable('stability', np.linspace(0, 1, 3), values)
+    # Inside the cell next to the gap: the finite corners are rescaled
+    result = table([[0.25, 0.25, 0.25]])
+    assert np.isfinite(result).all()
+    corners = values[:2, :2, :2].ravel()
+    assert result[0] == pytest.approx(np.nanmean(corners))
+    # Cells away from the gap are plain multilinear interpolation
+    assert table([[0.75, 0.75, 0.75]])[0] == pytest.approx(np.mean(values[1:, 1:, 1:]))
+
+
+def test_cell_without_finite_corners_is_nan():
+    table = LookupTable('stability', np.linspace(0, 1, 2), np.full((2, 2, 2), np.nan))
+    assert np.isnan(table([[0.5, 0.5, 0.5]])).all()
+
+
+@pytest.mark.parametrize('name', CONTROLLER_NAMES)
+def test_tables_have_no_nan_where_the_engine_has_a_value(name):
+    report = error_report(build_table(name, grid_size=11), samples=5000)
+    assert report['nan_mismatches'] == 0
@@ -0,0 +1,103 @@
+import re
+import pytest
+from fastapi.testclient import TestClient
+from mindbloom.main import app
+from mindbloom.metrics import Registry, render_batching
+from synthetic import synthetic_session
+
+SAMPLE = re.compile(r'^([a-z_]+)(?:\{((?:[a-z_]+="[^"]*",?)*)\})? (\S+)$')
+
+
+def _samples(text):
+    # (name, {label: value}, value) for every sample line; fails on anything malformed
+    samples = []
+    for line in text.splitlines():
+        if line.startswith('#'):
+            assert re.match(r'^# (HELP [a-z_]+ .+|TYPE [a-z_]+ (histogram|counter|summary|gauge))$', line), line
+            continue
+        match = SAMPLE.match(line)
+        assert match, line
+        name, labels, value = match.groups()
+        samples.append((name, dict(re.findall(r'([a-z_]+)="([^"]*)"', labels or '')), float(value)))
+    return samples
+
+
+def _body():
+    emotion, speed, ranges, symmetry = synthetic_session(30, 50)
+    return {'emotion': emotion, 'speed': speed, 'ranges': ranges, 'symmetry': symmetry}
+
+
+def test_histograms_render_cumulative_buckets_with_inf():
+    registry = Registry()
+    for value in (0.5, 1.0, 3.0, 100.0):
+        registry.observe('mindbloom_input_size', ('frames',), value)
+    lines = registry.render().splitlines()
+    buckets = [line for line in lines if line.startswith('mindbloom_input_size_bucket')]
+    # Bounds are inclusive: 1.0 falls in le="1"
+    assert buckets[:3] == ['mindbloom_input_size_bucket{kind="frames",le="1"} 2',
+                           'mindbloom_input_size_bucket{kind="frames",le="10"} 3',
+                           'mindbloom_input_size_bucket{kind="frames",le="30"} 3']
+    assert buckets[-1] == 'mindbloom_input_size_bucket{kind="frames",le="+Inf"} 4'
+    assert 'mindbloom_input_size_sum{kind="frames"} 104.5' in lines
+    assert 'mindbloom_input_size_count{kind="frames"} 4' in lines
+    assert lines[:2] == ['# HELP mindbloom_stage_seconds Time spent per pipeline stage.',
+                         '# TYPE mindbloom_stage_seconds histogram']
+
+
+def test_counters_render_every_label():
+    registry = Registry()
+    registry.count('mindbloom_requests_total', ('/emotion_state', 'POST', '200'), 2)
+    assert 'mindbloom_requests_total{endpoint="/emotion_state",method="POST",status="200"} 2' in registry.render()
+
+
+def test_batching_histogram_ends_with_inf():
+    stats = {'batch_size_histogram': {1: 2, 2: 1, 4: 1}, 'batches': 4, 'sessions': 9, 'mean_wait_ms': 2.0,
+             'max_wait_ms': 5.0}
+    samples = _samples(render_batching(stats))
+    buckets = [(labels['le'], value) for name, labels, value in samples if name == 'mindbloom_batch_size_bucket']
+    assert buckets == [('1', 2), ('2', 3), ('+Inf', 4)]
+    assert ('mindbloom_batch_wait_seconds_sum', {}, 0.018) in samples
+
+
+def test_metrics_endpoint_serves_valid_exposition():
+    with TestClient(app) as client:
+        assert client.post('/emotion_state', json=_body()).status_code == 200
+        response = client.get('/metrics')
+    assert response.headers['content-type'].startswith('text/plain; version=0.0.4')
+    samples = _samples(response.text)
+
+    buckets = {}
+    for name, labels, value in samples:
+        if name.endswith('_bucket'):
+            key = (name[:-len('_bucket')], tuple(sorted((k, v) for k, v in labels.items() if k != 'le')))
+            buckets.setdefault(key, []).append((labels['le'], value))
+    counts = {(name[:-len('_count')], tuple(sorted(labels.items()))): value
+              for name, labels, value in samples if name.endswith('_count')}
+    for key, series in buckets.items():
+        values = [value for _, value in series]
+        assert values == sorted(values), key
+        assert series[-1][0] == '+Inf' and series[-1][1] == counts[key]
+
+    request = ('mindbloom_request_seconds', (('endpoint', '/emotion_state'), ('method', 'POST')))
+    assert counts[request] >= 1
+    assert ('mindbloom_stage_seconds', (('stage', 'infer.focus'),)) in counts
+    assert any(name == 'mindbloom_requests_total' and labels == {'endpoint': '/emotion_state', 'method': 'POST',
+                                                                 'status': '200'} for name, labels, _ in samples)
+
+
+@pytest.mark.parametrize('header, breakdown', [('1', True), ('0', False), (None, False)])
+def test_server_timing_breaks_down_the_request(header, breakdown):
+    headers = {'X-Mindbloom-Timing': header} if header else {}
+    with TestClient(app) as client:
+        response = client.post('/emotion_state', json=_body(), headers=headers)
+    assert response.status_code == 200
+    if not breakdown:
+        assert 'server-timing' not in response.headers
+        return
+    entries = [entry.split(';dur=') for entry in response.headers['server-timing'].split(', ')]
+    stages = {stage: float(duration) for stage, duration in entries}
+    # Stages measured in the scoring worker come back with the result
+    assert {'parse', 'queue', 'infer.focus', 'infer.reaction_time', 'features'} <= set(stages)
+    assert entries[-1][0] == 'total'
+    assert all(duration >= 0 for duration in stages.values())
+    assert stages['total'] >= max(duration for stage, duration in stages.items() if stage != 'total') * 0.99
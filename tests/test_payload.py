@@ -0,0 +1,85 @@
+import io
+import json
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from pydantic import ValidationError
+from mindbloom.context import score_session
+from mindbloom.main import app
+from mindbloom.payload import (
+    BINARY_TYPE, FLOAT, HEADER, NPZ_TYPE, InvalidInput, decode_session, encode_session, iter_binary_sessions,
+    parse_session,
+)
+from synthetic import synthetic_session
+
+
+def _as_float32(session):
+    emotion, *motion = session
+    return (np.asarray(emotion, dtype=FLOAT), *(np.asarray(column, dtype=FLOAT) for column in motion))
+
+
+def test_binary_round_trip_is_exact_in_float32():
+    session = synthetic_session(50, 80)
+    decoded = parse_session(BINARY_TYPE, encode_session(*session))
+    for expected, actual in zip(_as_float32(session), decoded):
+        assert actual.dtype == FLOAT
+        assert np.array_equal(actual, expected)
+
+
+def test_json_npz_and_binary_score_alike():
+    emotion, speed, ranges, symmetry = synthetic_session(120, 300)
+    # Values that are exact in float32, so every format carries the same numbers
+    emotion, speed, ranges, symmetry = (column.astype(float).tolist() for column in
+                                        _as_float32((emotion, speed, ranges, symmetry)))
+    body = json.dumps({'emotion': emotion, 'speed': speed, 'ranges': ranges, 'symmetry': symmetry})
+    archive = io.BytesIO()
+    np.savez(archive, emotion=emotion, speed=speed, ranges=ranges, symmetry=symmetry)
+
+    expected = score_session(emotion, speed, ranges, symmetry)
+    for content_type, payload in [('application/json', body.encode()), (NPZ_TYPE, archive.getvalue()),
+                                  (BINARY_TYPE, encode_session(emotion, speed, ranges, symmetry))]:
+        np.testing.assert_equal(score_session(*parse_session(content_type, payload)), expected)
+
+
+def test_concatenated_sessions_decode_in_order():
+    sessions = [synthetic_session(10 + i, 5 + i, seed=i) for i in range(3)]
+    decoded = list(iter_binary_sessions(b''.join(encode_session(*session) for session in sessions)))
+    assert [len(emotion) for emotion, *_ in decoded] == [10, 11, 12]
+
+
+def test_malformed_bodies_are_rejected():
+    body = encode_session(*synthetic_session(10, 5))
+    with pytest.raises(ValueError):
+        decode_session(body[:HEADER.size - 1])
+    with pytest.raises(ValueError):
+        decode_session(body[:-1])
+    with pytest.raises(ValueError):
+        parse_session(BINARY_TYPE, body + b'\0')
+    with pytest.raises(ValueError):
+        parse_session(BINARY_TYPE, b'XXXX' + body[4:])
+    with pytest.raises(ValueError):
+        parse_session(NPZ_TYPE, b'not an archive')
+    with pytest.raises(ValidationError):
+        parse_session('application/json', b'{"emotion": []}')
+
+
+@pytest.mark.parametrize('change, message', [
+    (lambda s: {**s, 'emotion': s['emotion'][:1]}, 'At least two emotion frames are needed, got 1.'),
+    (lambda s: {**s, 'emotion': [frame[:6] for frame in s['emotion']]}, 'Every emotion frame must hold 7 confidences.'),
+    (lambda s: {**s, 'speed': [], 'ranges': [], 'symmetry': []}, 'At least one motion sample is needed.'),
+    (lambda s: {**s, 'ranges': s['ranges'][:-1]}, 'speed, ranges and symmetry must have the same length, got (5, 4, 5).'),
+])
+@pytest.mark.parametrize('endpoint', ['/emotion_state', '/emotion_state/windows?window=2&step=1'])
+def test_invalid_sessions_get_a_clear_400(change, message, endpoint):
+    emotion, speed, ranges, symmetry = (np.asarray(column).tolist() for column in synthetic_session(10, 5))
+    body = change({'emotion': emotion, 'speed': speed, 'ranges': ranges, 'symmetry': symmetry})
+    with TestClient(app) as client:
+        response = client.post(endpoint, json=body)
+    assert response.status_code == 400
+    assert response.json() == {'detail': message}
+
+
+def test_binary_sessions_are_validated_too():
+    emotion, speed, ranges, symmetry = synthetic_session(10, 5)
+    with pytest.raises(InvalidInput, match='one motion sample'):
+        parse_session(BINARY_TYPE, encode_session(emotion, speed[:0], ranges[:0], symmetry[:0]))
@@ -0,0 +1,118 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from fastapi.testclient import TestClient
+from mindbloom.main import app
+from mindbloom.metrics import registry
+from mindbloom.persistence import PERSIST_ENV, PERSIST_EVENTS, SQLiteBackend, WriteBehindQueue, make_record
+from synthetic import synthetic_session
+
+
+def _events(event):
+    return registry.counters[PERSIST_EVENTS].get((event,), 0)
+
+
+def _record(i):
+    return make_record({'focus_score': i / 10, 'motor_engagement_score': 0.5, 'emotion_stability_score': float('nan')},
+                       {'frames': i})
+
+
+class FlakyBackend:
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = []
+        self.written = []
+
+    def insert_many(self, records):
+        self.calls.append(time.monotonic())
+        if len(self.calls) <= self.failures:
+            raise ConnectionError('database unavailable')
+        self.written += records
+
+    def close(self):
+        pass
+
+
+def test_records_are_flushed_to_sqlite_in_batches(tmp_path):
+    path = str(tmp_path / 'scores.db')
+
+    async def run():
+        queue = WriteBehindQueue(SQLiteBackend(path), batch_size=10, flush_interval=0.05).start()
+        for i in range(25):
+            queue.put(_record(i))
+        await queue.close()
+
+    written = _events('written')
+    asyncio.run(run())
+    assert _events('written') - written == 25
+    rows = sqlite3.connect(path).execute(
+        'SELECT focus_score, emotion_stability_score, features FROM emotion_scores ORDER BY id').fetchall()
+    assert [row[0] for row in rows] == [i / 10 for i in range(25)]
+    # NaN (no rule fired) is stored as NULL
+    assert rows[3][1] is None and json.loads(rows[3][2]) == {'frames': 3.0}
+
+
+def test_failed_batches_are_retried_with_backoff():
+    backend = FlakyBackend(failures=2)
+
+    async def run():
+        queue = WriteBehindQueue(backend, flush_interval=0.01, backoff=0.05).start()
+        queue.put(_record(1))
+        await queue.close()
+
+    retried = _events('retried')
+    asyncio.run(run())
+    assert len(backend.written) == 1
+    assert _events('retried') - retried == 2
+    gaps = [b - a for a, b in zip(backend.calls, backend.calls[1:])]
+    assert gaps[0] >= 0.05 and gaps[1] >= 0.1
+
+
+def test_batches_are_dropped_after_max_retries():
+    backend = FlakyBackend(failures=10)
+
+    async def run():
+        queue = WriteBehindQueue(backend, flush_interval=0.01, max_retries=2, backoff=0.01).start()
+        queue.put(_record(1))
+        await queue.close()
+
+    failed = _events('failed')
+    asyncio.run(run())
+    assert len(backend.calls) == 3 and not backend.written
+    assert _events('failed') - failed == 1
+
+
+def test_a_full_queue_drops_new_records():
+    async def run():
+        queue = WriteBehindQueue(FlakyBackend(0), max_size=2)
+        for i in range(5):
+            queue.put(_record(i))
+        return queue._queue.qsize()
+
+    dropped = _events('dropped')
+    assert asyncio.run(run()) == 2
+    assert _events('dropped') - dropped == 3
+
+
+def test_responses_do_not_wait_for_the_database(tmp_path, monkeypatch):
+    release = threading.Event()
+    inserted = []
+
+    def slow_insert(self, records):
+        release.wait(10)
+        inserted.extend(records)
+
+    monkeypatch.setattr(SQLiteBackend, 'insert_many', slow_insert)
+    monkeypatch.setenv(PERSIST_ENV, f'sqlite:{tmp_path / "scores.db"}')
+    emotion, speed, ranges, symmetry = synthetic_session(30, 10)
+    body = {'emotion': emotion, 'speed': speed, 'ranges': ranges, 'symmetry': symmetry}
+    with TestClient(app) as client:
+        start = time.monotonic()
+        for _ in range(3):
+            assert client.post('/emotion_state', json=body).status_code == 200
+        # The inserts are still blocked, the responses are already back
+        assert time.monotonic() - start < 5 and not inserted
+        release.set()
+    assert len(inserted) == 3
@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+from mindbloom.reduction import reduce_motion
+
+
+def _rows(n, seed=0):
+    return np.random.default_rng(seed).random((n, 3))
+
+
+@pytest.mark.parametrize('max_samples', [1, 2, 5, 6, 7, 8, 64, 999])
+def test_reduced_rows_stay_within_the_limit(max_samples):
+    rows = _rows(1000)
+    reduced, weights = reduce_motion(rows, max_samples)
+    assert 1 <= len(reduced) <= max_samples
+    assert len(weights) == len(reduced)
+    # Weighted means are the means over every sample
+    assert np.average(reduced, axis=0, weights=weights) == pytest.approx(rows.mean(axis=0))
+
+
+def test_extremes_are_kept_when_they_fit():
+    rows = _rows(1000)
+    reduced, _ = reduce_motion(rows, 64)
+    assert (reduced.min(axis=0) == rows.min(axis=0)).all()
+    assert (reduced.max(axis=0) == rows.max(axis=0)).all()
+
+
+def test_small_sessions_are_not_reduced():
+    rows = _rows(10)
+    reduced, weights = reduce_motion(rows, 10)
+    assert weights is None and (reduced == rows).all()
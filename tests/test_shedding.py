@@ -0,0 +1,141 @@
+import asyncio
+import threading
+import time
+import pytest
+from fastapi.testclient import TestClient
+from mindbloom import main
+from mindbloom.main import app
+from mindbloom.metrics import registry
+from mindbloom.shedding import DEADLINE_ENV, SHED_EVENTS, LoadShedder, Overloaded
+from mindbloom.workers import WORKERS_ENV
+from synthetic import synthetic_session
+
+
+def _events(mode):
+    return registry.counters[SHED_EVENTS].get((mode,), 0)
+
+
+def _loaded(inflight_rows, row_seconds=1e-3, **kwargs):
+    # A shedder that has learned a cost per row, with requests already in flight
+    shedder = LoadShedder(**kwargs)
+    shedder.row_seconds = row_seconds
+    shedder.inflight = 1
+    shedder.inflight_rows = inflight_rows
+    return shedder
+
+
+def test_deadline_comes_from_the_header_else_the_environment(monkeypatch):
+    monkeypatch.setenv(DEADLINE_ENV, '250')
+    shedder = LoadShedder.from_env()
+    assert shedder.deadline_for(None) == 0.25
+    assert shedder.deadline_for('40') == 0.04
+    assert LoadShedder().deadline_for(None) is None
+    for header in ('soon', '0', '-5'):
+        with pytest.raises(ValueError):
+            shedder.deadline_for(header)
+
+
+def test_admit_chooses_full_degraded_or_rejected():
+    shedder = _loaded(1000, degraded_rows=100)
+    assert shedder.admit(10, 2000) == 'full'
+    assert shedder.admit(10, 2000, deadline=5.0) == 'full'
+    # ~3.1s in full, ~1.2s with the samples reduced to 100 rows
+    assert shedder.admit(10, 2000, deadline=2.0) == 'degraded'
+    with pytest.raises(Overloaded) as error:
+        shedder.admit(10, 2000, deadline=2.0, requested='full')
+    assert error.value.retry_after == 2
+    with pytest.raises(Overloaded):
+        shedder.admit(10, 2000, deadline=0.5)
+    with pytest.raises(ValueError):
+        shedder.admit(10, 2000, requested='fast')
+
+
+def test_nothing_to_reduce_is_scored_in_full():
+    shedder = _loaded(1000, degraded_rows=100)
+    degraded = _events('degraded')
+    assert shedder.admit(10, 100, requested='degraded') == 'full'
+    assert shedder.admit(10, 101, requested='degraded') == 'degraded'
+    assert _events('degraded') == degraded + 1
+    # Degrading cannot bring a short session under its deadline
+    with pytest.raises(Overloaded):
+        shedder.admit(10, 50, deadline=0.5)
+
+
+def test_max_inflight_rejects_before_estimating():
+    shedder = _loaded(0, row_seconds=0.0, max_inflight=1)
+    rejected = _events('rejected')
+    with pytest.raises(Overloaded) as error:
+        shedder.admit(1, 1)
+    assert error.value.retry_after == 1
+    assert _events('rejected') == rejected + 1
+
+
+def test_track_counts_inflight_rows_and_learns_their_cost():
+    shedder = LoadShedder()
+    with shedder.track(68):
+        assert (shedder.inflight, shedder.inflight_rows) == (1, 68)
+        time.sleep(0.01)
+    assert (shedder.inflight, shedder.inflight_rows) == (0, 0)
+    assert shedder.row_seconds >= 0.01 / 100
+
+    learned = shedder.row_seconds
+    with pytest.raises(asyncio.TimeoutError):
+        with shedder.track(68):
+            time.sleep(0.05)
+            raise asyncio.TimeoutError
+    # A timed-out request still counts, as a lower bound
+    assert shedder.row_seconds > learned and shedder.inflight == 0
+
+
+def test_deadlines_under_load(monkeypatch):
+    release = threading.Event()
+    score_session = main.score_session
+
+    def held(emotion, speed, *args):
+        if len(speed) == 1000:
+            release.wait(10)
+        return score_session(emotion, speed, *args)
+
+    monkeypatch.setattr(main, 'score_session', held)
+    monkeypatch.setenv(WORKERS_ENV, '4')
+
+    def body(samples):
+        emotion, speed, ranges, symmetry = synthetic_session(30, samples)
+        return {'emotion': emotion, 'speed': speed, 'ranges': ranges, 'symmetry': symmetry}
+
+    with TestClient(app) as client:
+        shedder = app.state.shedder
+        shedder.row_seconds = 1e-3
+        held_responses = []
+        threads = [threading.Thread(target=lambda: held_responses.append(client.post('/emotion_state', json=body(1000))))
+                   for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        while shedder.inflight < 2:
+            time.sleep(0.01)
+
+        # ~0.5s of work ahead of it on each of the 4 workers: a 100ms deadline is refused
+        response = client.post('/emotion_state', json=body(100), headers={'X-Mindbloom-Deadline-Ms': '100'})
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '1'
+
+        # ~2.6s in full, ~0.85s with the samples reduced: degraded within 2s
+        headers = {'X-Mindbloom-Deadline-Ms': '2000'}
+        response = client.post('/emotion_state', json=body(2000), headers=headers)
+        assert response.status_code == 200
+        assert response.headers['X-Mindbloom-Mode'] == 'degraded'
+        assert response.headers['X-Mindbloom-Max-Samples'] == str(shedder.degraded_rows)
+        shedder.row_seconds = 1e-3
+        response = client.post('/emotion_state', json=body(2000), headers={**headers, 'X-Mindbloom-Mode': 'full'})
+        assert response.status_code == 503
+
+        # No samples to drop: asking for degraded still reports full
+        response = client.post('/emotion_state', json=body(100), headers={'X-Mindbloom-Mode': 'degraded'})
+        assert response.headers['X-Mindbloom-Mode'] == 'full'
+        assert 'X-Mindbloom-Max-Samples' not in response.headers
+
+        release.set()
+        for thread in threads:
+            thread.join()
+    assert [r.status_code for r in held_responses] == [200, 200]
+    assert all(r.headers['X-Mindbloom-Mode'] == 'full' for r in held_responses)
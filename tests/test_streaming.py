@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from mindbloom.context import score_session
+from mindbloom.main import app
+from mindbloom.streaming import SessionState
+
+SCORES = ('focus_score', 'motor_engagement_score', 'emotion_stability_score')
+
+
+def _session(frames=240, samples=500, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.random((frames, 7)) ** 3, rng.random(samples), rng.random(samples), rng.random(samples)
+
+
+def _messages(emotion, speed, ranges, symmetry, chunks):
+    for frames, samples in zip(np.array_split(np.arange(len(emotion)), chunks),
+                               np.array_split(np.arange(len(speed)), chunks)):
+        yield {"emotion": emotion[frames].tolist(), "speed": speed[samples].tolist(),
+               "ranges": ranges[samples].tolist(), "symmetry": symmetry[samples].tolist()}
+
+
+@pytest.mark.parametrize('chunks', [1, 7, 60])
+def test_streamed_scores_match_one_shot_scoring(chunks):
+    session = _session()
+    state = SessionState()
+    for message in _messages(*session, chunks):
+        state.add_message(message)
+    streamed = state.scores()
+    expected = score_session(*session)
+    assert streamed['frames'] == 240 and streamed['samples'] == 500
+    for name in SCORES:
+        assert streamed[name] == pytest.approx(expected[name], abs=1e-9)
+
+
+def test_updates_held_back_by_the_interval_are_sent_when_it_ends():
+    messages = list(_messages(*_session(frames=20, samples=20), 2))
+    with TestClient(app) as client, client.websocket_connect('/emotion_state/stream?interval_ms=300') as websocket:
+        websocket.send_json(messages[0])
+        assert websocket.receive_json()['frames'] == 10
+        # Inside the interval: no reply to this message, but one once the interval ends
+        websocket.send_json(messages[1])
+        assert websocket.receive_json()['frames'] == 20
+
+
+def test_bad_messages_get_an_error_and_keep_the_session():
+    with TestClient(app) as client, client.websocket_connect('/emotion_state/stream') as websocket:
+        websocket.send_json({"emotion": [[0.1] * 6]})
+        assert 'error' in websocket.receive_json()
+        websocket.send_json({"emotion": [[0.1] * 7, [0.2] * 7], "flush": True})
+        assert websocket.receive_json()['frames'] == 2
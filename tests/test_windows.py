@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+from mindbloom.context import score_session
+from mindbloom.windows import score_timeline, window_scores
+from synthetic import synthetic_session
+
+SCORES = ('focus_score', 'motor_engagement_score', 'emotion_stability_score')
+
+
+@pytest.mark.parametrize('window, step, frame_rate, sample_rate', [
+    (30, 5, 1.0, None),
+    (10, 2.5, 4.0, 8.0),
+    (40, 40, 1.0, 2.0),
+])
+def test_windows_match_scoring_each_slice(window, step, frame_rate, sample_rate):
+    emotion, speed, ranges, symmetry = map(np.asarray, synthetic_session(200, 400, seed=3))
+    sample_rate = sample_rate or frame_rate
+    scores = window_scores(emotion, speed, ranges, symmetry, window, step, frame_rate, sample_rate)
+    assert len(scores['start'])
+    for k, start in enumerate(scores['start']):
+        frames = slice(int(round(start * frame_rate)), int(round(start * frame_rate)) + int(round(window * frame_rate)))
+        samples = slice(int(round(start * sample_rate)), int(round(start * sample_rate)) + int(round(window * sample_rate)))
+        expected = score_session(emotion[frames], speed[samples], ranges[samples], symmetry[samples])
+        for name in SCORES:
+            # Both sides round to 3 decimals; round-off may land on either side of a step
+            assert scores[name][k] == pytest.approx(expected[name], abs=1e-3 + 1e-9)
+
+
+def test_windows_need_both_streams():
+    emotion, speed, ranges, symmetry = synthetic_session(100, 20)
+    timeline = score_timeline(emotion, speed, ranges, symmetry, window=10, step=5)
+    assert [entry['start'] for entry in timeline] == [0.0, 5.0, 10.0]
+
+
+def test_invalid_windows_are_rejected():
+    session = synthetic_session(20, 20)
+    with pytest.raises(ValueError):
+        window_scores(*session, window=0, step=1)
+    with pytest.raises(ValueError):
+        window_scores(*session, window=1, step=1)
@@ -0,0 +1,46 @@
+import asyncio
+import time
+from concurrent.futures.process import BrokenProcessPool
+import pytest
+from fastapi.testclient import TestClient
+from mindbloom.main import app
+from mindbloom.workers import EXECUTOR_ENV, WORKERS_ENV, ScoringPool
+
+
+def test_process_workers_start_before_the_first_job():
+    pool = ScoringPool('process', workers=2).start()
+    try:
+        asyncio.run(pool.wait_ready())
+        assert len(pool._executor._processes) == 2
+        # Warm children answer at once; nothing is left to spawn or build
+        start = time.perf_counter()
+        asyncio.run(pool.run(sum, [1, 2]))
+        assert time.perf_counter() - start < 0.5
+    finally:
+        pool.shutdown()
+
+
+def test_ready_waits_for_the_process_workers(monkeypatch):
+    monkeypatch.setenv(EXECUTOR_ENV, 'process')
+    monkeypatch.setenv(WORKERS_ENV, '1')
+    with TestClient(app) as client:
+        deadline = time.monotonic() + 60
+        while client.get('/ready').status_code != 200:
+            assert app.state.warm_up_error is None
+            assert time.monotonic() < deadline
+            time.sleep(0.05)
+        assert all(future.done() for future in app.state.scoring_pool._spawned)
+        assert app.state.scoring_pool._started.empty()
+
+
+def test_failed_worker_warm_up_is_reported(monkeypatch):
+    def fail():
+        raise RuntimeError('no controllers')
+
+    monkeypatch.setattr('mindbloom.workers.warm_up_worker', fail)
+    pool = ScoringPool('process', workers=1).start()
+    try:
+        with pytest.raises(BrokenProcessPool):
+            asyncio.run(pool.wait_ready())
+    finally:
+        pool.shutdown()